@@ -4,11 +4,46 @@ from flask import Flask
 BEEKEEPER_HOME = os.path.dirname(os.path.abspath(__file__))
 
 
-def create_app():
+def start_services(app):
+    """Start Beekeeper's background threads for an app. Each starts once per process.
+
+    Nothing starts at import time; create_app() calls this last unless
+    START_SERVICES is False (benchmarks, scripts that only need the routes).
+    """
+    from services.artifact_index import start_indexers
+    from services.env_pool import start_replenisher
+    from services.git_mirror import start_fetcher
+    from services.janitor import start_janitor
+    from services.stats_history import start_sampler
+    from services.artifact_store import start_store
+    from services.process_manager import start_tb_reaper
+    from services.resources import setup_cgroups
+
+    projects_dir = app.config["PROJECTS_DIR"]
+    setup_cgroups()
+    start_tb_reaper()
+    start_indexers(projects_dir)
+    start_replenisher()
+    start_fetcher(projects_dir)
+    start_janitor(projects_dir)
+    start_sampler()
+    start_store(projects_dir)
+    if app.config["BEEKEEPER_MODE"] == "worker":
+        from services.worker_agent import start_agent
+        start_agent(projects_dir)
+
+
+def create_app(config=None):
     app = Flask(__name__)
     app.secret_key = os.environ.get("BEEKEEPER_SECRET", "dev-secret-change-me")
     app.config["BEEKEEPER_HOME"] = BEEKEEPER_HOME
-    app.config["PROJECTS_DIR"] = os.path.join(BEEKEEPER_HOME, "projects")
+    app.config["PROJECTS_DIR"] = os.environ.get(
+        "BEEKEEPER_PROJECTS_DIR", os.path.join(BEEKEEPER_HOME, "projects"))
+    app.config["BEEKEEPER_MODE"] = os.environ.get("BEEKEEPER_MODE", "standalone")
+    app.config["ARCHIVE_CACHE_DIR"] = os.path.join(BEEKEEPER_HOME, "cache", "archives")
+    app.config["START_SERVICES"] = True
+    if config:
+        app.config.update(config)
 
     os.makedirs(app.config["PROJECTS_DIR"], exist_ok=True)
 
@@ -17,16 +52,31 @@ def create_app():
     from routes.stats import stats_bp
     from routes.training import training_bp
     from routes.files import files_bp
+    from routes.metrics import metrics_bp
+    from routes.projects_api import projects_api_bp
+    from routes.export import export_bp
+    from routes.hive import hive_bp
+    from routes.worker import worker_bp
 
     app.register_blueprint(dashboard_bp)
     app.register_blueprint(project_bp)
     app.register_blueprint(stats_bp)
     app.register_blueprint(training_bp)
     app.register_blueprint(files_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(projects_api_bp)
+    app.register_blueprint(export_bp)
+    if app.config["BEEKEEPER_MODE"] == "hive":
+        app.register_blueprint(hive_bp)
+    elif app.config["BEEKEEPER_MODE"] == "worker":
+        app.register_blueprint(worker_bp)
+
+    if app.config["START_SERVICES"]:
+        start_services(app)
 
     return app
 
 
 if __name__ == "__main__":
     app = create_app()
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    app.run(debug=True, host="0.0.0.0", port=int(os.environ.get("BEEKEEPER_PORT", "5000")))
@@ -0,0 +1,65 @@
+"""Fake GPU device provider so stats benchmarks run on machines without NVIDIA drivers."""
+import random
+
+
+class FakeDevice:
+    """Implements the subset of nvitop.Device that stats_service reads."""
+
+    def __init__(self, index, mem_total=24 * 1024 ** 3):
+        self.index = index
+        self._mem_total = mem_total
+
+    def name(self):
+        return f"Fake GPU {self.index}"
+
+    def gpu_utilization(self):
+        return random.randint(0, 100)
+
+    def memory_used(self):
+        return random.randint(0, self._mem_total)
+
+    def memory_total(self):
+        return self._mem_total
+
+    def memory_used_human(self):
+        return f"{self.memory_used() / 1024 ** 3:.1f}GiB"
+
+    def memory_total_human(self):
+        return f"{self._mem_total / 1024 ** 3:.1f}GiB"
+
+    def temperature(self):
+        return random.randint(30, 85)
+
+    def fan_speed(self):
+        return random.randint(0, 100)
+
+    def power_usage(self):
+        return random.randint(50_000, 350_000)
+
+    def power_limit(self):
+        return 350_000
+
+    def processes(self):
+        return {}
+
+
+class FakeNvitop:
+    """Stands in for the nvitop module: exposes Device.all()."""
+
+    def __init__(self, count):
+        devices = [FakeDevice(i) for i in range(count)]
+
+        class Device:
+            @staticmethod
+            def all():
+                return devices
+
+        self.Device = Device
+
+
+def install(count):
+    """Point services.stats_service at `count` fake devices."""
+    from services import stats_service
+
+    stats_service.nvitop = FakeNvitop(count)
+    stats_service._HAS_NVITOP = True
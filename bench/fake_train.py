@@ -0,0 +1,39 @@
+"""Fake training script: prints timestamped log lines at a fixed rate.
+
+Usage: python fake_train.py [--rate LINES_PER_SEC] [--duration SECONDS] [--width CHARS]
+
+Each line looks like "ts=<unix time> step=<n> loss=<x> ..." so the benchmark
+can measure end-to-end latency from write to SSE delivery. Stdlib only, so it
+runs under whatever interpreter the project environment points at.
+"""
+import argparse
+import math
+import sys
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=100.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--width", type=int, default=80)
+    args = parser.parse_args()
+
+    interval = 1.0 / args.rate if args.rate > 0 else 0
+    deadline = time.time() + args.duration
+    next_at = time.time()
+    step = 0
+    while time.time() < deadline:
+        step += 1
+        line = f"ts={time.time():.6f} step={step} loss={1.0 / math.sqrt(step):.5f}"
+        sys.stdout.write(line.ljust(args.width, ".") + "\n")
+        sys.stdout.flush()
+        if interval:
+            next_at += interval
+            delay = next_at - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+"""Beekeeper benchmark harness.
+
+Usage (from BEEKEEPER_HOME):
+    python -m bench.run                      # all scenarios -> bench_output.json
+    python -m bench.run --only stats,zip     # a subset
+    python -m bench.run --out new.json --compare old.json
+
+Everything runs against a throwaway projects dir with synthetic projects,
+fake training scripts and fake GPUs, so results are comparable between
+machines and commits. Results are written as JSON.
+"""
+import argparse
+import atexit
+import http.client
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The services read their state dirs from the environment at import time, so
+# point them into the throwaway workdir before the app is imported; otherwise
+# the benchmarks would fill the real mirrors, pool, store and stats history.
+WORKDIR = tempfile.mkdtemp(prefix="beekeeper-bench-")
+atexit.register(shutil.rmtree, WORKDIR, True)
+for _var, _sub in (("BEEKEEPER_GIT_MIRRORS", "mirrors"),
+                   ("BEEKEEPER_ENV_POOL_DIR", "pool"),
+                   ("BEEKEEPER_STORE_DIR", "store"),
+                   ("BEEKEEPER_STATS_HISTORY_DIR", "stats"),
+                   ("BEEKEEPER_DATASETS_DIR", "datasets")):
+    os.environ[_var] = os.path.join(WORKDIR, _sub)
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from app import create_app  # noqa: E402
+from bench import fake_nvml, synthetic  # noqa: E402
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    def register(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+
+def percentiles(samples):
+    """Summarise a list of seconds as milliseconds."""
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 3)
+
+    return {
+        "n": len(ordered),
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+    }
+
+
+class Server:
+    """Run the app on a local port in a background thread."""
+
+    def __init__(self, app):
+        self.httpd = make_server("127.0.0.1", 0, app, threaded=True)
+        self.port = self.httpd.server_port
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+
+    def request(self, method, path, timeout=60):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=timeout)
+        conn.request(method, path)
+        return conn, conn.getresponse()
+
+    def get_json(self, path):
+        conn, resp = self.request("GET", path)
+        try:
+            return json.loads(resp.read())
+        finally:
+            conn.close()
+
+
+def _new_app(workdir, tag):
+    projects_dir = os.path.join(workdir, tag, "projects")
+    app = create_app({
+        "PROJECTS_DIR": projects_dir,
+        "ARCHIVE_CACHE_DIR": os.path.join(workdir, tag, "cache"),
+        "START_SERVICES": False,
+    })
+    return app, projects_dir
+
+
+def _sse_client(server, name, duration, latencies, stop):
+    """Read the log stream and record (receive time - line timestamp) per line."""
+    conn, resp = server.request("GET", f"/projects/{name}/logs/stream?tail=1",
+                                timeout=duration + 30)
+    deadline = time.time() + duration
+    try:
+        while time.time() < deadline and not stop.is_set():
+            raw = resp.readline()
+            if not raw:
+                break
+            now = time.time()
+            for part in raw.decode("utf-8", "replace").split():
+                if part.startswith("ts="):
+                    try:
+                        latencies.append(now - float(part[3:]))
+                    except ValueError:
+                        pass
+                    break
+    finally:
+        conn.close()
+
+
+def _wait_started(get_json, path, timeout=60):
+    """Poll a project's status until its start is no longer in progress."""
+    deadline = time.time() + timeout
+    while True:
+        status = get_json(path)
+        if status["status"] != "starting" or time.time() > deadline:
+            return status
+        time.sleep(0.01)
+
+
+def _run_viewers(server, projects_dir, name, viewers, rate, duration):
+    synthetic.make_runnable_project(projects_dir, name, rate=rate, duration=duration + 5)
+    conn, resp = server.request("POST", f"/projects/{name}/start")
+    resp.read()
+    conn.close()
+    _wait_started(server.get_json, f"/projects/{name}/status")
+
+    latencies = []
+    stop = threading.Event()
+    threads_before = threading.active_count()
+    clients = [
+        threading.Thread(target=_sse_client,
+                         args=(server, name, duration, latencies, stop), daemon=True)
+        for _ in range(viewers)
+    ]
+    for t in clients:
+        t.start()
+    time.sleep(min(1.0, duration / 2))
+    # Every viewer adds one client thread here; the rest are server threads
+    server_threads = threading.active_count() - threads_before - viewers
+    for t in clients:
+        t.join(duration + 30)
+    stop.set()
+
+    conn, resp = server.request("POST", f"/projects/{name}/stop")
+    resp.read()
+    conn.close()
+
+    result = percentiles(latencies)
+    result.update({
+        "viewers": viewers,
+        "line_rate": rate,
+        "lines_per_viewer": round(len(latencies) / viewers, 1),
+        "server_threads": server_threads,
+    })
+    return result
+
+
+@scenario("sse_latency")
+def bench_sse_latency(workdir, args):
+    """End-to-end latency from a line being written to it arriving over SSE."""
+    app, projects_dir = _new_app(workdir, "sse")
+    results = []
+    with Server(app) as server:
+        for i, rate in enumerate(args.line_rates):
+            results.append(_run_viewers(server, projects_dir, f"sse{i}",
+                                        1, rate, args.duration))
+    return results
+
+
+@scenario("sse_viewers")
+def bench_sse_viewers(workdir, args):
+    """Latency and server threads as concurrent viewers of one run increase."""
+    app, projects_dir = _new_app(workdir, "viewers")
+    results = []
+    with Server(app) as server:
+        for i, viewers in enumerate(args.viewers):
+            result = _run_viewers(server, projects_dir, f"view{i}",
+                                  viewers, args.line_rates[0], args.duration)
+            result["viewers_per_thread"] = round(viewers / max(1, result["server_threads"]), 3)
+            results.append(result)
+    return results
+
+
+@scenario("stats")
+def bench_stats(workdir, args):
+    """/api/stats latency with fake GPUs."""
+    fake_nvml.install(args.gpus)
+    app, _ = _new_app(workdir, "stats")
+    client = app.test_client()
+    client.get("/api/stats")  # warm up
+    samples = []
+    for _ in range(args.requests):
+        t0 = time.perf_counter()
+        resp = client.get("/api/stats")
+        resp.get_data()
+        samples.append(time.perf_counter() - t0)
+    result = percentiles(samples)
+    result["gpus"] = args.gpus
+    return result
+
+
+@scenario("dashboard")
+def bench_dashboard(workdir, args):
+    """Dashboard render time versus number of projects."""
+    results = []
+    for count in args.project_counts:
+        app, projects_dir = _new_app(workdir, f"dash{count}")
+        synthetic.make_projects(projects_dir, count)
+        client = app.test_client()
+        client.get("/")
+        samples = []
+        for _ in range(max(3, args.requests // 10)):
+            t0 = time.perf_counter()
+            client.get("/").get_data()
+            samples.append(time.perf_counter() - t0)
+        result = percentiles(samples)
+        result["projects"] = count
+        results.append(result)
+    return results
+
+
+@scenario("zip")
+def bench_zip(workdir, args):
+    """Directory zip download throughput, cold and cached."""
+    app, projects_dir = _new_app(workdir, "zip")
+    synthetic.make_projects(projects_dir, 1, prefix="zip")
+    runs_dir = os.path.join(projects_dir, "zip00000", "src", "runs")
+    total = synthetic.make_deep_tree(runs_dir, depth=args.tree_depth)
+
+    results = {"tree_bytes": total}
+    with Server(app) as server:
+        for label in ("cold", "cached"):
+            t0 = time.perf_counter()
+            conn, resp = server.request("GET", "/projects/zip00000/files/runs?zip=1")
+            received = 0
+            while True:
+                chunk = resp.read(1024 * 1024)
+                if not chunk:
+                    break
+                received += len(chunk)
+            conn.close()
+            elapsed = time.perf_counter() - t0
+            results[label] = {
+                "seconds": round(elapsed, 4),
+                "archive_bytes": received,
+                "source_mb_per_s": round(total / elapsed / 1024 ** 2, 2),
+            }
+    return results
+
+
+@scenario("run_start")
+def bench_run_start(workdir, args):
+    """Latency of POST /start, until the run is up (git pull + spawn), and of /stop."""
+    app, projects_dir = _new_app(workdir, "start")
+    synthetic.make_runnable_project(projects_dir, "starter", rate=10, duration=60)
+    client = app.test_client()
+    accept_samples, start_samples, stop_samples = [], [], []
+    for _ in range(args.starts):
+        t0 = time.perf_counter()
+        resp = client.post("/projects/starter/start")
+        accept_samples.append(time.perf_counter() - t0)
+        if resp.status_code not in (200, 202):
+            return {"error": resp.get_json()}
+        status = _wait_started(lambda path: client.get(path).get_json(), "/projects/starter/status")
+        if status["status"] != "running":
+            return {"error": status}
+        start_samples.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        client.post("/projects/starter/stop")
+        stop_samples.append(time.perf_counter() - t0)
+    return {"accept": percentiles(accept_samples), "start": percentiles(start_samples),
+            "stop": percentiles(stop_samples)}
+
+
+_COLD_START = """
+import json, sys, threading, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+create_app({"PROJECTS_DIR": sys.argv[1], "ARCHIVE_CACHE_DIR": sys.argv[2], "START_SERVICES": False})
+t2 = time.perf_counter()
+print(json.dumps({
+    "import": t1 - t0,
+    "create_app": t2 - t1,
+    "threads": threading.active_count(),
+    "eager_modules": [m for m in ("nvitop", "pynvml", "pyarrow") if m in sys.modules],
+}))
+"""
+
+
+@scenario("cold_start")
+def bench_cold_start(workdir, args):
+    """Import and create_app() time in fresh interpreters, checked against a budget.
+
+    Also checks that neither starts a thread or loads NVML/pyarrow; services
+    start from start_services() and GPU libraries load on first use.
+    """
+    home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    projects_dir = os.path.join(workdir, "cold", "projects")
+    synthetic.make_projects(projects_dir, 10)
+    imports, creates, totals = [], [], []
+    threads, eager = set(), set()
+    for _ in range(args.cold_starts):
+        out = subprocess.run(
+            [sys.executable, "-c", _COLD_START, projects_dir, os.path.join(workdir, "cold", "cache")],
+            cwd=home, capture_output=True, text=True, timeout=120)
+        if out.returncode != 0:
+            return {"error": out.stderr.strip()[-1000:]}
+        sample = json.loads(out.stdout.strip().splitlines()[-1])
+        imports.append(sample["import"])
+        creates.append(sample["create_app"])
+        totals.append(sample["import"] + sample["create_app"])
+        threads.add(sample["threads"])
+        eager.update(sample["eager_modules"])
+    total = percentiles(totals)
+    return {
+        "import": percentiles(imports),
+        "create_app": percentiles(creates),
+        "total": total,
+        "budget_ms": args.cold_start_budget_ms,
+        "within_budget": total["p50_ms"] <= args.cold_start_budget_ms,
+        "threads": max(threads),
+        "eager_modules": sorted(eager),
+        "side_effect_free": threads == {1} and not eager,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            _flatten(f"{prefix}.{k}" if prefix else k, v, out)
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            _flatten(f"{prefix}[{i}]", v, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+
+
+def compare(old, new):
+    """Print metrics that exist in both result files with their relative change."""
+    old_flat, new_flat = {}, {}
+    _flatten("", old["results"], old_flat)
+    _flatten("", new["results"], new_flat)
+    for key in sorted(new_flat):
+        if key in old_flat and old_flat[key]:
+            change = (new_flat[key] - old_flat[key]) / old_flat[key] * 100
+            print(f"{key:60s} {old_flat[key]:>12} -> {new_flat[key]:>12} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="comma separated scenarios: " + ", ".join(SCENARIOS))
+    parser.add_argument("--out", default="bench_output.json")
+    parser.add_argument("--compare", help="previous result file to diff against")
+    parser.add_argument("--duration", type=float, default=5.0,
+                        help="seconds per SSE measurement")
+    parser.add_argument("--line-rates", type=lambda s: [float(x) for x in s.split(",")],
+                        default=[100.0, 1000.0])
+    parser.add_argument("--viewers", type=lambda s: [int(x) for x in s.split(",")],
+                        default=[1, 8, 32])
+    parser.add_argument("--project-counts", type=lambda s: [int(x) for x in s.split(",")],
+                        default=[10, 100, 1000])
+    parser.add_argument("--gpus", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--tree-depth", type=int, default=4)
+    parser.add_argument("--starts", type=int, default=5)
+    parser.add_argument("--cold-starts", type=int, default=5)
+    parser.add_argument("--cold-start-budget-ms", type=float, default=1000.0,
+                        help="median import + create_app() time cold_start must stay under")
+    args = parser.parse_args()
+
+    selected = args.only.split(",") if args.only else list(SCENARIOS)
+    unknown = [s for s in selected if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    results = {}
+    for name in selected:
+        print(f"--- {name}", flush=True)
+        t0 = time.perf_counter()
+        results[name] = SCENARIOS[name](WORKDIR, args)
+        print(json.dumps(results[name], indent=2))
+        print(f"({time.perf_counter() - t0:.1f}s)", flush=True)
+
+    output = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"Wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), output)
+
+    cold = results.get("cold_start") or {}
+    if cold.get("within_budget") is False or cold.get("side_effect_free") is False:
+        print("cold_start: over budget or starts threads / loads GPU libraries at import")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Builders for synthetic projects and file trees used by the benchmarks."""
+import os
+import sys
+import shutil
+import subprocess
+
+from models.project import Project
+
+FAKE_TRAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_train.py")
+
+
+def make_projects(projects_dir, count, prefix="proj"):
+    """Create `count` ready projects with only a project.json (no src, no env)."""
+    names = []
+    for i in range(count):
+        name = f"{prefix}{i:05d}"
+        Project(name=name, git_url=f"https://example.invalid/{name}.git",
+                setup_status="ready").save(projects_dir)
+        names.append(name)
+    return names
+
+
+def make_deep_tree(root, depth=4, fanout=3, files_per_dir=4, file_size=64 * 1024):
+    """Create a tree of fanout**depth leaf dirs, each holding files_per_dir files.
+
+    Files are half random and half zeros so deflate does real work.
+    Returns total bytes written.
+    """
+    total = 0
+    half = file_size // 2
+    payload = os.urandom(half) + b"\0" * (file_size - half)
+
+    def build(path, level):
+        nonlocal total
+        os.makedirs(path, exist_ok=True)
+        for i in range(files_per_dir):
+            with open(os.path.join(path, f"events.{level}.{i}.bin"), "wb") as f:
+                f.write(payload)
+            total += file_size
+        if level < depth:
+            for i in range(fanout):
+                build(os.path.join(path, f"d{level}_{i}"), level + 1)
+
+    build(root, 1)
+    return total
+
+
+def _git(args, cwd):
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True)
+
+
+def make_runnable_project(projects_dir, name, rate=100.0, duration=10.0, width=80):
+    """Create a ready project whose train.py runs the fake training script.
+
+    The repo has a local bare origin so `git pull` on start works offline, and
+    the "venv" is a bin/python symlink to the current interpreter.
+    """
+    project_dir = os.path.join(projects_dir, name)
+    origin = os.path.join(project_dir, "origin.git")
+    src = os.path.join(project_dir, "src")
+    seed = os.path.join(project_dir, "seed")
+
+    os.makedirs(seed, exist_ok=True)
+    shutil.copy(FAKE_TRAIN, os.path.join(seed, "fake_train.py"))
+    with open(os.path.join(seed, "train.py"), "w") as f:
+        f.write(
+            "import sys, runpy\n"
+            f"sys.argv = ['fake_train.py', '--rate', '{rate}', '--duration', '{duration}',"
+            f" '--width', '{width}']\n"
+            "runpy.run_path('fake_train.py', run_name='__main__')\n"
+        )
+    _git(["init", "-q", "-b", "main"], seed)
+    _git(["-c", "user.name=bench", "-c", "user.email=bench@localhost",
+          "add", "."], seed)
+    _git(["-c", "user.name=bench", "-c", "user.email=bench@localhost",
+          "commit", "-q", "-m", "bench"], seed)
+    _git(["clone", "-q", "--bare", seed, origin], project_dir)
+    _git(["clone", "-q", origin, src], project_dir)
+    shutil.rmtree(seed)
+
+    venv_bin = os.path.join(project_dir, "venv", "bin")
+    os.makedirs(venv_bin, exist_ok=True)
+    os.symlink(sys.executable, os.path.join(venv_bin, "python"))
+
+    Project(name=name, git_url=origin, setup_status="ready").save(projects_dir)
+    return name
@@ -0,0 +1,106 @@
+"""Beekeeper command line tools.
+
+Usage (from BEEKEEPER_HOME):
+    python cli.py wheelhouse populate -r requirements.txt [--python 3.12]
+    python cli.py wheelhouse populate --project my-project
+    python cli.py wheelhouse list
+    python cli.py export runs|metrics|scalars|host [-f parquet|arrow|csv] [-o FILE]
+                  [--project NAME ...] [--since 2026-09-01] [--until 2026-10-01]
+"""
+import argparse
+import json
+import os
+import sys
+
+from app import BEEKEEPER_HOME
+
+
+def _projects_dir():
+    return os.environ.get("BEEKEEPER_PROJECTS_DIR", os.path.join(BEEKEEPER_HOME, "projects"))
+
+
+def wheelhouse_populate(args):
+    from services import wheelhouse
+    from services.python_versions import find_python
+
+    if args.project:
+        config_path = os.path.join(_projects_dir(), args.project, "project.json")
+        with open(config_path) as f:
+            project = json.load(f)
+        req_path = os.path.join(_projects_dir(), args.project, "src", project["requirements_file"])
+        requirement_args = ["-r", req_path]
+        python_bin = find_python(project.get("python_version", "3.12"))
+    else:
+        if not args.requirement and not args.packages:
+            sys.exit("Give -r <requirements file>, package names or --project")
+        requirement_args = [*sum((["-r", r] for r in args.requirement), []), *args.packages]
+        python_bin = find_python(args.python) if args.python else None
+
+    if args.python and not python_bin:
+        sys.exit(f"No Python found for version {args.python}")
+    wheelhouse.populate(requirement_args, python_bin)
+    print(f"Wheelhouse: {wheelhouse.WHEELHOUSE_DIR} ({len(wheelhouse.list_wheels())} wheels)")
+
+
+def wheelhouse_list(args):
+    from services import wheelhouse
+
+    for name in wheelhouse.list_wheels():
+        print(name)
+
+
+def export_dataset(args):
+    from services import export
+
+    error = export.validate(args.dataset, args.format, args.project)
+    if error:
+        sys.exit(error)
+    try:
+        since = export.parse_time(args.since)
+        until = export.parse_time(args.until)
+    except ValueError as e:
+        sys.exit(str(e))
+    out_path = args.output or f"{args.dataset}{export.FORMATS[args.format]}"
+    size = 0
+    with open(out_path, "wb") as f:
+        for chunk in export.stream(_projects_dir(), args.dataset, args.format,
+                                   projects=args.project or None, since=since, until=until):
+            f.write(chunk)
+            size += len(chunk)
+    print(f"Wrote {out_path} ({size} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    wheelhouse = commands.add_parser("wheelhouse", help="manage the shared wheelhouse")
+    wheelhouse_commands = wheelhouse.add_subparsers(dest="action", required=True)
+    populate = wheelhouse_commands.add_parser("populate", help="download and build wheels")
+    populate.add_argument("-r", "--requirement", action="append", default=[],
+                          help="requirements file (repeatable)")
+    populate.add_argument("--python", help="Python version to fetch wheels for, e.g. 3.12")
+    populate.add_argument("--project", help="use a project's requirements file and Python")
+    populate.add_argument("packages", nargs="*", help="extra requirement specifiers")
+    populate.set_defaults(func=wheelhouse_populate)
+    wheelhouse_commands.add_parser("list", help="list cached wheels").set_defaults(
+        func=wheelhouse_list)
+
+    from services.export import FORMATS, SCHEMAS, has_pyarrow
+    export = commands.add_parser("export", help="export history to Parquet, Arrow or CSV")
+    export.add_argument("dataset", choices=list(SCHEMAS))
+    export.add_argument("-f", "--format", choices=list(FORMATS),
+                        default="parquet" if has_pyarrow() else "csv")
+    export.add_argument("-o", "--output", help="output file (default: <dataset>.<ext>)")
+    export.add_argument("--project", action="append", help="only this project (repeatable)")
+    export.add_argument("--since", help="unix seconds or ISO date/time")
+    export.add_argument("--until", help="unix seconds or ISO date/time")
+    export.set_defaults(func=export_dataset)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Beekeeper's on-demand sampler, loaded into training processes via PYTHONPATH.
+
+Each Python process in a run registers its pid under BEEKEEPER_PROFILE_DIR
+and parks a thread in sigwait() on a real-time signal, blocked everywhere
+else so nothing in the script ever sees it. When Beekeeper sends the signal
+the thread reads request.json and samples sys._current_frames() for the
+requested duration, which works even while the main thread is stuck in C
+code. Results are written as collapsed stacks (plus, optionally, tracemalloc
+top allocations) next to the request. Forked children (DataLoader workers)
+register themselves and get their own thread.
+
+A second signal makes faulthandler write every thread's stack to stderr (the
+run's log); unlike sampling it works even while a thread holds the GIL.
+
+Stays importable on old Pythons and never lets an error reach the script.
+Any sitecustomize the environment already has is run afterwards.
+"""
+import os
+import sys
+
+
+def _install():
+    import json
+    import signal
+    import threading
+    import time
+
+    profile_dir = os.environ.get("BEEKEEPER_PROFILE_DIR")
+    if not profile_dir or not hasattr(signal, "pthread_sigmask"):
+        return
+    sig = signal.SIGRTMIN + int(os.environ.get("BEEKEEPER_PROFILE_SIGNAL_OFFSET", "7"))
+    stacks_offset = os.environ.get("BEEKEEPER_STACKS_SIGNAL_OFFSET")
+    pids_dir = os.path.join(profile_dir, "pids")
+    prefixes = sorted({p for p in (sys.prefix, sys.base_prefix, sys.exec_prefix) if p},
+                      key=len, reverse=True)
+
+    def label(code):
+        path = code.co_filename
+        marker = "site-packages" + os.sep
+        if marker in path:
+            path = path.split(marker, 1)[1]
+        else:
+            for prefix in prefixes:
+                if path.startswith(prefix + os.sep):
+                    path = path[len(prefix) + 1:]
+                    break
+        return "%s (%s:%d)" % (code.co_name, path, code.co_firstlineno)
+
+    def sample(request, out_path):
+        me = threading.get_ident()
+        counts = {}
+        deadline = time.time() + request["duration"]
+        interval = request.get("interval", 0.01)
+        labels = {}
+        while time.time() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    name = labels.get(code)
+                    if name is None:
+                        name = labels[code] = label(code)
+                    stack.append(name)
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread-%d" % ident))
+                key = ";".join(reversed(stack))
+                counts[key] = counts.get(key, 0) + 1
+            time.sleep(interval)
+        tmp = out_path + ".tmp"
+        with open(tmp, "w") as f:
+            for key, count in counts.items():
+                f.write("%s %d\n" % (key.replace("\n", " "), count))
+        os.rename(tmp, out_path)
+
+    def allocations(snapshot, out_path, limit=30):
+        stats = snapshot.filter_traces([
+            tracemalloc_module.Filter(False, tracemalloc_module.__file__),
+            tracemalloc_module.Filter(False, __file__, all_frames=True),
+        ]).statistics("traceback")
+        top = []
+        for stat in stats[:limit]:
+            top.append({
+                "size": stat.size,
+                "count": stat.count,
+                # most recent call first
+                "traceback": ["%s:%d" % (f.filename, f.lineno) for f in reversed(stat.traceback)],
+            })
+        tmp = out_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"total": sum(s.size for s in stats), "top": top}, f)
+        os.rename(tmp, out_path)
+
+    tracemalloc_module = None
+
+    def handle():
+        nonlocal tracemalloc_module
+        with open(os.path.join(profile_dir, "request.json")) as f:
+            request = json.load(f)
+        out_dir = os.path.join(profile_dir, request["id"])
+        pid = os.getpid()
+        started_tracing = False
+        if request.get("tracemalloc"):
+            import tracemalloc
+            tracemalloc_module = tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(request.get("frames", 10))
+                started_tracing = True
+        try:
+            sample(request, os.path.join(out_dir, "%d.collapsed" % pid))
+            if tracemalloc_module and tracemalloc_module.is_tracing():
+                allocations(tracemalloc_module.take_snapshot(),
+                            os.path.join(out_dir, "%d.alloc.json" % pid))
+        finally:
+            if started_tracing:
+                tracemalloc_module.stop()
+
+    def wait_loop():
+        while True:
+            signal.sigwait({sig})
+            try:
+                handle()
+            except Exception as e:
+                sys.stderr.write("beekeeper profiler: %s\n" % e)
+
+    def register(parent=None):
+        os.makedirs(pids_dir, exist_ok=True)
+        with open(os.path.join(pids_dir, str(os.getpid())), "w") as f:
+            json.dump({"parent": parent, "argv": sys.argv[:3], "at": time.time(),
+                       "stacks_signal": stacks_offset and int(stacks_offset)}, f)
+        threading.Thread(target=wait_loop, name="beekeeper-profiler", daemon=True).start()
+
+    # Block before the script starts threads so they all inherit the mask
+    signal.pthread_sigmask(signal.SIG_BLOCK, {sig})
+    if stacks_offset:
+        # Inherited by forked children; it keeps writing to fd 2 if sys.stderr is replaced
+        import faulthandler
+        faulthandler.register(signal.SIGRTMIN + int(stacks_offset), all_threads=True)
+    register()
+    if hasattr(os, "register_at_fork"):
+        parent = os.getpid()
+        os.register_at_fork(after_in_child=lambda: register(parent))
+
+
+def _chain():
+    """Run the sitecustomize this one shadows, if there is one."""
+    import importlib.machinery
+    import importlib.util
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    path = [p for p in sys.path if os.path.abspath(p or os.curdir) != here]
+    spec = importlib.machinery.PathFinder.find_spec("sitecustomize", path)
+    if spec and spec.loader:
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+
+try:
+    _install()
+except Exception as _e:
+    sys.stderr.write("beekeeper profiler disabled: %s\n" % _e)
+_chain()
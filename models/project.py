@@ -3,22 +3,38 @@ import os
 import tempfile
 from dataclasses import dataclass, field, asdict
 
+DEFAULT_ARTIFACT_GLOBS = ["*.pt", "*.pth", "*.ckpt", "*.safetensors"]
+
 
 @dataclass
 class Project:
     name: str
     git_url: str
     branch: str = "main"
+    clone_mode: str = "full"
     python_version: str = "3.12"
     train_file: str = "train.py"
     tensorboard_log_dir: str = "runs"
     requirements_file: str = "requirements.txt"
     env_type: str = "venv"
+    conda_env: str = ""
     setup_status: str = "pending"
     setup_error: str = ""
+    rebuild_status: str = ""
+    rebuild_error: str = ""
     train_status: str = "idle"
     train_pid: int = 0
     env_vars: dict = field(default_factory=dict)
+    resources: dict = field(default_factory=dict)
+    retention: dict = field(default_factory=dict)
+    artifact_globs: list = field(default_factory=lambda: list(DEFAULT_ARTIFACT_GLOBS))
+    store_globs: list = field(default_factory=list)
+    datasets: dict = field(default_factory=dict)
+    watchdog: dict = field(default_factory=dict)
+    metric_patterns: list = field(default_factory=list)
+    total_steps: int = 0
+    batch_size: int = 0
+    forked_from: str = ""
 
     def to_dict(self):
         return asdict(self)
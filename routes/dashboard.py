@@ -1,7 +1,8 @@
 import os
-import json
 from flask import Blueprint, render_template, current_app
 
+from services.project_service import load_project_cached
+
 dashboard_bp = Blueprint("dashboard", __name__)
 
 
@@ -12,9 +13,8 @@ def index():
 
     if os.path.exists(projects_dir):
         for name in sorted(os.listdir(projects_dir)):
-            config_path = os.path.join(projects_dir, name, "project.json")
-            if os.path.isfile(config_path):
-                with open(config_path) as f:
-                    projects.append(json.load(f))
+            project = load_project_cached(projects_dir, name)
+            if project is not None:
+                projects.append(project)
 
     return render_template("dashboard.html", projects=projects)
@@ -0,0 +1,31 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+
+from services import export
+
+export_bp = Blueprint("export", __name__, url_prefix="/api/export")
+
+
+@export_bp.route("/<dataset>")
+def export_dataset(dataset):
+    """Stream runs / metrics / scalars / host as ?format=parquet|arrow|csv,
+    filtered by ?project=a&project=b, ?since= and ?until= (unix seconds or ISO dates)."""
+    fmt = request.args.get("format", "parquet" if export.has_pyarrow() else "csv")
+    projects = request.args.getlist("project") or None
+    error = export.validate(dataset, fmt, projects)
+    if error:
+        return jsonify({"error": error}), 400
+    try:
+        since = export.parse_time(request.args.get("since"))
+        until = export.parse_time(request.args.get("until"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    chunks = export.stream(current_app.config["PROJECTS_DIR"], dataset, fmt,
+                           projects=projects,
+                           since=since, until=until)
+    mimetype = {"parquet": "application/vnd.apache.parquet",
+                "arrow": "application/vnd.apache.arrow.stream",
+                "csv": "text/csv"}[fmt]
+    return Response(chunks, mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename={dataset}{export.FORMATS[fmt]}",
+    })
@@ -1,8 +1,10 @@
-import io
 import os
-import zipfile
 from flask import Blueprint, current_app, jsonify, request, send_file, abort
 
+from services import artifact_store
+from services.archive_cache import get_archive
+from services.artifact_index import _parse_step, ensure_indexer, get_artifacts, get_latest
+
 files_bp = Blueprint("files", __name__, url_prefix="/projects")
 
 
@@ -36,8 +38,14 @@ def browse(name, subpath=""):
     if target is None:
         abort(403)
 
+    relpath = os.path.relpath(target, src_dir) if target != src_dir else ""
     if not os.path.exists(target):
-        abort(404)
+        stored = artifact_store.get_file(projects_dir, name, relpath) if relpath else None
+        if stored:
+            return _send_stored(stored)
+        stored_files, stored_dirs = artifact_store.list_files(projects_dir, name, relpath)
+        if not stored_files and not stored_dirs:
+            abort(404)
 
     # Download a file directly
     if os.path.isfile(target):
@@ -45,12 +53,12 @@ def browse(name, subpath=""):
 
     # Zip download for a directory
     if request.args.get("zip") == "1":
-        return _zip_directory(target, subpath or name)
+        return _zip_directory(name, target, subpath)
 
     # List directory contents
     entries = []
     try:
-        items = sorted(os.listdir(target))
+        items = sorted(os.listdir(target)) if os.path.isdir(target) else []
     except PermissionError:
         abort(403)
 
@@ -78,6 +86,29 @@ def browse(name, subpath=""):
                 "size_h": _fmt_size(sz),
             })
 
+    # Checkpoints moved into the store are listed as if they were still here
+    stored_files, stored_dirs = artifact_store.list_files(projects_dir, name, relpath)
+    present = {e["name"] for e in entries}
+    for item in sorted(stored_dirs - present):
+        entries.append({
+            "name": item,
+            "type": "dir",
+            "path": os.path.join(subpath, item) if subpath else item,
+            "size": None,
+            "size_h": None,
+        })
+    for item, manifest in sorted(stored_files.items()):
+        if item in present:
+            continue
+        entries.append({
+            "name": item,
+            "type": "file",
+            "path": os.path.join(subpath, item) if subpath else item,
+            "size": manifest["size"],
+            "size_h": _fmt_size(manifest["size"]),
+            "stored": True,
+        })
+
     # Sort: dirs first, then files
     entries.sort(key=lambda e: (0 if e["type"] == "dir" else 1, e["name"].lower()))
 
@@ -100,25 +131,128 @@ def browse(name, subpath=""):
     })
 
 
-def _zip_directory(dir_path, zip_name):
-    """Stream a directory as a zip file."""
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
-        for root, dirs, files in os.walk(dir_path):
-            # Skip hidden dirs and __pycache__
-            dirs[:] = [d for d in dirs if not d.startswith(".") and d != "__pycache__"]
-            for f in files:
-                if f.startswith("."):
-                    continue
-                full = os.path.join(root, f)
-                arcname = os.path.relpath(full, dir_path)
-                zf.write(full, arcname)
-    buf.seek(0)
-
-    safe_name = zip_name.replace("/", "-").replace("\\", "-")
+def _send_stored(manifest):
+    """Serve a file from the checkpoint store like any other download, Range requests included."""
+    response = send_file(
+        artifact_store.open_file(manifest),
+        as_attachment=True,
+        download_name=os.path.basename(manifest["path"]),
+        etag=manifest["sha256"],
+        last_modified=manifest["mtime"],
+    )
+    # send_file can't size a file object, so it skips ranges; add them back
+    response.content_length = manifest["size"]
+    return response.make_conditional(request, accept_ranges=True, complete_length=manifest["size"])
+
+
+def _artifact_entry(item):
+    entry = dict(item)
+    entry["size_h"] = _fmt_size(item["size"])
+    return entry
+
+
+@files_bp.route("/<name>/artifacts")
+def artifacts(name):
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    if not os.path.isfile(os.path.join(projects_dir, name, "project.json")):
+        abort(404)
+    ensure_indexer(projects_dir, name)
+
+    index = get_artifacts(name)
+    if index is None:
+        return jsonify({"project": name, "indexed": False, "artifacts": []})
+    artifacts = [_artifact_entry(a) for a in index["artifacts"]]
+    indexed = {a["path"] for a in artifacts}
+    for manifest in artifact_store.all_files(projects_dir, name):
+        if manifest["path"] not in indexed:
+            artifacts.append(_artifact_entry({
+                "path": manifest["path"],
+                "size": manifest["size"],
+                "mtime": manifest["mtime"],
+                "step": _parse_step(os.path.basename(manifest["path"])),
+                "run_id": manifest.get("run_id"),
+                "stored": True,
+            }))
+    artifacts.sort(key=lambda a: a["mtime"], reverse=True)
+    return jsonify({
+        "project": name,
+        "indexed": True,
+        "scanned_at": index["scanned_at"],
+        "artifacts": artifacts,
+    })
+
+
+@files_bp.route("/<name>/artifacts/latest")
+def artifacts_latest(name):
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    if not os.path.isfile(os.path.join(projects_dir, name, "project.json")):
+        abort(404)
+    ensure_indexer(projects_dir, name)
+
+    latest = get_latest(name)
+    if latest is None:
+        return jsonify({"error": "No artifacts indexed yet"}), 404
+    entry = _artifact_entry(latest)
+    entry["download_url"] = f"/projects/{name}/files/{latest['path']}"
+    return jsonify(entry)
+
+
+@files_bp.route("/<name>/store", methods=["GET"])
+def store_info(name):
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    if not os.path.isfile(os.path.join(projects_dir, name, "project.json")):
+        abort(404)
+    files = artifact_store.all_files(projects_dir, name)
+    return jsonify({
+        "project": name,
+        "files": len(files),
+        "logical_bytes": sum(m["size"] for m in files),
+        "runs": sorted({m.get("run_id") for m in files if m.get("run_id")}),
+    })
+
+
+@files_bp.route("/<name>/store/restore", methods=["POST"])
+def store_restore(name):
+    """Put a stored checkpoint back into src/ (e.g. to resume from it)."""
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    relpath = (request.get_json(silent=True) or request.form).get("path", "")
+    src_dir, target = _safe_path(projects_dir, name, relpath)
+    if not relpath or target is None:
+        return jsonify({"error": "Invalid path"}), 400
+    result = artifact_store.restore(projects_dir, name, os.path.relpath(target, src_dir))
+    if "error" in result:
+        return jsonify(result), 409
+    return jsonify(result)
+
+
+@files_bp.route("/<name>/store/runs/<run_id>", methods=["DELETE"])
+def store_forget_run(name, run_id):
+    """Delete a run's stored checkpoints; chunks nothing else uses are freed shortly after."""
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    if not os.path.isfile(os.path.join(projects_dir, name, "project.json")):
+        abort(404)
+    return jsonify({"removed": artifact_store.forget(projects_dir, name, run_id=run_id)})
+
+
+def _zip_directory(name, dir_path, subpath):
+    """Serve a directory as a zip from the archive cache, with ETag and Range support."""
+    cache_dir = current_app.config["ARCHIVE_CACHE_DIR"]
+    safe_name = (subpath or name).replace("/", "-").replace("\\", "-")
+
+    stored = [
+        (os.path.relpath(m["path"], subpath) if subpath else m["path"],
+         lambda m=m: artifact_store.open_file(m), m["size"], int(m["mtime"] * 1e9))
+        for m in artifact_store.all_files(current_app.config["PROJECTS_DIR"], name, subpath)
+    ]
+    archive_path, etag = get_archive(cache_dir, f"{name}/{subpath}", dir_path, stored)
+    if not os.path.isfile(archive_path):
+        # Evicted or replaced by a concurrent rebuild — build again
+        archive_path, etag = get_archive(cache_dir, f"{name}/{subpath}", dir_path, stored)
     return send_file(
-        buf,
+        archive_path,
         mimetype="application/zip",
         as_attachment=True,
         download_name=f"{safe_name}.zip",
+        etag=etag,
+        conditional=True,
     )
@@ -0,0 +1,24 @@
+from flask import Blueprint, jsonify, request
+
+from services import hive
+
+hive_bp = Blueprint("hive", __name__, url_prefix="/api/hive")
+
+
+@hive_bp.before_request
+def _check_token():
+    if not hive.token_ok(request.headers):
+        return jsonify({"error": "Invalid hive token"}), 403
+
+
+@hive_bp.route("/heartbeat", methods=["POST"])
+def heartbeat():
+    result = hive.heartbeat(request.get_json(silent=True) or {})
+    if "error" in result:
+        return jsonify(result), 400
+    return jsonify(result)
+
+
+@hive_bp.route("/workers")
+def workers():
+    return jsonify({"workers": hive.workers()})
@@ -0,0 +1,32 @@
+import time
+from flask import Blueprint, Response, g, request
+
+from services.metrics import Histogram, render
+
+metrics_bp = Blueprint("metrics", __name__)
+
+REQUEST_SECONDS = Histogram(
+    "beekeeper_http_request_seconds",
+    "Request handling time by route (streaming responses count until the first byte)",
+    ["endpoint", "method", "status"])
+
+
+@metrics_bp.before_app_request
+def _start_timer():
+    g.metrics_started = time.monotonic()
+
+
+@metrics_bp.after_app_request
+def _observe_request(response):
+    started = g.pop("metrics_started", None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.monotonic() - started,
+                                endpoint=request.endpoint or "unmatched",
+                                method=request.method,
+                                status=response.status_code)
+    return response
+
+
+@metrics_bp.route("/metrics")
+def metrics():
+    return Response(render(), mimetype="text/plain; version=0.0.4")
@@ -6,9 +6,15 @@ from flask import (
     request, redirect, url_for, abort, flash,
 )
 
-from services.project_service import create_project, delete_project
+from services.project_service import (
+    create_project, delete_project, fork_project, rebuild_environment,
+)
 from services.python_versions import find_available, has_conda
 from services.process_manager import get_training_status, stop_tensorboard
+from services.git_mirror import CLONE_MODES
+from services.hive import status as hive_status
+from services.resources import validate as validate_resources
+from services import artifact_store, datasets, janitor, watchdog
 
 project_bp = Blueprint("project", __name__, url_prefix="/projects")
 
@@ -53,9 +59,14 @@ def create():
         "tensorboard_log_dir": request.form.get("tensorboard_log_dir", "runs").strip() or "runs",
         "requirements_file": request.form.get("requirements_file", "requirements.txt").strip() or "requirements.txt",
         "env_type": request.form.get("env_type", "venv"),
+        "clone_mode": request.form.get("clone_mode", "full"),
     }
+    if data["clone_mode"] not in CLONE_MODES:
+        flash("Invalid clone mode.", "error")
+        return redirect(url_for("project.new"))
 
-    create_project(projects_dir, data)
+    create_project(projects_dir, data,
+                   local_setup=current_app.config["BEEKEEPER_MODE"] != "hive")
     return redirect(url_for("project.detail", name=name))
 
 
@@ -70,8 +81,14 @@ def detail(name):
     with open(config_path) as f:
         project = json.load(f)
 
-    training = get_training_status(name)
-    return render_template("project.html", project=project, training=training)
+    if current_app.config["BEEKEEPER_MODE"] == "hive":
+        training = hive_status(current_app.config["PROJECTS_DIR"], name)
+    else:
+        training = get_training_status(name)
+    return render_template("project.html", project=project, training=training,
+                           disk_usage=janitor.usage(name), over_budget=janitor.over_budget(name),
+                           stored_bytes=artifact_store.stats(
+                               current_app.config["PROJECTS_DIR"])["projects"].get(name))
 
 
 @project_bp.route("/<name>/edit")
@@ -113,6 +130,69 @@ def update(name):
             env_vars[k] = v
     project_data["env_vars"] = env_vars
 
+    patterns = request.form.get("metric_patterns")
+    if patterns is not None:
+        project_data["metric_patterns"] = [p.strip() for p in patterns.splitlines() if p.strip()]
+    for key in ("total_steps", "batch_size"):
+        value = request.form.get(key, "").strip()
+        project_data[key] = int(value) if value.isdigit() else 0
+
+    if "res_cpus" in request.form:
+        res = {}
+        for key in ("cpus", "nice", "ionice", "cpu_max", "memory_max", "io_weight",
+                    "priority", "checkpoint_signal", "checkpoint_grace"):
+            value = request.form.get(f"res_{key}", "").strip()
+            if value:
+                res[key] = value
+        error = validate_resources(res)
+        if error:
+            flash(f"Resources: {error}", "error")
+            return redirect(url_for("project.edit", name=name))
+        project_data["resources"] = res
+
+    if "ret_quota" in request.form:
+        retention = {}
+        for key in ("quota", "keep_runs", "max_age_days"):
+            value = request.form.get(f"ret_{key}", "").strip()
+            if value:
+                retention[key] = value
+        error = janitor.validate(retention)
+        if error:
+            flash(f"Disk: {error}", "error")
+            return redirect(url_for("project.edit", name=name))
+        project_data["retention"] = retention
+
+    globs = request.form.get("artifact_globs")
+    if globs is not None:
+        project_data["artifact_globs"] = [g.strip() for g in globs.split(",") if g.strip()]
+    store_globs = request.form.get("store_globs")
+    if store_globs is not None:
+        project_data["store_globs"] = [g.strip() for g in store_globs.split(",") if g.strip()]
+
+    if "ds_stage" in request.form:
+        staging = {"stage": [p.strip() for p in request.form["ds_stage"].splitlines() if p.strip()]}
+        for key in ("mode", "timeout"):
+            value = request.form.get(f"ds_{key}", "").strip()
+            if value:
+                staging[key] = value
+        error = datasets.validate(staging)
+        if error:
+            flash(f"Datasets: {error}", "error")
+            return redirect(url_for("project.edit", name=name))
+        project_data["datasets"] = staging
+
+    if "wd_stall_minutes" in request.form:
+        wd = {}
+        for key in ("stall_minutes", "on_stall", "starved_minutes", "on_starved"):
+            value = request.form.get(f"wd_{key}", "").strip()
+            if value:
+                wd[key] = value
+        error = watchdog.validate(wd)
+        if error:
+            flash(f"Watchdog: {error}", "error")
+            return redirect(url_for("project.edit", name=name))
+        project_data["watchdog"] = wd
+
     from models.project import Project
     project = Project(**project_data)
     project.save(projects_dir)
@@ -123,7 +203,6 @@ def update(name):
 
 @project_bp.route("/<name>/clear-tb-logs", methods=["POST"])
 def clear_tb_logs(name):
-    import shutil
     projects_dir = current_app.config["PROJECTS_DIR"]
     config_path = os.path.join(projects_dir, name, "project.json")
     if not os.path.isfile(config_path):
@@ -132,10 +211,7 @@ def clear_tb_logs(name):
     with open(config_path) as f:
         project = json.load(f)
 
-    tb_logdir = os.path.join(projects_dir, name, "src", project.get("tensorboard_log_dir", "runs"))
-    if os.path.isdir(tb_logdir):
-        shutil.rmtree(tb_logdir)
-        os.makedirs(tb_logdir, exist_ok=True)
+    if janitor.clear_tb_logs(projects_dir, project):
         flash("Tensorboard logs cleared.", "success")
     else:
         flash("Tensorboard log directory not found.", "error")
@@ -143,6 +219,41 @@ def clear_tb_logs(name):
     return redirect(url_for("project.detail", name=name))
 
 
+@project_bp.route("/<name>/rebuild", methods=["POST"])
+def rebuild(name):
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    if not os.path.isfile(os.path.join(projects_dir, name, "project.json")):
+        abort(404)
+
+    result = rebuild_environment(projects_dir, name)
+    if "error" in result:
+        flash(result["error"], "error")
+    else:
+        flash("Rebuilding the environment in the background. Runs keep using the current one "
+              "until the new one is ready.", "success")
+    return redirect(url_for("project.detail", name=name))
+
+
+@project_bp.route("/<name>/fork", methods=["POST"])
+def fork(name):
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    if not os.path.isfile(os.path.join(projects_dir, name, "project.json")):
+        abort(404)
+
+    new_name = request.form.get("name", "").strip()
+    if not new_name or not re.match(r"^[a-zA-Z0-9_-]+$", new_name):
+        flash("Invalid project name. Use only letters, numbers, hyphens, underscores.", "error")
+        return redirect(url_for("project.detail", name=name))
+
+    result = fork_project(projects_dir, name, new_name,
+                          include_outputs=bool(request.form.get("include_outputs")),
+                          local_setup=current_app.config["BEEKEEPER_MODE"] != "hive")
+    if isinstance(result, dict):
+        flash(result["error"], "error")
+        return redirect(url_for("project.detail", name=name))
+    return redirect(url_for("project.detail", name=new_name))
+
+
 @project_bp.route("/<name>/delete", methods=["POST"])
 def delete(name):
     projects_dir = current_app.config["PROJECTS_DIR"]
@@ -0,0 +1,94 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, current_app, jsonify, request
+
+from services import hive
+from services.project_service import load_project_cached
+from services.process_manager import (
+    get_training_statuses, pause_training, resume_training, start_training, stop_training,
+)
+
+projects_api_bp = Blueprint("projects_api", __name__, url_prefix="/api/projects")
+
+_BULK_ACTIONS = {"start": start_training, "stop": stop_training,
+                 "pause": pause_training, "resume": resume_training}
+_HIVE_ACTIONS = {"start": hive.dispatch, "stop": hive.stop,
+                 "pause": hive.pause, "resume": hive.resume}
+_BULK_WORKERS = 8
+# Same rule as project creation; anything else ("p/", "../x/p") could alias or escape a project
+_NAME_RE = re.compile(r"^[a-zA-Z0-9_-]+$")
+
+
+def _valid_name(name):
+    return isinstance(name, str) and _NAME_RE.fullmatch(name) is not None
+
+
+def _requested_names(projects_dir, names):
+    if names:
+        return [n for n in names if _valid_name(n)
+                and os.path.isfile(os.path.join(projects_dir, n, "project.json"))]
+    if not os.path.isdir(projects_dir):
+        return []
+    return sorted(n for n in os.listdir(projects_dir)
+                  if os.path.isfile(os.path.join(projects_dir, n, "project.json")))
+
+
+@projects_api_bp.route("/status")
+def status():
+    """Live status of all projects, or of ?name=a&name=b / ?names=a,b."""
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    names = request.args.getlist("name")
+    for value in request.args.getlist("names"):
+        names.extend(n for n in value.split(",") if n)
+
+    names = _requested_names(projects_dir, names)
+    if current_app.config["BEEKEEPER_MODE"] == "hive":
+        training = {name: hive.status(projects_dir, name) for name in names}
+    else:
+        training = get_training_statuses(names)
+    projects = {}
+    for name in names:
+        project = load_project_cached(projects_dir, name) or {}
+        projects[name] = {
+            **training[name],
+            "setup_status": project.get("setup_status", "pending"),
+            "rebuild_status": project.get("rebuild_status", ""),
+            "train_status": project.get("train_status", "idle"),
+            "branch": project.get("branch"),
+        }
+    return jsonify({"projects": projects})
+
+
+@projects_api_bp.route("/bulk", methods=["POST"])
+def bulk():
+    """Start, stop, pause or resume several projects concurrently: {"action": "start", "names": [...]}."""
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    data = request.get_json(silent=True) or {}
+    actions = _HIVE_ACTIONS if current_app.config["BEEKEEPER_MODE"] == "hive" else _BULK_ACTIONS
+    action = actions.get(data.get("action"))
+    names = data.get("names")
+    if action is None:
+        return jsonify({"error": "action must be one of " + ", ".join(actions)}), 400
+    if not isinstance(names, list) or not names:
+        return jsonify({"error": "names must be a non-empty list"}), 400
+
+    def run(name):
+        if not _valid_name(name):
+            return {"error": "Invalid project name"}
+        if not os.path.isfile(os.path.join(projects_dir, name, "project.json")):
+            return {"error": "Project not found"}
+        try:
+            return action(projects_dir, name)
+        except Exception as e:
+            return {"error": str(e)}
+
+    unique = list(dict.fromkeys(n for n in names if isinstance(n, str)))
+    with ThreadPoolExecutor(max_workers=min(_BULK_WORKERS, len(unique) or 1)) as pool:
+        results = dict(zip(unique, pool.map(run, unique)))
+    return jsonify({
+        "action": data["action"],
+        "results": results,
+        "ok": sum(1 for r in results.values() if "error" not in r),
+        "failed": sum(1 for r in results.values() if "error" in r),
+    })
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify
 
+from services import artifact_store
 from services.stats_service import get_all_stats
 
 stats_bp = Blueprint("stats", __name__, url_prefix="/api")
@@ -8,3 +9,9 @@ stats_bp = Blueprint("stats", __name__, url_prefix="/api")
 @stats_bp.route("/stats")
 def stats():
     return jsonify(get_all_stats())
+
+
+@stats_bp.route("/store")
+def store():
+    """Checkpoint store size and space saved by deduplication."""
+    return jsonify(artifact_store.stats())
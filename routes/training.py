@@ -1,14 +1,18 @@
 import os
-import time
 from flask import Blueprint, current_app, jsonify, request, Response, send_file
 
+from services import hive, log_metrics, log_stream, profiler, setup_log
+from services.metrics import Gauge
 from services.process_manager import (
-    start_training, stop_training, get_training_status,
-    start_tensorboard, stop_tensorboard,
+    start_training, stop_training, pause_training, resume_training,
+    get_training_status, start_tensorboard, stop_tensorboard,
 )
+from services.run_history import list_runs
 
 training_bp = Blueprint("training", __name__, url_prefix="/projects")
 
+SSE_SUBSCRIBERS = Gauge("beekeeper_sse_subscribers", "Open log stream connections")
+
 
 @training_bp.route("/<name>/start", methods=["POST"])
 def start(name):
@@ -17,26 +21,143 @@ def start(name):
     if not os.path.isfile(config_path):
         return jsonify({"error": "Project not found"}), 404
 
-    result = start_training(projects_dir, name)
+    if current_app.config["BEEKEEPER_MODE"] == "hive":
+        result = hive.dispatch(projects_dir, name)
+    else:
+        result = start_training(projects_dir, name)
     if "error" in result:
         return jsonify(result), 400
-    return jsonify(result)
+    # Local starts finish in the background; the project status shows when the run is up
+    return jsonify(result), 202 if result.get("status") == "starting" else 200
 
 
 @training_bp.route("/<name>/stop", methods=["POST"])
 def stop(name):
     projects_dir = current_app.config["PROJECTS_DIR"]
-    result = stop_training(projects_dir, name)
+    if current_app.config["BEEKEEPER_MODE"] == "hive":
+        result = hive.stop(projects_dir, name)
+    else:
+        result = stop_training(projects_dir, name)
+    if "error" in result:
+        return jsonify(result), 400
+    return jsonify(result)
+
+
+@training_bp.route("/<name>/pause", methods=["POST"])
+def pause(name):
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    if current_app.config["BEEKEEPER_MODE"] == "hive":
+        result = hive.pause(projects_dir, name)
+    else:
+        result = pause_training(projects_dir, name)
     if "error" in result:
         return jsonify(result), 400
     return jsonify(result)
 
 
+@training_bp.route("/<name>/resume", methods=["POST"])
+def resume(name):
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    if current_app.config["BEEKEEPER_MODE"] == "hive":
+        result = hive.resume(projects_dir, name)
+    else:
+        result = resume_training(projects_dir, name)
+    if "error" in result:
+        return jsonify(result), 400
+    return jsonify(result)
+
+
+@training_bp.route("/<name>/profile", methods=["POST"])
+def profile(name):
+    """Sample the run's Python stacks for ?seconds= (default 10), optionally with tracemalloc."""
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    if current_app.config["BEEKEEPER_MODE"] == "hive":
+        return jsonify({"error": "Profile the run from its worker's Beekeeper"}), 400
+    data = request.get_json(silent=True) or request.form
+    try:
+        seconds = float(data.get("seconds") or 10)
+    except ValueError:
+        return jsonify({"error": "seconds must be a number"}), 400
+    info = get_training_status(name)
+    if info["status"] != "running":
+        return jsonify({"error": "Not running"}), 400
+    if info.get("paused"):
+        return jsonify({"error": "Resume the run before profiling it"}), 400
+    result = profiler.start_profile(projects_dir, name, info["pid"], seconds,
+                                    tracemalloc=str(data.get("tracemalloc", "")).lower() in ("1", "true", "on"))
+    if "error" in result:
+        return jsonify(result), 409 if "id" in result else 400
+    return jsonify(result)
+
+
+@training_bp.route("/<name>/profiles")
+def profiles(name):
+    return jsonify(profiler.list_profiles(current_app.config["PROJECTS_DIR"], name))
+
+
+_PROFILE_FILES = {
+    "flamegraph.svg": "image/svg+xml",
+    "stacks.collapsed": "text/plain",
+    "allocations.json": "application/json",
+}
+
+
+@training_bp.route("/<name>/profiles/<profile_id>")
+@training_bp.route("/<name>/profiles/<profile_id>/<filename>")
+def profile_result(name, profile_id, filename=None):
+    """A profile's status, or one of its outputs once it's done."""
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    meta = profiler.get_profile(projects_dir, name, profile_id)
+    if meta is None:
+        return jsonify({"error": "Profile not found"}), 404
+    if filename is None:
+        return jsonify(meta)
+    if filename not in _PROFILE_FILES:
+        return jsonify({"error": f"Unknown file; one of {', '.join(_PROFILE_FILES)}"}), 404
+    path = profiler.profile_file(projects_dir, name, profile_id, filename)
+    if meta["status"] != "done" or not os.path.isfile(path):
+        return jsonify({"error": "Not available", "status": meta["status"]}), 404
+    return send_file(path, mimetype=_PROFILE_FILES[filename],
+                     as_attachment=filename == "stacks.collapsed",
+                     download_name=f"{name}-{profile_id}-{filename}")
+
+
 @training_bp.route("/<name>/status")
 def status(name):
+    if current_app.config["BEEKEEPER_MODE"] == "hive":
+        return jsonify(hive.status(current_app.config["PROJECTS_DIR"], name))
     return jsonify(get_training_status(name))
 
 
+@training_bp.route("/<name>/throughput")
+def throughput(name):
+    """Live throughput and ETA for the current run, or the summary of the last one."""
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    want_series = request.args.get("series") == "1"
+
+    info = get_training_status(name)
+    if info["status"] == "running":
+        data = log_metrics.live(projects_dir, name, info.get("commit"))
+        if data is not None:
+            data["live"] = True
+            if want_series:
+                data["series"] = log_metrics.series(name)
+            return jsonify(data)
+
+    runs = list_runs(projects_dir, name)
+    if not runs:
+        return jsonify({"live": False, "run_id": None})
+    last = runs[-1]
+    saved = log_metrics.load_run(projects_dir, name, last["run_id"]) or {}
+    data = saved.get("summary") or {"run_id": last["run_id"]}
+    data["live"] = False
+    data["eta_seconds"] = None
+    data["regression"] = last.get("regression")
+    if want_series:
+        data["series"] = saved.get("series", {})
+    return jsonify(data)
+
+
 @training_bp.route("/<name>/tensorboard/start", methods=["POST"])
 def tb_start(name):
     projects_dir = current_app.config["PROJECTS_DIR"]
@@ -52,40 +173,6 @@ def tb_stop(name):
     return jsonify(result)
 
 
-def _tail_offset(filepath, lines):
-    """Find the byte offset to start reading the last N lines of a file."""
-    try:
-        size = os.path.getsize(filepath)
-    except OSError:
-        return 0
-    if size == 0:
-        return 0
-
-    buf_size = 8192
-    found = 0
-    offset = size
-
-    with open(filepath, "rb") as f:
-        while offset > 0 and found <= lines:
-            read_size = min(buf_size, offset)
-            offset -= read_size
-            f.seek(offset)
-            chunk = f.read(read_size)
-            found += chunk.count(b"\n")
-
-        # If we found enough lines, seek forward to the right start
-        if found > lines:
-            f.seek(offset)
-            data = f.read()
-            idx = 0
-            skip = found - lines
-            for _ in range(skip):
-                idx = data.index(b"\n", idx) + 1
-            return offset + idx
-
-    return offset
-
-
 @training_bp.route("/<name>/logs/stream")
 def logs_stream(name):
     projects_dir = current_app.config["PROJECTS_DIR"]
@@ -93,50 +180,66 @@ def logs_stream(name):
 
     # ?tail=N sends only the last N lines first, then streams new ones
     tail = request.args.get("tail", type=int)
+    # Compressed unless the client can't take it or opts out with ?gzip=0
+    use_gzip = ("gzip" in request.headers.get("Accept-Encoding", "")
+                and request.args.get("gzip") != "0")
+
+    if current_app.config["BEEKEEPER_MODE"] == "hive":
+        frames = hive.stream_logs(projects_dir, name, request.query_string.decode())
+    else:
+        def frames():
+            SSE_SUBSCRIBERS.inc()
+            try:
+                offset = log_stream.tail_offset(log_path, tail) if tail and os.path.isfile(log_path) else 0
+                yield from log_stream.follow(
+                    log_path, offset, lambda: get_training_status(name)["status"] == "running")
+            finally:
+                SSE_SUBSCRIBERS.dec()
+        frames = frames()
 
-    def generate():
-        if tail and os.path.isfile(log_path):
-            offset = _tail_offset(log_path, tail)
-        else:
-            offset = 0
+    return _sse(frames, use_gzip)
 
-        retries_without_data = 0
-        max_idle = 300  # stop after 5 min of no data and no running process
 
-        while True:
-            try:
-                if os.path.isfile(log_path):
-                    size = os.path.getsize(log_path)
-                    if size < offset:
-                        # Log file was truncated/rewritten (new run)
-                        offset = 0
-                    if size > offset:
-                        with open(log_path, "r") as f:
-                            f.seek(offset)
-                            chunk = f.read()
-                            offset = f.tell()
-                        if chunk:
-                            for line in chunk.splitlines(True):
-                                yield f"data: {line.rstrip()}\n\n"
-                            retries_without_data = 0
-                            continue
-
-                retries_without_data += 1
-                info = get_training_status(name)
-                if info["status"] != "running" and retries_without_data > 2:
-                    yield "data: \n\nevent: done\ndata: finished\n\n"
-                    return
-                if retries_without_data > max_idle:
-                    return
-
-            except Exception:
-                pass
-
-            time.sleep(0.5)
-
-    return Response(generate(), mimetype="text/event-stream",
-                    headers={"Cache-Control": "no-cache",
-                             "X-Accel-Buffering": "no"})
+def _sse(frames, use_gzip):
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Vary": "Accept-Encoding"}
+    if use_gzip:
+        frames = log_stream.gzip_frames(frames)
+        headers["Content-Encoding"] = "gzip"
+    return Response(frames, mimetype="text/event-stream", headers=headers)
+
+
+@training_bp.route("/<name>/setup/stream")
+def setup_stream(name):
+    """The setup log as SSE, like logs/stream, plus "status" events with stage progress."""
+    projects_dir = current_app.config["PROJECTS_DIR"]
+    log_path = setup_log.log_path(projects_dir, name)
+    tail = request.args.get("tail", type=int)
+    use_gzip = ("gzip" in request.headers.get("Accept-Encoding", "")
+                and request.args.get("gzip") != "0")
+
+    def frames():
+        SSE_SUBSCRIBERS.inc()
+        try:
+            offset = log_stream.tail_offset(log_path, tail) if tail and os.path.isfile(log_path) else 0
+            yield from log_stream.follow(log_path, offset, lambda: setup_log.active(name),
+                                         status=lambda: setup_log.progress(name))
+        finally:
+            SSE_SUBSCRIBERS.dec()
+
+    return _sse(frames(), use_gzip)
+
+
+@training_bp.route("/<name>/setup/progress")
+def setup_progress(name):
+    return jsonify(setup_log.progress(name) or {"active": False})
+
+
+@training_bp.route("/<name>/setup/log")
+def setup_log_download(name):
+    log_path = setup_log.log_path(current_app.config["PROJECTS_DIR"], name)
+    if not os.path.isfile(log_path):
+        return jsonify({"error": "No setup log found"}), 404
+    return send_file(log_path, as_attachment=True, download_name=f"{name}-setup.log")
 
 
 @training_bp.route("/<name>/logs/download")
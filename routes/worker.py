@@ -0,0 +1,40 @@
+from flask import Blueprint, current_app, jsonify, request
+
+from services import hive, worker_agent
+from services.process_manager import pause_training, resume_training, stop_training
+
+worker_bp = Blueprint("worker", __name__, url_prefix="/api/worker")
+
+
+@worker_bp.before_request
+def _check_token():
+    if not hive.token_ok(request.headers):
+        return jsonify({"error": "Invalid hive token"}), 403
+
+
+@worker_bp.route("/run", methods=["POST"])
+def run():
+    data = request.get_json(silent=True) or {}
+    result = worker_agent.run(current_app.config["PROJECTS_DIR"], data.get("project") or {})
+    if "error" in result:
+        return jsonify(result), 400
+    return jsonify(result)
+
+
+_ACTIONS = {"stop": stop_training, "pause": pause_training, "resume": resume_training}
+
+
+@worker_bp.route("/<action>", methods=["POST"])
+def control(action):
+    if action not in _ACTIONS:
+        return jsonify({"error": "Unknown action"}), 404
+    data = request.get_json(silent=True) or {}
+    result = _ACTIONS[action](current_app.config["PROJECTS_DIR"], data.get("name", ""))
+    if "error" in result:
+        return jsonify(result), 400
+    return jsonify(result)
+
+
+@worker_bp.route("/status")
+def status():
+    return jsonify(worker_agent.report(current_app.config["PROJECTS_DIR"]))
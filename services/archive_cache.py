@@ -0,0 +1,259 @@
+import os
+import sys
+import json
+import time
+import shutil
+import struct
+import hashlib
+import tempfile
+import threading
+import zipfile
+import logging
+
+log = logging.getLogger(__name__)
+
+_BUDGET_BYTES = int(float(os.environ.get("BEEKEEPER_ARCHIVE_CACHE_GB", "20")) * 1024 ** 3)
+_COPY_CHUNK = 1024 * 1024
+# Local file header, per the zip spec (APPNOTE 4.3.7); name and extra field lengths are last
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+# Raw copies append to ZipFile's undocumented bookkeeping (filelist, NameToInfo,
+# start_dir, _didModify). Outside the Python versions this is known to work
+# with, unchanged members are compressed again instead.
+_RAW_COPY_VERSIONS = ((3, 8), (3, 14))
+_RAW_COPY_ATTRS = ("fp", "filelist", "NameToInfo", "start_dir", "_didModify")
+
+_key_locks = {}
+_lock = threading.Lock()
+
+
+def _walk_members(dir_path):
+    """List (arcname, full_path, size, mtime_ns) for every file a zip of dir_path contains."""
+    members = []
+    for root, dirs, files in os.walk(dir_path):
+        # Skip hidden dirs and __pycache__
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d != "__pycache__"]
+        for f in files:
+            if f.startswith("."):
+                continue
+            full = os.path.join(root, f)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            members.append((os.path.relpath(full, dir_path), full, st.st_size, st.st_mtime_ns))
+    members.sort()
+    return members
+
+
+def _fingerprint(members):
+    h = hashlib.sha1()
+    for arcname, _full, size, mtime_ns in members:
+        h.update(f"{arcname}\0{size}\0{mtime_ns}\n".encode("utf-8", "surrogateescape"))
+    return h.hexdigest()
+
+
+def _key_lock(key_id):
+    with _lock:
+        return _key_locks.setdefault(key_id, threading.Lock())
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(path, manifest):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+    except:
+        os.unlink(tmp_path)
+        raise
+
+
+def _can_copy_raw(zf):
+    low, high = _RAW_COPY_VERSIONS
+    return low <= sys.version_info[:2] < high and all(hasattr(zf, a) for a in _RAW_COPY_ATTRS)
+
+
+def _copy_raw(src_fp, info, dst_zf):
+    """Copy an already-compressed member from an old archive without recompressing it.
+
+    zipfile has no public API for this, so we write the local header and the
+    compressed bytes ourselves and register the entry for the central directory.
+    Only call it when _can_copy_raw(dst_zf).
+    """
+    src_fp.seek(info.header_offset)
+    header = _LOCAL_HEADER.unpack(src_fp.read(_LOCAL_HEADER.size))
+    if header[0] != b"PK\x03\x04":
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename} in cached archive")
+    name_length, extra_length = header[-2:]
+    src_fp.seek(info.header_offset + _LOCAL_HEADER.size + name_length + extra_length)
+
+    new_info = zipfile.ZipInfo(info.filename, info.date_time)
+    new_info.compress_type = info.compress_type
+    new_info.external_attr = info.external_attr
+    new_info.flag_bits = info.flag_bits & ~0x08
+    new_info.CRC = info.CRC
+    new_info.compress_size = info.compress_size
+    new_info.file_size = info.file_size
+    new_info.header_offset = dst_zf.fp.tell()
+
+    dst_zf.fp.write(new_info.FileHeader())
+    remaining = info.compress_size
+    while remaining:
+        chunk = src_fp.read(min(_COPY_CHUNK, remaining))
+        if not chunk:
+            raise OSError(f"Truncated member {info.filename} in cached archive")
+        dst_zf.fp.write(chunk)
+        remaining -= len(chunk)
+
+    dst_zf.filelist.append(new_info)
+    dst_zf.NameToInfo[new_info.filename] = new_info
+    dst_zf.start_dir = dst_zf.fp.tell()
+    dst_zf._didModify = True
+
+
+def _write_stream(zf, arcname, opener, size, mtime_ns):
+    info = zipfile.ZipInfo(arcname, time.localtime(mtime_ns / 1e9)[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    info.file_size = size  # lets zipfile pick zip64 up front for big members
+    with opener() as src, zf.open(info, "w") as dst:
+        shutil.copyfileobj(src, dst, _COPY_CHUNK)
+
+
+def _build(archive_path, members, old_manifest, old_archive):
+    """Write a zip of members, reusing compressed data for members unchanged since old_archive.
+
+    A member's source is a path, or a callable returning a binary file object.
+    """
+    old_members = (old_manifest or {}).get("members", {})
+    old_zf = None
+    if old_archive and os.path.isfile(old_archive):
+        try:
+            old_zf = zipfile.ZipFile(old_archive)
+        except (OSError, zipfile.BadZipFile):
+            old_zf = None
+
+    written = {}
+    reused = 0
+    try:
+        with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            if old_zf and not _can_copy_raw(zf):
+                old_zf.close()
+                old_zf = None
+            old_names = set(old_zf.namelist()) if old_zf else set()
+            for arcname, full, size, mtime_ns in members:
+                old = old_members.get(arcname)
+                if old_zf and old == [size, mtime_ns] and arcname in old_names:
+                    _copy_raw(old_zf.fp, old_zf.getinfo(arcname), zf)
+                    reused += 1
+                else:
+                    try:
+                        if callable(full):
+                            _write_stream(zf, arcname, full, size, mtime_ns)
+                        else:
+                            zf.write(full, arcname)
+                    except OSError:
+                        continue  # file vanished mid-build
+                written[arcname] = [size, mtime_ns]
+    finally:
+        if old_zf:
+            old_zf.close()
+    return written, reused
+
+
+def _evict(cache_dir, keep_key_id):
+    """Remove least recently used archives until the cache fits the byte budget."""
+    entries = []
+    total = 0
+    for fname in os.listdir(cache_dir):
+        if not fname.endswith(".json"):
+            continue
+        manifest_path = os.path.join(cache_dir, fname)
+        manifest = _read_manifest(manifest_path)
+        if not manifest:
+            continue
+        archive = os.path.join(cache_dir, manifest["archive"])
+        try:
+            size = os.path.getsize(archive)
+            last_used = os.path.getmtime(manifest_path)
+        except OSError:
+            continue
+        total += size
+        entries.append((last_used, fname[:-5], manifest_path, archive, size))
+
+    entries.sort()
+    for _last_used, key_id, manifest_path, archive, size in entries:
+        if total <= _BUDGET_BYTES:
+            break
+        if key_id == keep_key_id:
+            continue
+        with _key_lock(key_id):
+            for path in (manifest_path, archive):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        total -= size
+        log.info("Evicted cached archive %s (%d bytes)", key_id, size)
+
+
+def get_archive(cache_dir, key, dir_path, extra=()):
+    """Return (archive_path, etag) for a zip of dir_path, building or refreshing it if needed.
+
+    key identifies the directory (e.g. "project/subpath"). The archive is reused
+    as long as no file under dir_path changed path, size or mtime. extra adds
+    (arcname, opener, size, mtime_ns) members that aren't on disk.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key_id = hashlib.sha1(key.encode("utf-8", "surrogateescape")).hexdigest()
+    manifest_path = os.path.join(cache_dir, f"{key_id}.json")
+
+    members = _walk_members(dir_path)
+    if extra:
+        on_disk = {m[0] for m in members}
+        members = sorted(members + [m for m in extra if m[0] not in on_disk],
+                         key=lambda m: m[0])
+    fingerprint = _fingerprint(members)
+
+    with _key_lock(key_id):
+        manifest = _read_manifest(manifest_path)
+        old_archive = os.path.join(cache_dir, manifest["archive"]) if manifest else None
+        if manifest and manifest["fingerprint"] == fingerprint and os.path.isfile(old_archive):
+            os.utime(manifest_path)  # mark as recently used
+            return old_archive, fingerprint
+
+        archive_name = f"{key_id}-{fingerprint[:16]}.zip"
+        archive_path = os.path.join(cache_dir, archive_name)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".zip.tmp")
+        os.close(fd)
+        try:
+            written, reused = _build(tmp_path, members, manifest, old_archive)
+            os.replace(tmp_path, archive_path)
+        except:
+            os.unlink(tmp_path)
+            raise
+
+        _write_manifest(manifest_path, {
+            "key": key,
+            "fingerprint": fingerprint,
+            "archive": archive_name,
+            "members": written,
+        })
+        if old_archive and old_archive != archive_path:
+            try:
+                os.unlink(old_archive)  # open downloads keep their handle
+            except OSError:
+                pass
+        log.info("Built archive for %s: %d members, %d reused", key, len(written), reused)
+
+    _evict(cache_dir, key_id)
+    return archive_path, fingerprint
+
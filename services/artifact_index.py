@@ -0,0 +1,216 @@
+"""Index of model artifacts (checkpoints) under each project's src/.
+
+One indexer thread keeps every project's index fresh, rescanning each
+project every _SCAN_INTERVAL seconds (or as soon as a project is added).
+Like the janitor's usage tracking, a directory is only re-listed when its
+mtime changes; the artifacts already found are re-stat'ed on every pass,
+since checkpoints are often rewritten in place, which leaves the directory
+mtime alone.
+"""
+import os
+import re
+import json
+import time
+import fnmatch
+import threading
+import logging
+
+from models.project import DEFAULT_ARTIFACT_GLOBS
+from services.run_history import list_runs, find_run
+
+log = logging.getLogger(__name__)
+
+_SCAN_INTERVAL = 15  # seconds between scans of a project's src tree
+_SKIP_DIRS = {"__pycache__", "node_modules", "venv", "wandb"}
+_STEP_RE = re.compile(r"(?:step|iter|it|epoch|ep|ckpt|checkpoint)[_\-=]?(\d+)", re.IGNORECASE)
+_NUMBER_RE = re.compile(r"(\d+)")
+
+_indexes = {}   # {name: {"artifacts": {relpath: entry}, "scanned_at": float}}
+_projects = {}  # {name: projects_dir} of projects being indexed
+# Only the indexer thread touches _dirs
+_dirs = {}      # {name: {"globs": [...], "dirs": {dir path: {"mtime": ns, "files": [path], "subdirs": [path]}}}}
+_wake = threading.Event()
+_lock = threading.Lock()
+_thread = None
+
+
+def _parse_step(filename):
+    """Pull a training step out of a checkpoint filename, e.g. model_step1200.pt -> 1200."""
+    stem = os.path.splitext(filename)[0]
+    m = _STEP_RE.search(stem)
+    if m:
+        return int(m.group(1))
+    numbers = _NUMBER_RE.findall(stem)
+    if numbers:
+        return int(numbers[-1])
+    return None
+
+
+def _matches(relpath, patterns):
+    """Patterns without a slash match the basename, others the whole relative path."""
+    basename = os.path.basename(relpath)
+    for pattern in patterns:
+        if "/" not in pattern:
+            if fnmatch.fnmatch(basename, pattern):
+                return True
+        elif fnmatch.fnmatch(relpath, pattern):
+            return True
+        elif pattern.startswith("**/") and fnmatch.fnmatch(relpath, pattern[3:]):
+            return True
+    return False
+
+
+def _load_globs(projects_dir, name):
+    config_path = os.path.join(projects_dir, name, "project.json")
+    with open(config_path) as f:
+        project = json.load(f)
+    return project.get("artifact_globs") or DEFAULT_ARTIFACT_GLOBS
+
+
+def _list_dir(path, src_dir, globs):
+    """Matching files and subdirectories of one directory, or None if it can't be read."""
+    files, subdirs = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in _SKIP_DIRS:
+                            subdirs.append(entry.path)
+                    elif entry.is_file() and _matches(os.path.relpath(entry.path, src_dir), globs):
+                        files.append(entry.path)
+                except OSError:
+                    continue
+    except OSError:
+        return None
+    return files, subdirs
+
+
+def _scan(projects_dir, name, globs):
+    """Refresh a project's index, reusing entries whose size and mtime are unchanged."""
+    src_dir = os.path.join(projects_dir, name, "src")
+    with _lock:
+        previous = dict(_indexes.get(name, {}).get("artifacts", {}))
+    cache = _dirs.get(name)
+    if cache is None or cache["globs"] != globs:
+        cache = _dirs[name] = {"globs": list(globs), "dirs": {}}
+    dirs = cache["dirs"]
+
+    found = {}
+    changed = []
+    seen = set()
+    stack = [src_dir]
+    while stack:
+        current = stack.pop()
+        try:
+            mtime = os.stat(current).st_mtime_ns
+        except OSError:
+            continue
+        cached = dirs.get(current)
+        if cached is None or cached["mtime"] != mtime:
+            listing = _list_dir(current, src_dir, globs)
+            if listing is None:
+                continue
+            cached = dirs[current] = {"mtime": mtime, "files": listing[0], "subdirs": listing[1]}
+        seen.add(current)
+        stack.extend(cached["subdirs"])
+
+        for path in cached["files"]:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            relpath = os.path.relpath(path, src_dir)
+            old = previous.get(relpath)
+            if old and old["size"] == st.st_size and old["mtime"] == st.st_mtime:
+                found[relpath] = old
+                continue
+            item = {
+                "path": relpath,
+                "size": st.st_size,
+                "mtime": st.st_mtime,
+                "step": _parse_step(os.path.basename(path)),
+                "run_id": None,
+            }
+            found[relpath] = item
+            changed.append(item)
+
+    for path in list(dirs):
+        if path not in seen:
+            del dirs[path]
+
+    if changed:
+        runs = list_runs(projects_dir, name)
+        for item in changed:
+            item["run_id"] = find_run(runs, item["mtime"])
+
+    with _lock:
+        _indexes[name] = {"artifacts": found, "scanned_at": time.time()}
+
+
+def _forget(name):
+    with _lock:
+        _projects.pop(name, None)
+        _indexes.pop(name, None)
+    _dirs.pop(name, None)
+
+
+def _indexer_loop():
+    """Background thread that keeps every project's artifact index fresh."""
+    while True:
+        _wake.clear()
+        with _lock:
+            projects = list(_projects.items())
+        for name, projects_dir in projects:
+            if not os.path.isfile(os.path.join(projects_dir, name, "project.json")):
+                _forget(name)
+                continue
+            try:
+                _scan(projects_dir, name, _load_globs(projects_dir, name))
+            except Exception as e:
+                log.warning("Artifact scan failed for %s: %s", name, e)
+        _wake.wait(_SCAN_INTERVAL)
+
+
+def ensure_indexer(projects_dir, name):
+    """Index a project if it isn't already, starting the indexer thread if needed."""
+    global _thread
+    with _lock:
+        if name in _projects and _thread:
+            return
+        _projects[name] = projects_dir
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_indexer_loop, daemon=True)
+            _thread.start()
+    _wake.set()
+
+
+def start_indexers(projects_dir):
+    """Index every existing project."""
+    if not os.path.isdir(projects_dir):
+        return
+    for name in os.listdir(projects_dir):
+        if os.path.isfile(os.path.join(projects_dir, name, "project.json")):
+            ensure_indexer(projects_dir, name)
+
+
+def get_artifacts(name):
+    """Return the indexed artifacts for a project, newest first, or None if not scanned yet."""
+    with _lock:
+        index = _indexes.get(name)
+        if index is None:
+            return None
+        artifacts = sorted(index["artifacts"].values(),
+                           key=lambda a: a["mtime"], reverse=True)
+        return {"scanned_at": index["scanned_at"], "artifacts": artifacts}
+
+
+def get_latest(name):
+    """Return the most recently written artifact, or None."""
+    with _lock:
+        index = _indexes.get(name)
+        if not index or not index["artifacts"]:
+            return None
+        return max(index["artifacts"].values(), key=lambda a: a["mtime"])
@@ -0,0 +1,557 @@
+"""Content-addressed, deduplicated store for checkpoints.
+
+Projects opt in with store_globs. Matching files in src/ that have settled
+(not modified for SETTLE_SECONDS, not the project's newest match, which a
+run may resume from, and not written by the run in progress, which may still
+load them) are split into content-defined chunks. Each chunk is
+kept once under STORE_DIR/chunks by its sha256, and the file is replaced by
+a manifest listing its chunks. Identical tensors in different checkpoints,
+runs or projects are then stored once, even when they sit at different
+offsets.
+
+Chunk boundaries come after anchor byte sequences found with the regex
+engine (about one per MiB of high-entropy data), between MIN_CHUNK and
+MAX_CHUNK. A per-byte rolling hash is the textbook way to pick them, but
+runs at a few MB/s in Python; anchors keep ingest at disk speed and still
+resynchronise after inserted or removed bytes.
+
+Manifests live under STORE_DIR/manifests/<instance>/<project>/<path>.json,
+<instance> being a hash of the projects dir, so instances sharing
+BEEKEEPER_HOME share chunks. Chunks no manifest refers to are removed by
+collect(), after a grace period that covers ingests still in flight.
+"""
+import io
+import os
+import re
+import json
+import time
+import bisect
+import shutil
+import hashlib
+import tempfile
+import threading
+import logging
+
+from services.artifact_index import _matches
+from services.metrics import Counter, Gauge
+from services.process_manager import get_training_statuses
+from services.run_history import find_run, list_runs
+
+log = logging.getLogger(__name__)
+
+_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_DIR = os.environ.get("BEEKEEPER_STORE_DIR", os.path.join(_HOME, "store"))
+STORE_INTERVAL = int(os.environ.get("BEEKEEPER_STORE_INTERVAL", "60"))
+SETTLE_SECONDS = int(os.environ.get("BEEKEEPER_STORE_SETTLE", "600"))
+
+MIN_CHUNK = 256 * 1024
+MAX_CHUNK = 8 * 1024 * 1024
+_READ_SIZE = 16 * 1024 * 1024
+_ANCHOR = re.compile(rb"\x8f\x3d[\x00-\x0f]")  # ~16 in 2**24 positions of random data
+_GC_GRACE = 3600  # unreferenced chunks younger than this may belong to an ingest in progress
+_SKIP_DIRS = {"__pycache__", "node_modules", "venv", "wandb"}
+
+INGESTED = Counter("beekeeper_store_ingested", "Files moved into the checkpoint store")
+INGESTED_BYTES = Counter("beekeeper_store_ingested_bytes", "Bytes of files moved into the store")
+NEW_CHUNK_BYTES = Counter("beekeeper_store_new_chunk_bytes", "Bytes of chunks not already stored")
+COLLECTED_BYTES = Counter("beekeeper_store_collected_bytes", "Bytes of unreferenced chunks removed")
+
+_stats = {"files": 0, "logical_bytes": 0, "physical_bytes": 0, "chunks": 0,
+          "projects": {}, "collected_at": None}
+_thread = None
+_wake = threading.Event()
+_lock = threading.Lock()
+
+Gauge("beekeeper_store_logical_bytes", "Size of all stored files",
+      callback=lambda: _stats["logical_bytes"])
+Gauge("beekeeper_store_physical_bytes", "Size of the chunks backing them",
+      callback=lambda: _stats["physical_bytes"])
+
+
+def _instance(projects_dir):
+    return hashlib.sha1(os.path.realpath(projects_dir).encode()).hexdigest()[:12]
+
+
+def _manifest_root(projects_dir, name):
+    return os.path.join(STORE_DIR, "manifests", _instance(projects_dir), name)
+
+
+def _manifest_path(projects_dir, name, relpath):
+    root = _manifest_root(projects_dir, name)
+    path = os.path.normpath(os.path.join(root, relpath + ".json"))
+    if not path.startswith(root + os.sep):
+        return None
+    return path
+
+
+def _pin_path(projects_dir, name, relpath):
+    """Marker for a restored file, which stays in src/ from then on."""
+    path = _manifest_path(projects_dir, name, relpath)
+    return path[:-5] + ".pinned" if path else None
+
+
+def _chunk_path(digest):
+    return os.path.join(STORE_DIR, "chunks", digest[:2], digest)
+
+
+def _cut_points(buf, final):
+    """Chunk lengths for the front of buf; the remainder waits for more data unless final."""
+    lengths = []
+    start = 0
+    while len(buf) - start >= MAX_CHUNK or (final and start < len(buf)):
+        anchor = _ANCHOR.search(buf, start + MIN_CHUNK, start + MAX_CHUNK)
+        end = anchor.end() if anchor else min(start + MAX_CHUNK, len(buf))
+        lengths.append(end - start)
+        start = end
+    return lengths
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dirs(path, top):
+    """fsync path and its parents up to top, so new entries and directories survive a crash."""
+    while True:
+        _fsync_dir(path)
+        if path == top or len(path) <= len(top):
+            return
+        path = os.path.dirname(path)
+
+
+def _put_chunk(data):
+    """Store a chunk, its data on disk; the caller fsyncs its directory (_chunk_dirs)."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = _chunk_path(digest)
+    if os.path.exists(path):
+        os.utime(path)  # keep it clear of a concurrent collect()
+        return digest, False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except:
+        os.unlink(tmp_path)
+        raise
+    return digest, True
+
+
+def _write_manifest(path, manifest):
+    """Write a manifest durably: data, directory entry and any new parent directories."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except:
+        os.unlink(tmp_path)
+        raise
+    _fsync_dirs(os.path.dirname(path), os.path.join(STORE_DIR, "manifests"))
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def ingest(projects_dir, name, relpath, run_id=None):
+    """Move one file from src/ into the store. Returns the manifest, or None if
+    the file changed while it was read (it is left alone and retried later)."""
+    src_path = os.path.join(projects_dir, name, "src", relpath)
+    manifest_path = _manifest_path(projects_dir, name, relpath)
+    if manifest_path is None:
+        return None
+    before = os.stat(src_path)
+    chunks = []
+    chunk_dirs = set()
+    new_bytes = 0
+    whole = hashlib.sha256()
+    with open(src_path, "rb") as f:
+        buf = b""
+        while True:
+            block = f.read(_READ_SIZE)
+            buf += block
+            whole.update(block)
+            start = 0
+            for length in _cut_points(buf, final=not block):
+                digest, new = _put_chunk(buf[start:start + length])
+                chunks.append([digest, length])
+                chunk_dirs.add(os.path.dirname(_chunk_path(digest)))
+                new_bytes += length if new else 0
+                start += length
+            buf = buf[start:]
+            if not block:
+                break
+    after = os.stat(src_path)
+    if (after.st_size, after.st_mtime_ns) != (before.st_size, before.st_mtime_ns):
+        return None
+
+    manifest = {
+        "path": relpath,
+        "size": after.st_size,
+        "mtime": after.st_mtime,
+        "sha256": whole.hexdigest(),
+        "run_id": run_id,
+        "chunks": chunks,
+        "stored_at": time.time(),
+    }
+    # The file in src/ may be the only copy: everything it now lives in must be on disk first
+    for path in chunk_dirs:
+        _fsync_dir(path)
+    _fsync_dir(os.path.join(STORE_DIR, "chunks"))
+    _write_manifest(manifest_path, manifest)
+    os.unlink(src_path)
+    INGESTED.inc()
+    INGESTED_BYTES.inc(after.st_size)
+    NEW_CHUNK_BYTES.inc(new_bytes)
+    log.info("Stored %s/%s: %d bytes in %d chunks, %d new", name, relpath,
+             after.st_size, len(chunks), new_bytes)
+    return manifest
+
+
+def _candidates(src_dir, globs):
+    """(mtime, relpath) of every file under src_dir matching globs."""
+    found = []
+    stack = [src_dir]
+    while stack:
+        current = stack.pop()
+        try:
+            it = os.scandir(current)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in _SKIP_DIRS:
+                            stack.append(entry.path)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    relpath = os.path.relpath(entry.path, src_dir)
+                    if _matches(relpath, globs):
+                        found.append((entry.stat().st_mtime, relpath))
+                except OSError:
+                    continue
+    return found
+
+
+def ingest_project(projects_dir, project):
+    """Store every settled file matching the project's store_globs."""
+    globs = project.get("store_globs") or []
+    if not globs:
+        return 0
+    name = project["name"]
+    training = get_training_statuses([name])[name]
+    if training["status"] == "starting":
+        return 0
+    found = sorted(_candidates(os.path.join(projects_dir, name, "src"), globs))
+    cutoff = time.time() - SETTLE_SECONDS
+    if training["status"] == "running":
+        # A script may torch.load() what it wrote earlier, e.g. best.pt at the end
+        cutoff = min(cutoff, training["started_at"])
+    runs = None
+    stored = 0
+    for mtime, relpath in found[:-1]:  # the newest stays for resuming
+        if mtime > cutoff or os.path.exists(_pin_path(projects_dir, name, relpath)):
+            continue
+        if runs is None:
+            runs = list_runs(projects_dir, name)
+        try:
+            if ingest(projects_dir, name, relpath, find_run(runs, mtime)):
+                stored += 1
+        except OSError as e:
+            log.warning("Could not store %s/%s: %s", name, relpath, e)
+    return stored
+
+
+def _manifests(root):
+    """(path, manifest) for every manifest under root."""
+    for dirpath, dirs, files in os.walk(root):
+        for filename in files:
+            if filename.endswith(".json"):
+                path = os.path.join(dirpath, filename)
+                manifest = _read_manifest(path)
+                if manifest:
+                    yield path, manifest
+
+
+def collect():
+    """Remove chunks no manifest refers to and refresh the space stats."""
+    started = time.time()
+    referenced = {}
+    files = 0
+    logical = 0
+    projects = {}
+    manifests_dir = os.path.join(STORE_DIR, "manifests")
+    for path, manifest in _manifests(manifests_dir):
+        for digest, length in manifest["chunks"]:
+            referenced[digest] = length
+        files += 1
+        logical += manifest["size"]
+        # manifests/<instance>/<project>/...
+        parts = os.path.relpath(path, manifests_dir).split(os.sep)
+        if len(parts) > 2:
+            key = (parts[0], parts[1])
+            projects[key] = projects.get(key, 0) + manifest["size"]
+
+    removed = 0
+    chunks_dir = os.path.join(STORE_DIR, "chunks")
+    for dirpath, dirs, filenames in os.walk(chunks_dir):
+        for filename in filenames:
+            if filename in referenced:
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                st = os.stat(path)
+                if st.st_mtime < started - _GC_GRACE:
+                    os.unlink(path)
+                    removed += st.st_size
+            except OSError:
+                continue
+    if removed:
+        COLLECTED_BYTES.inc(removed)
+        log.info("Store collected %d bytes of unreferenced chunks", removed)
+
+    with _lock:
+        _stats.update({
+            "files": files,
+            "logical_bytes": logical,
+            "physical_bytes": sum(referenced.values()),
+            "chunks": len(referenced),
+            "projects": projects,
+            "collected_at": time.time(),
+        })
+    return removed
+
+
+def stats(projects_dir=None):
+    """Space used and saved, as of the last collect(). With projects_dir,
+    per-project logical sizes are limited to that instance."""
+    with _lock:
+        out = {k: v for k, v in _stats.items() if k != "projects"}
+        instance = _instance(projects_dir) if projects_dir else None
+        out["projects"] = {name: size for (inst, name), size in _stats["projects"].items()
+                           if instance is None or inst == instance}
+    out["saved_bytes"] = out["logical_bytes"] - out["physical_bytes"]
+    out["dedup_ratio"] = (round(out["logical_bytes"] / out["physical_bytes"], 2)
+                          if out["physical_bytes"] else None)
+    return out
+
+
+def list_files(projects_dir, name, subdir=""):
+    """Stored files and directories directly under subdir of a project's src/:
+    ({filename: manifest}, {dirname, ...})."""
+    root = _manifest_root(projects_dir, name)
+    target = os.path.normpath(os.path.join(root, subdir)) if subdir else root
+    if target != root and not target.startswith(root + os.sep):
+        return {}, set()
+    files, dirs = {}, set()
+    try:
+        it = os.scandir(target)
+    except OSError:
+        return files, dirs
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                dirs.add(entry.name)
+            elif entry.name.endswith(".json"):
+                manifest = _read_manifest(entry.path)
+                if manifest:
+                    files[entry.name[:-5]] = manifest
+    return files, dirs
+
+
+def all_files(projects_dir, name, subdir=""):
+    """Every stored manifest of a project, optionally under subdir."""
+    root = _manifest_root(projects_dir, name)
+    target = os.path.normpath(os.path.join(root, subdir)) if subdir else root
+    if target != root and not target.startswith(root + os.sep):
+        return []
+    return [manifest for _, manifest in _manifests(target)]
+
+
+def get_file(projects_dir, name, relpath):
+    """Manifest of a stored file, or None."""
+    path = _manifest_path(projects_dir, name, relpath)
+    return _read_manifest(path) if path else None
+
+
+class StoredFile(io.RawIOBase):
+    """Seekable read-only file over a manifest's chunks."""
+
+    def __init__(self, manifest):
+        self.chunks = manifest["chunks"]
+        self.size = manifest["size"]
+        self.offsets = []
+        offset = 0
+        for _, length in self.chunks:
+            self.offsets.append(offset)
+            offset += length
+        self.position = 0
+        self._current = None  # (index, open file)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def readinto(self, b):
+        if self.position >= self.size:
+            return 0
+        index = bisect.bisect_right(self.offsets, self.position) - 1
+        if not self._current or self._current[0] != index:
+            self._close_chunk()
+            self._current = (index, open(_chunk_path(self.chunks[index][0]), "rb"))
+        f = self._current[1]
+        f.seek(self.position - self.offsets[index])
+        n = f.readinto(memoryview(b)[:self.chunks[index][1] - (self.position - self.offsets[index])])
+        if not n:
+            raise OSError(f"Chunk {self.chunks[index][0]} is truncated")
+        self.position += n
+        return n
+
+    def _close_chunk(self):
+        if self._current:
+            self._current[1].close()
+            self._current = None
+
+    def close(self):
+        self._close_chunk()
+        super().close()
+
+
+def open_file(manifest):
+    """Buffered binary file object for a stored file."""
+    return io.BufferedReader(StoredFile(manifest), buffer_size=1024 * 1024)
+
+
+def restore(projects_dir, name, relpath):
+    """Write a stored file back into src/ for good and drop it from the store."""
+    manifest = get_file(projects_dir, name, relpath)
+    if manifest is None:
+        return {"error": f"{relpath} is not in the store"}
+    dest = os.path.join(projects_dir, name, "src", relpath)
+    if os.path.exists(dest):
+        return {"error": f"{relpath} already exists in src/"}
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out, open_file(manifest) as src:
+            shutil.copyfileobj(src, out, 1024 * 1024)
+            out.flush()
+            os.fsync(out.fileno())
+        os.utime(tmp_path, (manifest["mtime"], manifest["mtime"]))
+        os.replace(tmp_path, dest)
+    except:
+        os.unlink(tmp_path)
+        raise
+    _fsync_dir(os.path.dirname(dest))  # before the manifest, the other copy, goes
+    manifest_path = _manifest_path(projects_dir, name, relpath)
+    with open(_pin_path(projects_dir, name, relpath), "w"):
+        pass
+    os.unlink(manifest_path)
+    _wake.set()
+    return {"path": relpath, "size": manifest["size"]}
+
+
+def forget(projects_dir, name, run_id=None, relpath=None, run_ids=None):
+    """Delete stored files of a run, of several (run_ids) or one file; their
+    chunks go at the next collect()."""
+    removed = 0
+    if relpath is not None:
+        path = _manifest_path(projects_dir, name, relpath)
+        targets = [path] if path and os.path.isfile(path) else []
+    else:
+        run_ids = set(run_ids) if run_ids is not None else {run_id}
+        targets = [path for path, manifest in _manifests(_manifest_root(projects_dir, name))
+                   if manifest.get("run_id") in run_ids]
+    for path in targets:
+        try:
+            os.unlink(path)
+            removed += 1
+        except OSError:
+            pass
+    if removed:
+        _wake.set()
+    return removed
+
+
+def drop_project(projects_dir, name):
+    """Forget everything stored for a deleted project."""
+    root = _manifest_root(projects_dir, name)
+    if os.path.isdir(root):
+        shutil.rmtree(root, ignore_errors=True)
+        _wake.set()
+
+
+def copy_project(projects_dir, source, target):
+    """Give a forked project the source's stored files. Only manifests are copied."""
+    root = _manifest_root(projects_dir, source)
+    if not os.path.isdir(root):
+        return 0
+    shutil.copytree(root, _manifest_root(projects_dir, target), dirs_exist_ok=True)
+    return sum(1 for _ in _manifests(_manifest_root(projects_dir, target)))
+
+
+def _projects(projects_dir):
+    out = []
+    if not os.path.isdir(projects_dir):
+        return out
+    for name in sorted(os.listdir(projects_dir)):
+        try:
+            with open(os.path.join(projects_dir, name, "project.json")) as f:
+                out.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+def _loop(projects_dir):
+    while True:
+        _wake.clear()
+        try:
+            for project in _projects(projects_dir):
+                ingest_project(projects_dir, project)
+            collect()
+        except Exception as e:
+            log.warning("Store pass failed: %s", e)
+        _wake.wait(STORE_INTERVAL)
+
+
+def start_store(projects_dir):
+    """Start the background ingest/collect thread (once)."""
+    global _thread
+    with _lock:
+        if _thread and _thread.is_alive():
+            return
+        _thread = threading.Thread(target=_loop, args=(projects_dir,), daemon=True)
+        _thread.start()
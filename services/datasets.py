@@ -0,0 +1,244 @@
+"""Shared dataset directory and pre-run staging.
+
+Every run gets BEEKEEPER_DATASETS_DIR pointing at one directory shared by all
+projects, with HF_HOME and TORCH_HOME inside it, so a dataset or model
+downloaded by one project is reused by the others instead of landing in each
+project's src/. Project env vars and the server's own environment win.
+
+A project can also list dataset paths to stage before its run starts:
+"warm" reads them once so the first epoch hits the page cache, "copy"
+copies them to fast local scratch (BEEKEEPER_SCRATCH_DIR), skipping files
+already there with the same size and mtime. Files are read by a thread pool,
+since one reader rarely saturates NVMe or a network filesystem.
+"""
+import os
+import time
+import shutil
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from services.metrics import Histogram
+
+log = logging.getLogger(__name__)
+
+_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASETS_DIR = os.environ.get("BEEKEEPER_DATASETS_DIR", os.path.join(_HOME, "datasets"))  # empty disables
+SCRATCH_DIR = os.environ.get("BEEKEEPER_SCRATCH_DIR", "")
+STAGE_WORKERS = int(os.environ.get("BEEKEEPER_STAGE_WORKERS", "8"))
+STAGE_TIMEOUT = 600  # seconds, unless the project sets its own
+MODES = ("warm", "copy")
+_READ_SIZE = 1024 * 1024
+
+STAGE_SECONDS = Histogram(
+    "beekeeper_dataset_stage_seconds", "Dataset staging before a run starts", ["mode", "outcome"])
+
+
+def run_env(env):
+    """Point a run's dataset and model caches at the shared directory."""
+    if not DATASETS_DIR:
+        return env
+    os.makedirs(DATASETS_DIR, exist_ok=True)
+    env.setdefault("BEEKEEPER_DATASETS_DIR", DATASETS_DIR)
+    env.setdefault("HF_HOME", os.path.join(DATASETS_DIR, "huggingface"))
+    env.setdefault("TORCH_HOME", os.path.join(DATASETS_DIR, "torch"))
+    if SCRATCH_DIR:
+        env.setdefault("BEEKEEPER_SCRATCH_DIR", SCRATCH_DIR)
+    return env
+
+
+def resolve(path):
+    """Absolute path of a configured dataset path; relative ones are in the shared directory."""
+    path = os.path.expanduser(path)
+    if not os.path.isabs(path):
+        path = os.path.join(DATASETS_DIR or _HOME, path)
+    return os.path.normpath(path)
+
+
+def scratch_path(path):
+    """Where copy mode puts a dataset: its path under the shared directory, or its name."""
+    source = resolve(path)
+    if DATASETS_DIR and source.startswith(os.path.join(os.path.normpath(DATASETS_DIR), "")):
+        rel = os.path.relpath(source, DATASETS_DIR)
+    else:
+        rel = os.path.basename(source)
+    return os.path.join(SCRATCH_DIR, rel)
+
+
+def validate(datasets):
+    """Check a project's datasets dict. Returns an error message or None."""
+    mode = datasets.get("mode") or "warm"
+    if mode not in MODES:
+        return f"Staging mode must be one of {', '.join(MODES)}"
+    if mode == "copy" and datasets.get("stage"):
+        if not SCRATCH_DIR:
+            return "Copy mode needs BEEKEEPER_SCRATCH_DIR set on the server"
+        targets = [scratch_path(p) for p in datasets["stage"]]
+        if len(set(targets)) != len(targets):
+            return "Two staged paths would be copied to the same scratch directory"
+    try:
+        if datasets.get("timeout") not in (None, "") and float(datasets["timeout"]) <= 0:
+            return "Staging timeout must be positive"
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def _files(source, target):
+    """(source file, target file or None, size) for every file under source."""
+    if os.path.isfile(source):
+        yield source, target, os.path.getsize(source)
+        return
+    for root, _, names in os.walk(source):
+        for filename in names:
+            path = os.path.join(root, filename)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            dest = os.path.join(target, os.path.relpath(path, source)) if target else None
+            yield path, dest, size
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _warm(path, expired):
+    buf = bytearray(_READ_SIZE)
+    with open(path, "rb", buffering=0) as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while f.readinto(buf):
+            if expired():
+                raise _Timeout()
+
+
+def _copy(path, dest, expired):
+    st = os.stat(path)
+    try:
+        existing = os.stat(dest)
+        if existing.st_size == st.st_size and existing.st_mtime_ns == st.st_mtime_ns:
+            return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    # Runs of other projects may stage the same dataset; they only ever see whole files
+    tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(path, "rb") as src, open(tmp, "wb") as out:
+            while True:
+                chunk = src.read(_READ_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+                if expired():
+                    raise _Timeout()
+        shutil.copystat(path, tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return True
+
+
+def stage(project, cancelled=None):
+    """Warm or copy a project's configured dataset paths before its run starts.
+
+    Returns a summary dict, {} if there is nothing to stage, or a dict with
+    "error". Running out of time only fails copy mode; a partly warmed cache
+    is still a warmer one. cancelled(), if given, stops staging early like
+    the timeout does.
+    """
+    config = project.get("datasets") or {}
+    paths = config.get("stage") or []
+    if not paths:
+        return {}
+    mode = config.get("mode") or "warm"
+    timeout = float(config.get("timeout") or STAGE_TIMEOUT)
+    started = time.monotonic()
+    deadline = started + timeout
+
+    jobs, missing = [], []
+    for path in paths:
+        source = resolve(path)
+        if not os.path.exists(source):
+            missing.append(path)
+            continue
+        target = scratch_path(path) if mode == "copy" else None
+        jobs.extend(_files(source, target))
+    if missing and mode == "copy":
+        return {"error": f"Dataset path not found: {', '.join(missing)}"}
+
+    def expired():
+        return time.monotonic() > deadline or bool(cancelled and cancelled())
+
+    done = {"files": 0, "bytes": 0, "copied": 0}
+    done_lock = threading.Lock()
+    timed_out = threading.Event()
+
+    def work(job):
+        path, dest, size = job
+        if timed_out.is_set():
+            return
+        try:
+            if mode == "copy":
+                copied = _copy(path, dest, expired)
+            else:
+                _warm(path, expired)
+                copied = False
+        except _Timeout:
+            timed_out.set()
+            return
+        with done_lock:
+            done["files"] += 1
+            done["bytes"] += size
+            done["copied"] += copied
+
+    # Biggest first, so one large file doesn't start last and hold up the rest
+    jobs.sort(key=lambda job: job[2], reverse=True)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, STAGE_WORKERS)) as pool:
+            for _ in pool.map(work, jobs):
+                pass
+    except OSError as e:
+        STAGE_SECONDS.observe(time.monotonic() - started, mode=mode, outcome="error")
+        return {"error": f"Staging datasets failed: {e}"}
+    STAGE_SECONDS.observe(time.monotonic() - started, mode=mode,
+                          outcome="timeout" if timed_out.is_set() else "ok")
+
+    if timed_out.is_set() and mode == "copy":
+        return {"error": f"Copying datasets to scratch timed out ({timeout:.0f}s); "
+                         f"start again to resume"}
+    summary = {
+        "mode": mode,
+        "files": done["files"],
+        "total_files": len(jobs),
+        "bytes": done["bytes"],
+        "seconds": round(time.monotonic() - started, 1),
+        "timed_out": timed_out.is_set(),
+        "missing": missing,
+    }
+    if mode == "copy":
+        summary["copied"] = done["copied"]
+    log.info("Staged datasets for %s: %s", project.get("name"), summary)
+    return summary
+
+
+def describe(summary):
+    """One line for the run's log."""
+    verb = "warmed" if summary["mode"] == "warm" else "staged to scratch"
+    size = summary["bytes"]
+    size = f"{size / 1024 ** 3:.1f} GiB" if size >= 1024 ** 3 else f"{size / 1024 ** 2:.1f} MiB"
+    line = (f"[beekeeper] {verb} {size} "
+            f"({summary['files']}/{summary['total_files']} files) in {summary['seconds']}s")
+    if summary.get("copied") is not None:
+        line += f", {summary['copied']} copied"
+    if summary["timed_out"]:
+        line += ", stopped at the staging timeout"
+    if summary["missing"]:
+        line += f"; not found: {', '.join(summary['missing'])}"
+    return line + "\n"
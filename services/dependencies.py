@@ -0,0 +1,159 @@
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import subprocess
+import logging
+
+from services.metrics import Histogram
+from services.wheelhouse import pip_install
+
+log = logging.getLogger(__name__)
+
+RESYNC_SECONDS = Histogram(
+    "beekeeper_dependency_resync_seconds", "Dependency resync on run start", ["result"])
+
+# Options that only steer where pip looks; they are carried into partial installs
+_INDEX_OPTIONS = ("--index-url", "-i", "--extra-index-url", "--find-links", "-f",
+                  "--trusted-host", "--pre", "--only-binary", "--no-binary", "--prefer-binary")
+# "name[extras] <specifier> ; marker": the form pip accepts as a constraint, minus the extras
+_SPECIFIED = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*((?:[=<>!~]=?|===)[^;]+?)\s*(;.*)?$")
+
+
+def _state_path(projects_dir, name):
+    return os.path.join(projects_dir, name, "deps.json")
+
+
+def _read_lines(req_path, seen=None):
+    """Normalised requirement lines, with nested -r/-c files inlined."""
+    seen = seen or set()
+    real = os.path.realpath(req_path)
+    if real in seen:
+        return []
+    seen.add(real)
+    lines = []
+    with open(req_path) as f:
+        for raw in f:
+            line = raw.split(" #", 1)[0].strip()
+            if not line or line.startswith("#"):
+                continue
+            lines.append(line)
+            for flag in ("-r", "--requirement", "-c", "--constraint"):
+                if line.startswith(flag + " ") or line.startswith(flag + "="):
+                    nested = line[len(flag):].lstrip(" =")
+                    nested_path = os.path.join(os.path.dirname(req_path), nested)
+                    if os.path.isfile(nested_path):
+                        lines.extend(_read_lines(nested_path, seen))
+    return lines
+
+
+def _hash(lines):
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+
+def _load_state(projects_dir, name):
+    try:
+        with open(_state_path(projects_dir, name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def record_installed(projects_dir, name, req_path, seconds=None, installed=None):
+    """Remember what the environment was last synced against."""
+    lines = _read_lines(req_path) if os.path.isfile(req_path) else []
+    state = {
+        "hash": _hash(lines),
+        "lines": lines,
+        "synced_at": time.time(),
+        "seconds": round(seconds, 2) if seconds is not None else None,
+        "installed": installed,
+    }
+    path = _state_path(projects_dir, name)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, path)
+    except:
+        os.unlink(tmp_path)
+        raise
+
+
+def _partial_args(req_path, changed, tmp_dir):
+    """Requirement args installing only the changed lines, or None if a full install is needed.
+
+    The unchanged lines that pin or bound a version go in as constraints, so
+    resolving the new lines can't move a package the rest of the file fixes.
+    """
+    for line in changed:
+        if line.startswith("-") or "/" in line or "@" in line:
+            return None  # options, paths and URLs: let pip see the whole file
+    lines = _read_lines(req_path)
+    options = [line for line in lines if line.split("=")[0].split()[0] in _INDEX_OPTIONS]
+    constraints = []
+    for line in lines:
+        m = _SPECIFIED.match(line)
+        if m and line not in changed:
+            constraints.append(m.group(1) + m.group(2).strip() + (m.group(3) or ""))
+    partial = os.path.join(tmp_dir, "requirements-changed.txt")
+    with open(partial, "w") as f:
+        f.write("\n".join(options + changed) + "\n")
+    args = ["-r", partial]
+    if constraints:
+        pinned = os.path.join(tmp_dir, "constraints-unchanged.txt")
+        with open(pinned, "w") as f:
+            f.write("\n".join(constraints) + "\n")
+        args += ["-c", pinned]
+    return args
+
+
+def sync_requirements(projects_dir, project, python_bin):
+    """Bring a ready environment in line with the requirements file after a pull.
+
+    Does nothing if the file is unchanged since the last install; otherwise
+    installs only added or changed requirement lines, held to the versions
+    the unchanged lines specify. Returns a result dict, with "error" on
+    failure.
+    """
+    name = project["name"]
+    req_path = os.path.join(projects_dir, name, "src", project.get("requirements_file", "requirements.txt"))
+    if not os.path.isfile(req_path):
+        return {"status": "no_requirements"}
+
+    lines = _read_lines(req_path)
+    state = _load_state(projects_dir, name)
+    if state and state.get("hash") == _hash(lines):
+        return {"status": "unchanged"}
+
+    pip_bin = os.path.join(os.path.dirname(python_bin), "pip")
+    started = time.monotonic()
+    with tempfile.TemporaryDirectory(dir=os.path.join(projects_dir, name)) as tmp_dir:
+        if state:
+            previous = set(state.get("lines") or [])
+            changed = [line for line in lines if line not in previous]
+            args = _partial_args(req_path, changed, tmp_dir) if changed else []
+        else:
+            changed = None  # never recorded: reinstall from the file once
+            args = None
+        if args is None:
+            args = ["-r", req_path]
+
+        try:
+            if args:
+                pip_install(pip_bin, args)
+        except subprocess.CalledProcessError as e:
+            RESYNC_SECONDS.observe(time.monotonic() - started, result="error")
+            return {"error": f"Dependency resync failed: {e.stderr.strip()[-500:]}"}
+        except subprocess.TimeoutExpired as e:
+            RESYNC_SECONDS.observe(time.monotonic() - started, result="error")
+            return {"error": f"Dependency resync timed out ({int(e.timeout)}s)"}
+
+    seconds = time.monotonic() - started
+    RESYNC_SECONDS.observe(seconds, result="full" if changed is None else "partial")
+    record_installed(projects_dir, name, req_path, seconds, changed)
+    log.info("Resynced dependencies for %s in %.1fs (%s)", name, seconds,
+             "full" if changed is None else ", ".join(changed) or "no new lines")
+    return {"status": "synced", "installed": changed, "seconds": round(seconds, 2)}
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import subprocess
+import threading
+import logging
+
+from services.metrics import Counter
+from services.python_versions import find_available, find_python, _find_conda_bin
+
+log = logging.getLogger(__name__)
+
+_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POOL_DIR = os.environ.get("BEEKEEPER_ENV_POOL_DIR", os.path.join(_HOME, "pool"))
+POOL_SIZE = int(os.environ.get("BEEKEEPER_ENV_POOL_SIZE", "1"))  # per version and kind; 0 disables
+CONDA_POOL_PREFIX = "beekeeper-pool-"
+_REFRESH_INTERVAL = 600  # seconds between pool checks when nothing was claimed
+_RETRY_AFTER = 3600  # don't retry a failing version/kind build more often than this
+
+POOL_CLAIMS = Counter(
+    "beekeeper_env_pool_claims", "Environment requests served from the pool", ["kind", "result"])
+
+_wake = threading.Event()
+_failed = {}  # {(kind, version): time of last failed build}
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def _venv_dir(version):
+    return os.path.join(POOL_DIR, "venv", version)
+
+
+def _conda_dir(version):
+    return os.path.join(POOL_DIR, "conda", version)
+
+
+def _ready_entries(path):
+    """Ready pool entries in a directory; in-progress builds start with a dot."""
+    try:
+        return sorted(e for e in os.listdir(path) if not e.startswith("."))
+    except FileNotFoundError:
+        return []
+
+
+def _relocate(env_dir, old_prefix, new_prefix=None):
+    """Rewrite absolute paths for a venv moved (or about to move) to new_prefix,
+    by default where it is now: script shebangs, activate scripts and
+    pyvenv.cfg all embed the directory the venv was created in."""
+    old, new = old_prefix.encode(), (new_prefix or env_dir).encode()
+    paths = [os.path.join(env_dir, "pyvenv.cfg")]
+    bin_dir = os.path.join(env_dir, "bin")
+    paths += [os.path.join(bin_dir, f) for f in os.listdir(bin_dir)]
+    for path in paths:
+        if os.path.islink(path) or not os.path.isfile(path) or os.path.getsize(path) > 1024 * 1024:
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        if old not in data:
+            continue
+        mode = os.stat(path).st_mode
+        with open(path, "wb") as f:
+            f.write(data.replace(old, new))
+        os.chmod(path, mode)
+
+
+def claim_venv(version, env_dir):
+    """Move a ready pooled venv to env_dir. Returns False if none was available."""
+    pool = _venv_dir(version)
+    os.makedirs(os.path.dirname(env_dir), exist_ok=True)
+    for entry in _ready_entries(pool):
+        source = os.path.join(pool, entry)
+        try:
+            os.rename(source, env_dir)
+        except FileNotFoundError:
+            continue  # claimed by someone else
+        except OSError as e:
+            log.warning("Could not claim pooled venv %s: %s", source, e)
+            break
+        _relocate(env_dir, source)
+        POOL_CLAIMS.inc(kind="venv", result="hit")
+        _wake.set()
+        return True
+    POOL_CLAIMS.inc(kind="venv", result="miss")
+    _wake.set()
+    return False
+
+
+def claim_conda(version, env_name):
+    """Rename a ready pooled conda env to env_name. Returns False if none was available."""
+    conda_bin = _find_conda_bin()
+    pool = _conda_dir(version)
+    for entry in _ready_entries(pool) if conda_bin else []:
+        marker = os.path.join(pool, entry)
+        claimed = os.path.join(pool, f".claimed-{entry}")
+        try:
+            os.rename(marker, claimed)
+        except FileNotFoundError:
+            continue
+        try:
+            subprocess.run(
+                [conda_bin, "rename", "-n", entry, env_name],
+                check=True, capture_output=True, text=True, timeout=300,
+            )
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            log.warning("Could not claim pooled conda env %s: %s", entry, e)
+            _remove_conda(conda_bin, entry)
+            continue
+        finally:
+            os.unlink(claimed)
+        POOL_CLAIMS.inc(kind="conda", result="hit")
+        _wake.set()
+        return True
+    POOL_CLAIMS.inc(kind="conda", result="miss")
+    _wake.set()
+    return False
+
+
+def _remove_conda(conda_bin, env_name):
+    subprocess.run(
+        [conda_bin, "env", "remove", "-y", "-n", env_name],
+        capture_output=True, text=True, timeout=120,
+    )
+
+
+def _build_venv(version):
+    python_bin = find_python(version)
+    if not python_bin:
+        return
+    pool = _venv_dir(version)
+    os.makedirs(pool, exist_ok=True)
+    entry = uuid.uuid4().hex[:12]
+    building = os.path.join(pool, f".building-{entry}")
+    try:
+        subprocess.run(
+            [python_bin, "-m", "venv", building],
+            check=True, capture_output=True, text=True, timeout=120,
+        )
+        # Rewrite the paths first: the rename publishes the entry to claim_venv()
+        ready = os.path.join(pool, entry)
+        _relocate(building, building, ready)
+        os.rename(building, ready)
+    except Exception as e:
+        shutil.rmtree(building, ignore_errors=True)
+        log.warning("Could not build pooled venv for Python %s: %s", version, e)
+
+
+def _build_conda(conda_bin, version):
+    pool = _conda_dir(version)
+    os.makedirs(pool, exist_ok=True)
+    env_name = f"{CONDA_POOL_PREFIX}{version}-{uuid.uuid4().hex[:12]}"
+    try:
+        subprocess.run(
+            [conda_bin, "create", "-y", "-n", env_name, f"python={version}", "pip"],
+            check=True, capture_output=True, text=True, timeout=300,
+        )
+    except Exception as e:
+        log.warning("Could not build pooled conda env for Python %s: %s", version, e)
+        _remove_conda(conda_bin, env_name)
+        return
+    with open(os.path.join(pool, env_name), "w") as f:
+        json.dump({"version": version}, f)
+
+
+def _clear_stale_builds():
+    """Remove builds interrupted by a restart."""
+    for kind in ("venv", "conda"):
+        for version in _ready_entries(os.path.join(POOL_DIR, kind)):
+            path = os.path.join(POOL_DIR, kind, version)
+            for entry in os.listdir(path):
+                if entry.startswith(".building-"):
+                    shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+
+
+def _top_up(kind, version, pool, build):
+    """Build entries until the pool is full. Returns the number built."""
+    if time.time() - _failed.get((kind, version), 0) < _RETRY_AFTER:
+        return 0
+    built = 0
+    while len(_ready_entries(pool)) < POOL_SIZE:
+        before = len(_ready_entries(pool))
+        build()
+        if len(_ready_entries(pool)) == before:
+            _failed[(kind, version)] = time.time()
+            break
+        built += 1
+    return built
+
+
+def replenish():
+    """Top up the pool for every available Python version. Returns entries built."""
+    built = 0
+    conda_bin = _find_conda_bin()
+    for info in find_available():
+        version = info["version"]
+        if info["source"] == "system":
+            built += _top_up("venv", version, _venv_dir(version),
+                             lambda: _build_venv(version))
+        if conda_bin:
+            built += _top_up("conda", version, _conda_dir(version),
+                             lambda: _build_conda(conda_bin, version))
+    return built
+
+
+def _replenisher():
+    _clear_stale_builds()
+    while True:
+        try:
+            built = replenish()
+            if built:
+                log.info("Environment pool: built %d base env(s)", built)
+        except Exception as e:
+            log.warning("Environment pool refresh failed: %s", e)
+        _wake.wait(_REFRESH_INTERVAL)
+        _wake.clear()
+
+
+def start_replenisher():
+    """Start the background thread that keeps the pool full (no-op if disabled)."""
+    global _thread
+    if POOL_SIZE <= 0:
+        return
+    with _thread_lock:
+        if _thread and _thread.is_alive():
+            return
+        _thread = threading.Thread(target=_replenisher, daemon=True)
+        _thread.start()
+
@@ -0,0 +1,252 @@
+"""Columnar export of run history, log metrics, TensorBoard scalars and host stats.
+
+Rows are generated lazily and encoded BATCH_ROWS at a time, so an export can
+be larger than memory. Parquet and Arrow IPC (stream format) need pyarrow;
+CSV always works. Times are unix seconds (float) in every dataset.
+"""
+import io
+import os
+import re
+import csv
+import json
+import time
+import struct
+import datetime
+import importlib.util
+import logging
+
+from services import stats_history, tb_events
+from services.run_history import list_runs
+
+# pyarrow takes a while to import; only exports load it
+_HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+log = logging.getLogger(__name__)
+
+BATCH_ROWS = 50000
+FORMATS = {"parquet": ".parquet", "arrow": ".arrows", "csv": ".csv"}
+_NAME_RE = re.compile(r"^[a-zA-Z0-9_-]+$")  # project names, as at creation
+
+# {dataset: [(column, type)]}; types are pyarrow type names
+SCHEMAS = {
+    "runs": [
+        ("project", "string"), ("run_id", "string"), ("started_at", "float64"),
+        ("ended_at", "float64"), ("exit_code", "int64"), ("commit", "string"),
+        ("steps_per_sec", "float64"), ("samples_per_sec", "float64"),
+        ("last_step", "int64"), ("regression_change_pct", "float64"),
+    ],
+    "metrics": [
+        ("project", "string"), ("run_id", "string"), ("metric", "string"),
+        ("time", "float64"), ("value", "float64"),
+    ],
+    "scalars": [
+        ("project", "string"), ("run", "string"), ("tag", "string"),
+        ("step", "int64"), ("wall_time", "float64"), ("value", "float64"),
+    ],
+    "host": [(c, "float64") for c in stats_history.COLUMNS],
+}
+
+
+def has_pyarrow():
+    return _HAS_PYARROW
+
+
+def parse_time(value):
+    """Unix seconds from a number or an ISO date/datetime (local time). Raises ValueError."""
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid time: {value!r} (use unix seconds or YYYY-MM-DD[THH:MM])") from None
+
+
+def _in_range(t, since, until):
+    return t is not None and (since is None or t >= since) and (until is None or t <= until)
+
+
+def _project_names(projects_dir, projects):
+    if projects:
+        names = [n for n in projects if _NAME_RE.fullmatch(n)]
+    elif os.path.isdir(projects_dir):
+        names = sorted(os.listdir(projects_dir))
+    else:
+        names = []
+    return [n for n in names if os.path.isfile(os.path.join(projects_dir, n, "project.json"))]
+
+
+def _runs(projects_dir, projects, since, until):
+    for name in _project_names(projects_dir, projects):
+        for run in list_runs(projects_dir, name):
+            if not _in_range(run.get("started_at"), since, until):
+                continue
+            yield {
+                "project": name,
+                "run_id": run["run_id"],
+                "started_at": run.get("started_at"),
+                "ended_at": run.get("ended_at"),
+                "exit_code": run.get("exit_code"),
+                "commit": run.get("commit"),
+                "steps_per_sec": run.get("steps_per_sec"),
+                "samples_per_sec": run.get("samples_per_sec"),
+                "last_step": run.get("last_step"),
+                "regression_change_pct": (run.get("regression") or {}).get("change_pct"),
+            }
+
+
+def _metrics(projects_dir, projects, since, until):
+    from services.log_metrics import load_run
+
+    for name in _project_names(projects_dir, projects):
+        for run in list_runs(projects_dir, name):
+            if until is not None and (run.get("started_at") or 0) > until:
+                continue
+            if since is not None and (run.get("ended_at") or time.time()) < since:
+                continue
+            saved = load_run(projects_dir, name, run["run_id"]) or {}
+            for metric, points in saved.get("series", {}).items():
+                for t, value in points:
+                    if _in_range(t, since, until):
+                        yield {"project": name, "run_id": run["run_id"], "metric": metric,
+                               "time": t, "value": value}
+
+
+def _scalars(projects_dir, projects, since, until):
+    for name in _project_names(projects_dir, projects):
+        with open(os.path.join(projects_dir, name, "project.json")) as f:
+            project = json.load(f)
+        logdir = os.path.join(projects_dir, name, "src", project.get("tensorboard_log_dir", "runs"))
+        for run, path in tb_events.event_files(logdir):
+            try:
+                if since is not None and os.path.getmtime(path) < since:
+                    continue  # nothing in it was written after `since`
+                for scalar in tb_events.read_scalars(path):
+                    if _in_range(scalar["wall_time"], since, until):
+                        yield {"project": name, "run": run, **scalar}
+            except (OSError, ValueError, IndexError, struct.error) as e:
+                log.warning("Skipping unreadable event file %s: %s", path, e)
+
+
+def _host(projects_dir, projects, since, until):
+    first = time.strftime("%Y%m%d", time.localtime(since)) if since is not None else ""
+    last = time.strftime("%Y%m%d", time.localtime(until)) if until is not None else "99999999"
+    for day in stats_history.days():
+        if not first <= day <= last:
+            continue
+        try:
+            with open(stats_history.day_path(day)) as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue
+                    if _in_range(row.get("ts"), since, until):
+                        yield row
+        except OSError:
+            continue
+
+
+_ROWS = {"runs": _runs, "metrics": _metrics, "scalars": _scalars, "host": _host}
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _Sink:
+    """Write-only file object that hands back what was written since the last take()."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.buffer.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = self.buffer.getvalue()
+        self.buffer = io.BytesIO()
+        return data
+
+
+def _csv_chunks(columns, rows):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    for batch in _batches(rows):
+        for row in batch:
+            writer.writerow(["" if row.get(c) is None else row.get(c) for c in columns])
+        yield out.getvalue().encode()
+        out.seek(0)
+        out.truncate()
+    if out.tell():
+        yield out.getvalue().encode()
+
+
+def _arrow_chunks(schema_spec, fmt, rows):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(c, getattr(pa, t)()) for c, t in schema_spec])
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema) if fmt == "parquet" else pa.ipc.new_stream(sink, schema)
+    with writer:
+        for batch in _batches(rows):
+            table = pa.Table.from_pylist(batch, schema=schema)
+            writer.write_table(table)
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    yield sink.take()
+
+
+def validate(dataset, fmt, projects=None):
+    """Error message for an unsupported dataset/format or a malformed project name, or None."""
+    for name in projects or ():
+        if not _NAME_RE.fullmatch(name):
+            return f"Invalid project name {name!r}"
+    if dataset not in SCHEMAS:
+        return f"Unknown dataset {dataset!r}; choose from {', '.join(SCHEMAS)}"
+    if fmt not in FORMATS:
+        return f"Unknown format {fmt!r}; choose from {', '.join(FORMATS)}"
+    if fmt != "csv" and not _HAS_PYARROW:
+        return f"{fmt} export needs pyarrow (pip install pyarrow); use format=csv"
+    return None
+
+
+def stream(projects_dir, dataset, fmt="parquet", projects=None, since=None, until=None):
+    """Yield the encoded export as byte chunks, one batch of rows at a time."""
+    rows = _ROWS[dataset](projects_dir, projects, since, until)
+    if fmt == "csv":
+        return _csv_chunks([c for c, _ in SCHEMAS[dataset]], rows)
+    return _arrow_chunks(SCHEMAS[dataset], fmt, rows)
@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import subprocess
+import threading
+import logging
+
+from services.metrics import Histogram
+
+log = logging.getLogger(__name__)
+
+_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIRRORS_DIR = os.environ.get("BEEKEEPER_GIT_MIRRORS", os.path.join(_HOME, "mirrors"))
+FETCH_INTERVAL = int(os.environ.get("BEEKEEPER_MIRROR_FETCH_INTERVAL", "300"))
+PULL_MAX_AGE = int(os.environ.get("BEEKEEPER_MIRROR_MAX_AGE", "60"))  # refetch on run start if older
+MIRROR_CLONE_TIMEOUT = 1800
+FETCH_TIMEOUT = 300
+CLONE_MODES = ("full", "shallow", "blobless")
+
+MIRROR_FETCH_SECONDS = Histogram(
+    "beekeeper_git_mirror_fetch_seconds", "Fetches into shared git mirrors", ["outcome"])
+
+_locks = {}       # {url: Lock} so concurrent fetches of one remote coalesce
+_fetched_at = {}  # {url: time.time() of the last successful fetch}
+_lock = threading.Lock()
+_fetcher = None
+
+
+def mirror_path(url):
+    return os.path.join(MIRRORS_DIR, hashlib.sha1(url.encode()).hexdigest()[:16] + ".git")
+
+
+def _url_lock(url):
+    with _lock:
+        return _locks.setdefault(url, threading.Lock())
+
+
+def _git(args, timeout, cwd=None, run=None):
+    """Run git, captured, or through run (e.g. setup_log.runner()) with progress shown."""
+    if run:
+        if args[0] in ("clone", "fetch"):
+            args = [args[0], "--progress", *args[1:]]
+        return run(["git", *args], timeout=timeout, cwd=cwd)
+    return subprocess.run(
+        ["git", *args], cwd=cwd,
+        check=True, capture_output=True, text=True, timeout=timeout,
+    )
+
+
+def ensure_mirror(url, run=None):
+    """Create the bare mirror for a remote if it doesn't exist yet. Returns its path.
+
+    Raises CalledProcessError / TimeoutExpired if the initial clone fails.
+    """
+    path = mirror_path(url)
+    with _url_lock(url):
+        if os.path.isdir(path):
+            return path
+        os.makedirs(MIRRORS_DIR, exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        try:
+            with MIRROR_FETCH_SECONDS.time():
+                _git(["clone", "--mirror", url, tmp_path], MIRROR_CLONE_TIMEOUT, run=run)
+            # Project clones borrow objects from the mirror, so it must never prune them
+            _git(["config", "gc.pruneExpire", "never"], 30, cwd=tmp_path)
+            try:
+                os.rename(tmp_path, path)
+            except OSError:
+                if not os.path.isdir(path):
+                    raise
+                # Another Beekeeper sharing the mirrors dir finished first
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                return path
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        with _lock:
+            _fetched_at[url] = time.time()
+        log.info("Created git mirror for %s", url)
+        return path
+
+
+def fetch(url, max_age=0, run=None):
+    """Fetch the remote into its mirror unless that happened within max_age seconds.
+
+    Callers that arrive while a fetch is running wait for it instead of
+    starting another. Returns True if the mirror is fresh enough.
+    """
+    path = mirror_path(url)
+    if not os.path.isdir(path):
+        return False
+    with _url_lock(url):
+        with _lock:
+            fetched_at = _fetched_at.get(url, 0)
+        if time.time() - fetched_at <= max_age:
+            return True
+        try:
+            with MIRROR_FETCH_SECONDS.time():
+                _git(["fetch", "--prune", "origin"], FETCH_TIMEOUT, cwd=path, run=run)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            log.warning("Mirror fetch failed for %s: %s", url, e)
+            return False
+        with _lock:
+            _fetched_at[url] = time.time()
+        return True
+
+
+def clone(url, branch, src_dir, mode="full", timeout=300, run=None):
+    """Clone a project's source.
+
+    full: clone through the shared mirror, borrowing its objects (--reference).
+    shallow / blobless: --depth 1 / --filter=blob:none straight from the remote,
+    for huge repos that aren't worth mirroring in full.
+    If the mirror can't be created or cloned from (disk full, timeout), full
+    clones fall back to a plain clone from the remote.
+    """
+    if mode == "shallow":
+        return _git(["clone", "--depth", "1", "-b", branch, url, src_dir], timeout, run=run)
+    if mode == "blobless":
+        return _git(["clone", "--filter=blob:none", "-b", branch, url, src_dir], timeout, run=run)
+    try:
+        mirror = ensure_mirror(url, run=run)
+        fetch(url, max_age=PULL_MAX_AGE, run=run)
+        _git(["clone", "--reference", mirror, "-b", branch, mirror, src_dir], timeout, run=run)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+        log.warning("Cloning %s through its mirror failed, cloning directly: %s", url, e)
+        shutil.rmtree(src_dir, ignore_errors=True)
+        return _git(["clone", "-b", branch, url, src_dir], timeout, run=run)
+    return _git(["remote", "set-url", "origin", url], 30, cwd=src_dir)
+
+
+def pull_source(project):
+    """Where a run-start `git pull` should pull from: the mirror for full clones
+    (refreshed if stale), otherwise the project's origin."""
+    url = project.get("git_url")
+    if not url or project.get("clone_mode", "full") != "full":
+        return "origin"
+    if not os.path.isdir(mirror_path(url)):
+        # Project cloned before mirrors existed; build one for next time
+        threading.Thread(target=_ensure_quietly, args=(url,), daemon=True).start()
+        return "origin"
+    if not fetch(url, max_age=PULL_MAX_AGE):
+        return "origin"  # let the pull report why the remote is unreachable
+    return mirror_path(url)
+
+
+def _ensure_quietly(url):
+    try:
+        ensure_mirror(url)
+    except Exception as e:
+        log.warning("Could not create git mirror for %s: %s", url, e)
+
+
+def _mirrored_urls(projects_dir):
+    urls = set()
+    if not os.path.isdir(projects_dir):
+        return urls
+    for name in os.listdir(projects_dir):
+        try:
+            with open(os.path.join(projects_dir, name, "project.json")) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if data.get("git_url") and data.get("clone_mode", "full") == "full":
+            urls.add(data["git_url"])
+    return urls
+
+
+def _fetch_loop(projects_dir):
+    """Refresh every mirror in use on a schedule, one fetch per remote."""
+    while True:
+        for url in _mirrored_urls(projects_dir):
+            if os.path.isdir(mirror_path(url)):
+                fetch(url, max_age=FETCH_INTERVAL / 2)
+        time.sleep(FETCH_INTERVAL)
+
+
+def start_fetcher(projects_dir):
+    """Start the background mirror fetch thread (once)."""
+    global _fetcher
+    with _lock:
+        if _fetcher and _fetcher.is_alive():
+            return
+        _fetcher = threading.Thread(target=_fetch_loop, args=(projects_dir,), daemon=True)
+        _fetcher.start()
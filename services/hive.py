@@ -0,0 +1,216 @@
+"""Central scheduler for multi-node mode.
+
+With BEEKEEPER_MODE=hive this instance keeps project configs and the UI, and
+runs go to worker agents (BEEKEEPER_MODE=worker) that register through
+heartbeats. Assignments are kept in <projects dir>/.hive.json so a restarted
+hive still knows where each project runs.
+"""
+import os
+import json
+import time
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+import logging
+
+log = logging.getLogger(__name__)
+
+TOKEN = os.environ.get("BEEKEEPER_HIVE_TOKEN", "")
+HEARTBEAT_INTERVAL = 5
+_WORKER_TIMEOUT = 3 * HEARTBEAT_INTERVAL  # missed heartbeats before a worker is considered gone
+
+_workers = {}  # {worker name: {"url", "stats", "free_gpus", "projects", "last_seen"}}
+_lock = threading.Lock()
+
+
+def call(base_url, path, payload=None, timeout=10, stream=False):
+    """JSON request to another Beekeeper instance. Returns the decoded body
+    (or the open response when stream=True); {"error": ...} on failure."""
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(base_url.rstrip("/") + path, data=data,
+                                 method="POST" if data is not None else "GET")
+    req.add_header("Content-Type", "application/json")
+    if TOKEN:
+        req.add_header("X-Beekeeper-Token", TOKEN)
+    try:
+        resp = urllib.request.urlopen(req, timeout=timeout)
+        if stream:
+            return resp
+        with resp:
+            return json.loads(resp.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        try:
+            return json.loads(e.read())
+        except ValueError:
+            return {"error": f"{base_url} returned HTTP {e.code}"}
+    except (OSError, ValueError) as e:
+        return {"error": f"Could not reach {base_url}: {e}"}
+
+
+def token_ok(headers):
+    return not TOKEN or headers.get("X-Beekeeper-Token") == TOKEN
+
+
+def _state_path(projects_dir):
+    return os.path.join(projects_dir, ".hive.json")
+
+
+def _load_assignments(projects_dir):
+    try:
+        with open(_state_path(projects_dir)) as f:
+            return json.load(f).get("assignments", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_assignments(projects_dir, assignments):
+    fd, tmp_path = tempfile.mkstemp(dir=projects_dir, suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"assignments": assignments}, f, indent=2)
+        os.replace(tmp_path, _state_path(projects_dir))
+    except:
+        os.unlink(tmp_path)
+        raise
+
+
+def heartbeat(data):
+    """Record a worker's heartbeat: its URL, host stats, free GPUs and project states."""
+    name = data.get("name")
+    url = data.get("url")
+    if not name or not url:
+        return {"error": "name and url are required"}
+    with _lock:
+        known = name in _workers
+        _workers[name] = {
+            "url": url,
+            "stats": data.get("stats") or {},
+            "free_gpus": data.get("free_gpus") or [],
+            "projects": data.get("projects") or {},
+            "last_seen": time.time(),
+        }
+    if not known:
+        log.info("Worker %s registered from %s", name, url)
+    return {"status": "ok"}
+
+
+def workers():
+    """Known workers with an "alive" flag."""
+    now = time.time()
+    with _lock:
+        return {
+            name: {**info, "alive": now - info["last_seen"] < _WORKER_TIMEOUT}
+            for name, info in _workers.items()
+        }
+
+
+def _load(worker):
+    """Sort key for scheduling: most free GPUs, then fewest runs, then least CPU."""
+    running = sum(1 for p in worker["projects"].values()
+                  if p.get("status") == "running" or p.get("setup_status") not in ("ready", "error", None))
+    cpu = (worker["stats"].get("cpu") or {}).get("percent") or 0
+    return (-len(worker["free_gpus"]), running, cpu)
+
+
+def pick_worker(project_name=None):
+    """Name of the least-loaded live worker, or None.
+
+    With project_name, the project is counted as running there right away so
+    concurrent dispatches spread out before the next heartbeat arrives.
+    """
+    now = time.time()
+    with _lock:
+        alive = [n for n, w in _workers.items() if now - w["last_seen"] < _WORKER_TIMEOUT]
+        if not alive:
+            return None
+        worker = min(alive, key=lambda n: _load(_workers[n]))
+        if project_name:
+            _workers[worker]["projects"][project_name] = {"status": "running", "pending": True}
+        return worker
+
+
+def assigned_worker(projects_dir, name):
+    """(worker name, url) a project is assigned to, or (None, None)."""
+    worker = _load_assignments(projects_dir).get(name)
+    if not worker:
+        return None, None
+    with _lock:
+        info = _workers.get(worker)
+    return worker, info["url"] if info else None
+
+
+def dispatch(projects_dir, name):
+    """Start a project on the least-loaded live worker."""
+    config_path = os.path.join(projects_dir, name, "project.json")
+    with open(config_path) as f:
+        project = json.load(f)
+
+    worker, url = assigned_worker(projects_dir, name)
+    if worker:
+        state = workers().get(worker, {})
+        if state.get("alive") and state["projects"].get(name, {}).get("status") == "running":
+            return {"error": f"Training is already running on {worker}"}
+    worker = pick_worker(name)
+    if not worker:
+        return {"error": "No live workers registered with this hive"}
+    url = workers()[worker]["url"]
+
+    result = call(url, "/api/worker/run", {"project": project}, timeout=120)
+    if "error" in result:
+        return result
+    with _lock:
+        assignments = _load_assignments(projects_dir)
+        assignments[name] = worker
+        _save_assignments(projects_dir, assignments)
+    log.info("Dispatched %s to worker %s", name, worker)
+    return {**result, "worker": worker}
+
+
+def _relay(projects_dir, name, action, timeout=30):
+    worker, url = assigned_worker(projects_dir, name)
+    if not url:
+        return {"error": "Training is not running"}
+    return call(url, f"/api/worker/{action}", {"name": name}, timeout=timeout)
+
+
+def stop(projects_dir, name):
+    return _relay(projects_dir, name, "stop")
+
+
+def pause(projects_dir, name):
+    return _relay(projects_dir, name, "pause")
+
+
+def resume(projects_dir, name):
+    return _relay(projects_dir, name, "resume")
+
+
+def status(projects_dir, name):
+    """Training status of a project as last reported by its worker."""
+    worker, _ = assigned_worker(projects_dir, name)
+    state = workers().get(worker) if worker else None
+    info = (state or {}).get("projects", {}).get(name)
+    if not state or not state["alive"] or not info:
+        return {"status": "idle", "pid": None, "run_id": None, "commit": None,
+                "started_at": None, "tb_port": None, "elapsed": None, "worker": worker}
+    elapsed = info.get("elapsed")
+    if elapsed is not None:
+        elapsed += time.time() - state["last_seen"]
+    return {**info, "elapsed": elapsed, "tb_port": None, "worker": worker}
+
+
+def stream_logs(projects_dir, name, query_string=""):
+    """Relay a worker's SSE log stream line by line."""
+    _, url = assigned_worker(projects_dir, name)
+    if not url:
+        yield "event: done\ndata: not running on any worker\n\n"
+        return
+    path = f"/projects/{name}/logs/stream" + (f"?{query_string}" if query_string else "")
+    resp = call(url, path, timeout=330, stream=True)
+    if isinstance(resp, dict):
+        yield f"data: [{resp['error']}]\n\nevent: done\ndata: finished\n\n"
+        return
+    with resp:
+        for line in resp:
+            yield line.decode("utf-8", "replace")
@@ -0,0 +1,320 @@
+"""Disk usage, quotas, retention and background deletion.
+
+Deleting goes through a trash directory inside the projects dir: the tree is
+renamed there (instant, same filesystem) and a background thread removes it
+at idle I/O priority, so request handlers never wait on rmtree.
+
+Usage is tracked incrementally: a directory is only re-listed when its mtime
+changes, and within unchanged directories only recently written files are
+stat'ed again. A janitor pass every JANITOR_INTERVAL seconds (or right after
+something is trashed) applies each project's retention policy and budgets.
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import subprocess
+import threading
+import logging
+
+from services import resources
+from services.metrics import Counter, Gauge
+
+log = logging.getLogger(__name__)
+
+TRASH = ".trash"
+JANITOR_INTERVAL = int(os.environ.get("BEEKEEPER_JANITOR_INTERVAL", "300"))
+GLOBAL_BUDGET = os.environ.get("BEEKEEPER_DISK_BUDGET", "")  # e.g. "2T" across all projects
+_HOT_WINDOW = 3600  # files written this recently are re-stat'ed even if their directory is unchanged
+_SKIP_DIRS = {"venv", "envs"}  # environments are rebuilt, not outputs
+_EVENT_PREFIX = "events.out.tfevents."
+
+TRASHED = Counter("beekeeper_trashed", "Trees moved to the trash", ["reason"])
+TRASH_PENDING = Gauge("beekeeper_trash_pending", "Entries waiting in the trash")
+
+# Only the janitor thread touches _dirs
+_dirs = {}      # {dir path: {"mtime": ns, "files": {name: (size, mtime)}, "subdirs": [path]}}
+_usage = {}     # {project name: bytes}
+_over = {}      # {project name: reason} for projects over a budget
+_wake = threading.Event()
+_lock = threading.Lock()
+_thread = None
+
+
+def _trash_dir(projects_dir):
+    return os.path.join(projects_dir, TRASH)
+
+
+def trash(projects_dir, path, reason="delete"):
+    """Move a tree out of the way for background deletion. Returns immediately."""
+    if not os.path.lexists(path):
+        return False
+    trash_dir = _trash_dir(projects_dir)
+    os.makedirs(trash_dir, exist_ok=True)
+    target = os.path.join(trash_dir, f"{os.path.basename(path)}-{uuid.uuid4().hex[:8]}")
+    os.rename(path, target)
+    TRASHED.inc(reason=reason)
+    _wake.set()
+    return True
+
+
+def _remove(path):
+    """Delete a tree at idle I/O priority and lowest CPU priority."""
+    if shutil.which("ionice") and shutil.which("nice"):
+        subprocess.run(["ionice", "-c", "3", "nice", "-n", "19", "rm", "-rf", "--", path],
+                       capture_output=True)
+    if os.path.lexists(path):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _empty_trash(projects_dir):
+    trash_dir = _trash_dir(projects_dir)
+    try:
+        entries = os.listdir(trash_dir)
+    except OSError:
+        return
+    for i, entry in enumerate(entries):
+        TRASH_PENDING.set(len(entries) - i)
+        _remove(os.path.join(trash_dir, entry))
+    TRASH_PENDING.set(0)
+
+
+def _scan_dir(path, now, seen):
+    """Bytes under path, refreshing the cached listing only where something changed."""
+    seen.add(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        _dirs.pop(path, None)
+        return 0
+    cached = _dirs.get(path)
+    if cached is None or cached["mtime"] != st.st_mtime_ns:
+        files, subdirs = {}, []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in _SKIP_DIRS and entry.name != TRASH:
+                                subdirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            est = entry.stat(follow_symlinks=False)
+                            files[entry.name] = (est.st_blocks * 512, est.st_mtime)
+                    except OSError:
+                        continue
+        except OSError:
+            return 0
+        cached = {"mtime": st.st_mtime_ns, "files": files, "subdirs": subdirs}
+        _dirs[path] = cached
+    else:
+        # Same entries as last time; only files still being written can have grown
+        for name, (size, mtime) in list(cached["files"].items()):
+            if now - mtime < _HOT_WINDOW:
+                try:
+                    est = os.stat(os.path.join(path, name), follow_symlinks=False)
+                    cached["files"][name] = (est.st_blocks * 512, est.st_mtime)
+                except OSError:
+                    cached["files"].pop(name, None)
+    total = sum(size for size, _ in cached["files"].values())
+    for subdir in cached["subdirs"]:
+        total += _scan_dir(subdir, now, seen)
+    return total
+
+
+def usage(name):
+    """Last measured usage of a project in bytes, or None."""
+    with _lock:
+        return _usage.get(name)
+
+
+def over_budget(name):
+    """Why a project may not start a run (quota or global budget), or None."""
+    with _lock:
+        return _over.get(name)
+
+
+def validate(retention):
+    """Check a project's retention dict. Returns an error message or None."""
+    try:
+        if retention.get("quota"):
+            resources.parse_size(retention["quota"])
+        if retention.get("keep_runs") not in (None, "") and int(retention["keep_runs"]) < 1:
+            return "Keep at least one run"
+        if retention.get("max_age_days") not in (None, "") and float(retention["max_age_days"]) <= 0:
+            return "Maximum age must be positive"
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def _tb_logdir(projects_dir, project):
+    return os.path.join(projects_dir, project["name"], "src", project.get("tensorboard_log_dir", "runs"))
+
+
+def _forget_stored(projects_dir, project, retention):
+    """Drop stored checkpoints of runs retention no longer keeps."""
+    from services import artifact_store
+    from services.run_history import list_runs
+
+    runs = list_runs(projects_dir, project["name"])
+    stale = set()
+    keep = retention.get("keep_runs")
+    if keep not in (None, "") and len(runs) > int(keep):
+        stale.update(run["run_id"] for run in runs[:len(runs) - int(keep)])
+    max_age = retention.get("max_age_days")
+    if max_age not in (None, ""):
+        cutoff = time.time() - float(max_age) * 86400
+        stale.update(run["run_id"] for run in runs
+                     if run.get("ended_at") and run["ended_at"] < cutoff)
+    if not stale:
+        return 0
+    return artifact_store.forget(projects_dir, project["name"], run_ids=stale)
+
+
+def apply_retention(projects_dir, project):
+    """Trash TensorBoard runs beyond keep_runs and event files older than max_age_days,
+    and drop the stored checkpoints of those runs.
+
+    Runs on the janitor thread, after the project's usage scan.
+    """
+    retention = project.get("retention") or {}
+    removed = 0
+    if retention.get("keep_runs") not in (None, "") or retention.get("max_age_days") not in (None, ""):
+        removed += _forget_stored(projects_dir, project, retention)
+    logdir = _tb_logdir(projects_dir, project)
+    if not os.path.isdir(logdir):
+        return removed
+
+    keep = retention.get("keep_runs")
+    if keep not in (None, ""):
+        runs = []
+        with os.scandir(logdir) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    runs.append((entry.stat().st_mtime, entry.path))
+        runs.sort(reverse=True)
+        for _, path in runs[int(keep):]:
+            trash(projects_dir, path, reason="retention")
+            removed += 1
+
+    max_age = retention.get("max_age_days")
+    if max_age not in (None, ""):
+        # Find old event files in the usage cache instead of walking the tree again
+        cutoff = time.time() - float(max_age) * 86400
+        for path, cached in list(_dirs.items()):
+            if path != logdir and not path.startswith(logdir + os.sep):
+                continue
+            for filename, (_, mtime) in list(cached["files"].items()):
+                if filename.startswith(_EVENT_PREFIX) and mtime < cutoff:
+                    try:
+                        os.unlink(os.path.join(path, filename))  # single files need no trash
+                        removed += 1
+                    except OSError:
+                        pass
+                    del cached["files"][filename]
+    if removed:
+        log.info("Retention removed %d runs/event files/stored checkpoints from %s",
+                 removed, project["name"])
+    return removed
+
+
+def clear_tb_logs(projects_dir, project):
+    """Empty a project's TensorBoard log dir without waiting for the delete."""
+    logdir = _tb_logdir(projects_dir, project)
+    if not os.path.isdir(logdir):
+        return False
+    trash(projects_dir, logdir, reason="clear")
+    os.makedirs(logdir, exist_ok=True)
+    return True
+
+
+def _projects(projects_dir):
+    out = []
+    if not os.path.isdir(projects_dir):
+        return out
+    for name in sorted(os.listdir(projects_dir)):
+        try:
+            with open(os.path.join(projects_dir, name, "project.json")) as f:
+                out.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+def _enforce(projects_dir, projects):
+    """Block starts of projects over a budget and pause the runs that blew it."""
+    from services.process_manager import get_training_statuses, pause_training
+
+    with _lock:
+        used = dict(_usage)
+    over = {}
+    for project in projects:
+        quota = (project.get("retention") or {}).get("quota")
+        if quota and used.get(project["name"], 0) > resources.parse_size(quota):
+            over[project["name"]] = f"{project['name']} is over its disk quota of {quota}"
+    statuses = get_training_statuses([p["name"] for p in projects])
+    active = [name for name, status in statuses.items()
+              if status["status"] == "running" and not status.get("paused")]
+    to_pause = [name for name in over if name in active]
+    if GLOBAL_BUDGET and sum(used.values()) > resources.parse_size(GLOBAL_BUDGET):
+        for project in projects:
+            over.setdefault(project["name"], f"Projects are over the {GLOBAL_BUDGET} disk budget")
+        if not to_pause and active:
+            # Only a run still writing can be blamed; idle projects just stay blocked
+            to_pause = [max(active, key=lambda n: used.get(n, 0))]
+
+    with _lock:
+        _over.clear()
+        _over.update(over)
+    for name in to_pause:
+        log.warning("Pausing %s: %s", name, over[name])
+        pause_training(projects_dir, name)
+
+
+def run_once(projects_dir):
+    """One janitor pass: retention, usage, budgets, then the trash."""
+    projects = _projects(projects_dir)
+    now = time.time()
+    seen = set()
+    usage_now = {}
+    for project in projects:
+        project_dir = os.path.join(projects_dir, project["name"])
+        usage_now[project["name"]] = _scan_dir(project_dir, now, seen)
+        try:
+            if apply_retention(projects_dir, project):
+                usage_now[project["name"]] = _scan_dir(project_dir, now, seen)
+        except OSError as e:
+            log.warning("Retention failed for %s: %s", project["name"], e)
+    for path in set(_dirs) - seen:
+        del _dirs[path]
+    with _lock:
+        _usage.clear()
+        _usage.update(usage_now)
+    try:
+        _enforce(projects_dir, projects)
+    except ValueError as e:
+        log.warning("Invalid disk budget: %s", e)
+    _empty_trash(projects_dir)
+
+
+def _loop(projects_dir):
+    # Something moved to the trash starts a pass early, which also refreshes
+    # the usage of the project it came from
+    while True:
+        _wake.clear()
+        try:
+            run_once(projects_dir)
+        except Exception as e:
+            log.warning("Janitor pass failed: %s", e)
+        _wake.wait(JANITOR_INTERVAL)
+
+
+def start_janitor(projects_dir):
+    """Start the background janitor thread (once)."""
+    global _thread
+    with _lock:
+        if _thread and _thread.is_alive():
+            return
+        _thread = threading.Thread(target=_loop, args=(projects_dir,), daemon=True)
+        _thread.start()
@@ -0,0 +1,294 @@
+import os
+import re
+import json
+import time
+import threading
+import statistics
+import logging
+
+from services.run_history import list_runs
+
+log = logging.getLogger(__name__)
+
+# tqdm progress bars: " 42%|####      | 420/1000 [00:10<00:14, 41.3it/s]"
+TQDM_PATTERN = r"(?P<step>\d+)/(?P<total>\d+) \[[^\]]*?(?P<it_s>[\d.]+)it/s"
+
+_MAX_POINTS = 512          # per metric; the series is halved when it fills up
+_READ_LIMIT = 4 * 1024 * 1024  # bytes ingested per call, so one tick never stalls
+_RATE_WINDOW = 60          # seconds of steps used for the live rate and ETA
+_MIN_RATE_SPAN = 30        # seconds of steps needed before rates are compared
+_REGRESSION_THRESHOLD = 0.10  # flag runs more than 10% slower than previous commits
+_BASELINE_RUNS = 5
+_KEY_BEFORE_GROUP = re.compile(r"(\w+)[=:\s]*\((?!\?)")
+
+_runs = {}  # {name: _RunMetrics}
+_lock = threading.Lock()
+
+
+def _compile(pattern):
+    """Compile a pattern and work out a metric name for each capturing group.
+
+    Named groups keep their names. Unnamed groups are named after the word
+    right before them, so "step=(\\d+).*loss=([\\d.]+)" yields step and loss.
+    """
+    regex = re.compile(pattern)
+    by_index = {index: name for name, index in regex.groupindex.items()}
+    unnamed = [i for i in range(1, regex.groups + 1) if i not in by_index]
+    keys = _KEY_BEFORE_GROUP.findall(pattern)
+    if len(keys) != len(unnamed):
+        keys = [f"g{i}" for i in unnamed]
+    by_index.update(zip(unnamed, keys))
+    return regex, by_index
+
+
+class _RunMetrics:
+    """Incremental parser state and compact series for one run.
+
+    The sampler ingests while requests read, so ingest(), summary() and
+    copy_series() take the run's lock.
+    """
+
+    def __init__(self, run_id, log_path, patterns, total_steps, batch_size):
+        self.run_id = run_id
+        self.log_path = log_path
+        self.patterns = []
+        for pattern in [*patterns, TQDM_PATTERN]:
+            try:
+                self.patterns.append(_compile(pattern))
+            except re.error as e:
+                log.warning("Ignoring bad metric pattern %r: %s", pattern, e)
+        self.total_steps = total_steps or None
+        self.batch_size = batch_size or None
+        self.offset = 0
+        self.partial = b""
+        self.series = {}     # {metric: [[t, value], ...]}
+        self.steps = []      # [(t, step)] within the rate window, plus the first one
+        self.first_step = None
+        self.last = {}       # latest value per metric
+        self.stride = {}     # keep every Nth point per metric after halving
+        self.seen = {}
+        self.lock = threading.Lock()
+
+    def _add(self, metric, t, value):
+        self.last[metric] = value
+        count = self.seen.get(metric, 0) + 1
+        self.seen[metric] = count
+        stride = self.stride.get(metric, 1)
+        if count % stride:
+            return
+        points = self.series.setdefault(metric, [])
+        points.append([round(t, 3), value])
+        if len(points) >= _MAX_POINTS:
+            del points[1::2]
+            self.stride[metric] = stride * 2
+
+    def _line(self, line, t):
+        for regex, names in self.patterns:
+            m = regex.search(line)
+            if not m:
+                continue
+            for index, metric in names.items():
+                raw = m.group(index)
+                if raw is None:
+                    continue
+                try:
+                    value = float(raw)
+                except ValueError:
+                    continue
+                if metric == "total":
+                    self.total_steps = int(value)
+                    continue
+                if metric == "step":
+                    self._step(t, int(value))
+                self._add(metric, t, value)
+
+    def _step(self, t, step):
+        if self.first_step is None:
+            self.first_step = (t, step)
+        if self.steps and step < self.steps[-1][1]:
+            self.steps = []  # step counter restarted
+        self.steps.append((t, step))
+        while len(self.steps) > 2 and t - self.steps[1][0] > _RATE_WINDOW:
+            self.steps.pop(0)
+
+    def ingest(self):
+        with self.lock:
+            self._ingest()
+
+    def _ingest(self):
+        try:
+            size = os.path.getsize(self.log_path)
+        except OSError:
+            return
+        if size < self.offset:
+            self.offset, self.partial = 0, b""
+        if size == self.offset:
+            return
+        with open(self.log_path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(_READ_LIMIT)
+        self.offset += len(data)
+        data = self.partial + data
+        lines = data.split(b"\n")
+        self.partial = lines.pop()[-65536:]
+        now = time.time()
+        for raw in lines:
+            # tqdm redraws with \r; the last segment is the current state
+            self._line(raw.rsplit(b"\r", 1)[-1].decode("utf-8", "replace"), now)
+
+    def steps_per_sec(self, window=True):
+        if window and len(self.steps) >= 2:
+            (t0, s0), (t1, s1) = self.steps[0], self.steps[-1]
+        elif self.first_step and self.steps:
+            (t0, s0), (t1, s1) = self.first_step, self.steps[-1]
+        else:
+            t0 = t1 = 0
+        if t1 - t0 > 0 and s1 >= s0:
+            return (s1 - s0) / (t1 - t0)
+        if "it_s" in self.last:
+            return self.last["it_s"]
+        return None
+
+    def summary(self):
+        with self.lock:
+            return self._summary()
+
+    def copy_series(self):
+        with self.lock:
+            return {metric: list(points) for metric, points in self.series.items()}
+
+    def _summary(self):
+        rate = self.steps_per_sec()
+        overall = self.steps_per_sec(window=False)
+        step = self.steps[-1][1] if self.steps else None
+        eta = None
+        if rate and step is not None and self.total_steps and self.total_steps > step:
+            eta = (self.total_steps - step) / rate
+        span = (self.steps[-1][0] - self.first_step[0]) if self.first_step and self.steps else 0
+        return {
+            "run_id": self.run_id,
+            "step": step,
+            "total_steps": self.total_steps,
+            "steps_per_sec": _round(rate),
+            "samples_per_sec": _round(rate * self.batch_size) if rate and self.batch_size else None,
+            "avg_steps_per_sec": _round(overall),
+            "measured_seconds": round(span, 1),
+            "eta_seconds": round(eta) if eta is not None else None,
+            "metrics": {k: v for k, v in self.last.items() if k != "it_s"},
+        }
+
+
+def _round(value):
+    return round(value, 4) if value is not None else None
+
+
+def _metrics_dir(projects_dir, name):
+    return os.path.join(projects_dir, name, "metrics")
+
+
+def begin(projects_dir, name, run_id, project):
+    """Start tracking metrics for a new run of a project."""
+    state = _RunMetrics(
+        run_id,
+        os.path.join(projects_dir, name, "train.log"),
+        project.get("metric_patterns") or [],
+        project.get("total_steps") or 0,
+        project.get("batch_size") or 0,
+    )
+    with _lock:
+        _runs[name] = state
+
+
+def ingest(name):
+    """Parse whatever the run has logged since the last call."""
+    with _lock:
+        state = _runs.get(name)
+    if state:
+        try:
+            state.ingest()
+        except Exception as e:
+            log.warning("Metric ingest failed for %s: %s", name, e)
+
+
+def compare_to_baseline(projects_dir, name, summary, commit=None):
+    """Compare a run's average rate with earlier runs on other commits."""
+    rate = summary.get("avg_steps_per_sec")
+    if not rate or summary.get("measured_seconds", 0) < _MIN_RATE_SPAN:
+        return None
+    previous = [
+        r["steps_per_sec"] for r in list_runs(projects_dir, name)
+        if r.get("run_id") != summary["run_id"]
+        and r.get("steps_per_sec")
+        and (commit is None or r.get("commit") != commit)
+    ][-_BASELINE_RUNS:]
+    if not previous:
+        return None
+    baseline = statistics.median(previous)
+    change = (rate - baseline) / baseline
+    return {
+        "baseline_steps_per_sec": _round(baseline),
+        "change_pct": round(change * 100, 1),
+        "slower": change < -_REGRESSION_THRESHOLD,
+        "baseline_runs": len(previous),
+    }
+
+
+def live(projects_dir, name, commit=None):
+    """Current throughput, ETA and regression check for a running project, or None."""
+    with _lock:
+        state = _runs.get(name)
+    if not state:
+        return None
+    summary = state.summary()
+    summary["regression"] = compare_to_baseline(projects_dir, name, summary, commit)
+    return summary
+
+
+def series(name):
+    with _lock:
+        state = _runs.get(name)
+    return state.copy_series() if state else None
+
+
+def finish(projects_dir, name, commit=None):
+    """Final ingest for a finished run; saves its series and returns the summary fields
+    to store in the run history."""
+    with _lock:
+        state = _runs.pop(name, None)
+    if not state:
+        return {}
+    try:
+        state.ingest()
+    except Exception:
+        pass
+    summary = state.summary()
+    regression = compare_to_baseline(projects_dir, name, summary, commit)
+
+    os.makedirs(_metrics_dir(projects_dir, name), exist_ok=True)
+    path = os.path.join(_metrics_dir(projects_dir, name), f"{state.run_id}.json")
+    try:
+        with open(path, "w") as f:
+            json.dump({"summary": summary, "series": state.copy_series()}, f)
+    except OSError as e:
+        log.warning("Could not save metrics for %s: %s", name, e)
+
+    if regression and regression["slower"]:
+        log.warning("Run %s of %s is %.1f%% slower than previous commits",
+                    state.run_id, name, -regression["change_pct"])
+    return {
+        "steps_per_sec": summary["avg_steps_per_sec"],
+        "samples_per_sec": _round(summary["avg_steps_per_sec"] * state.batch_size)
+        if summary["avg_steps_per_sec"] and state.batch_size else None,
+        "last_step": summary["step"],
+        "regression": regression,
+    }
+
+
+def load_run(projects_dir, name, run_id):
+    """Saved summary and series of a finished run, or None."""
+    path = os.path.join(_metrics_dir(projects_dir, name), f"{run_id}.json")
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
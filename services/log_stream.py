@@ -0,0 +1,162 @@
+"""Server-sent event stream of a run's log.
+
+The log is read in fixed-size chunks and the lines of a burst go out as one
+event, so memory per connection stays constant however fast the log grows.
+A reader that falls more than MAX_LAG bytes behind (a slow client blocks the
+generator, so the unread part of the file grows) is moved to the tail with a
+note of how much it missed.
+"""
+import os
+import json
+import time
+import zlib
+
+from services.metrics import Counter
+
+READ_CHUNK = 64 * 1024
+BATCH_BYTES = 64 * 1024      # send an event once this much is buffered...
+BATCH_SECONDS = 0.1          # ...or once the oldest buffered line is this old
+MAX_LAG = 4 * 1024 * 1024    # unread bytes before a reader is skipped to the tail
+RESUME_LINES = 200           # lines replayed after a skip
+POLL_INTERVAL = 0.5
+MAX_IDLE_POLLS = 300         # give up after this many polls with no data
+
+SSE_SKIPS = Counter(
+    "beekeeper_sse_skips", "Log stream readers moved to the tail for falling behind")
+
+
+def tail_offset(filepath, lines):
+    """Find the byte offset to start reading the last N lines of a file."""
+    try:
+        size = os.path.getsize(filepath)
+    except OSError:
+        return 0
+    if size == 0:
+        return 0
+
+    buf_size = 8192
+    found = 0
+    offset = size
+
+    with open(filepath, "rb") as f:
+        while offset > 0 and found <= lines:
+            read_size = min(buf_size, offset)
+            offset -= read_size
+            f.seek(offset)
+            chunk = f.read(read_size)
+            found += chunk.count(b"\n")
+
+        # If we found enough lines, seek forward to the right start
+        if found > lines:
+            f.seek(offset)
+            data = f.read(size - offset)
+            idx = 0
+            skip = found - lines
+            for _ in range(skip):
+                idx = data.index(b"\n", idx) + 1
+            return offset + idx
+
+    return offset
+
+
+def _clean(line):
+    """What a terminal would show for a line: the last \\r-separated segment."""
+    segments = [s for s in line.split(b"\r") if s.strip()]
+    return segments[-1].rstrip().decode("utf-8", "replace") if segments else ""
+
+
+def _event(lines):
+    return "".join(f"data: {line}\n" for line in lines) + "\n"
+
+
+def _human(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def follow(log_path, offset, is_running, status=None):
+    """Yield SSE frames for log_path from offset until is_running() turns False.
+
+    Each event carries every line of a burst as consecutive data: fields.
+    If given, status() is polled whenever the reader catches up and sent as
+    a "status" event (JSON) when it changes.
+    """
+    partial = b""
+    batch, batch_size, batch_started = [], 0, 0.0
+    idle = 0
+    last_status = None
+
+    while True:
+        try:
+            size = os.path.getsize(log_path)
+        except OSError:
+            size = None
+
+        if size is not None:
+            if size < offset:
+                # Log file was truncated/rewritten (new run)
+                offset, partial = 0, b""
+            if size - offset > MAX_LAG:
+                resume_at = tail_offset(log_path, RESUME_LINES)
+                if batch:
+                    yield _event(batch)
+                    batch, batch_size = [], 0
+                SSE_SKIPS.inc()
+                yield _event([f"[skipped {_human(resume_at - offset + len(partial))} of log, resuming at tail]"])
+                offset, partial = resume_at, b""
+            if size > offset:
+                try:
+                    with open(log_path, "rb") as f:
+                        f.seek(offset)
+                        chunk = f.read(READ_CHUNK)
+                except OSError:
+                    chunk = b""
+                if chunk:
+                    offset += len(chunk)
+                    lines = (partial + chunk).split(b"\n")
+                    partial = lines.pop()
+                    if len(partial) > READ_CHUNK:
+                        lines.append(partial)  # no newline in sight; don't let it grow
+                        partial = b""
+                    if lines and not batch:
+                        batch_started = time.monotonic()
+                    for line in lines:
+                        batch.append(_clean(line))
+                        batch_size += len(line)
+                    if batch and (batch_size >= BATCH_BYTES
+                                  or time.monotonic() - batch_started >= BATCH_SECONDS):
+                        yield _event(batch)
+                        batch, batch_size = [], 0
+                    idle = 0
+                    continue
+
+        # Caught up: send what's buffered, including a line still being written
+        if partial:
+            batch.append(_clean(partial))
+            partial = b""
+        if batch:
+            yield _event(batch)
+            batch, batch_size = [], 0
+        if status:
+            current = json.dumps(status())
+            if current != last_status:
+                yield f"event: status\ndata: {current}\n\n"
+                last_status = current
+
+        idle += 1
+        if not is_running() and idle > 2:
+            yield "data: \n\nevent: done\ndata: finished\n\n"
+            return
+        if idle > MAX_IDLE_POLLS:
+            return
+        time.sleep(POLL_INTERVAL)
+
+
+def gzip_frames(frames, level=6):
+    """gzip a frame stream, flushing after every frame so events aren't held back."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for frame in frames:
+        yield compressor.compress(frame.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
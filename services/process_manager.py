@@ -8,21 +8,58 @@ import time
 import logging
 
 from models.project import Project
+from services import datasets, janitor, log_metrics, profiler, resources, watchdog
+from services.dependencies import sync_requirements
+from services.git_mirror import pull_source
+from services.metrics import Counter, Gauge, Histogram, RUN_BUCKETS
+from services.run_history import new_run_id, record_start, record_end
+from services.stats_service import free_gpus, get_gpu_stats
 
 log = logging.getLogger(__name__)
 
 _running = {}
-_tb_running = {}  # standalone TB processes: {name: {"tb_process": Popen, "tb_port": int, "last_access": float}}
+_starting = {}      # {name: {"stage": str, "since": float, "cancelled": bool, "env_path": str}} while a start is prepared
+_start_errors = {}  # {name: {"error": str, "at": float}} why the last start failed after returning
+_tb_reaper = None
+_tb_running = {}  # standalone TB processes: {name: {"tb_process": Popen, "tb_port": int, "env_path": str, "last_access": float}}
 _lock = threading.Lock()
 _TB_IDLE_TIMEOUT = 1800  # 30 min
+_CHECKPOINT_GRACE = 30  # seconds between the checkpoint signal and SIGSTOP unless configured
+
+GIT_PULL_SECONDS = Histogram(
+    "beekeeper_git_pull_seconds", "git pull before a run starts", ["outcome"])
+TB_SPAWN_SECONDS = Histogram(
+    "beekeeper_tensorboard_spawn_seconds", "Time to launch a tensorboard process", ["outcome"])
+RUN_SECONDS = Histogram(
+    "beekeeper_run_duration_seconds", "Duration of finished training runs", ["status"],
+    buckets=RUN_BUCKETS)
+RUN_EXITS = Counter(
+    "beekeeper_run_exits", "Training runs that exited, by exit code", ["exit_code"])
+MONITOR_THREADS = Gauge(
+    "beekeeper_monitor_threads", "Live training monitor threads")
+RUN_PAUSES = Counter(
+    "beekeeper_run_pauses", "Runs suspended, by reason", ["reason"])
+
+
+def _process_counts():
+    with _lock:
+        tb = sum(1 for i in _running.values() if i.get("tb_process") and i["tb_process"].poll() is None)
+        tb += sum(1 for i in _tb_running.values() if i["tb_process"].poll() is None)
+        return {("training",): len(_running), ("tensorboard",): tb}
+
+
+PROCESSES = Gauge(
+    "beekeeper_processes", "Child processes Beekeeper is tracking", ["kind"],
+    callback=_process_counts)
 
 
 def _resolve_python_binary(projects_dir, project):
     """Get the python binary path for a project's environment."""
     if project.get("env_type") == "conda":
         return _resolve_conda_python(project)
-    # venv — check python, python3, and versioned binary
-    venv_bin = os.path.join(projects_dir, project["name"], "venv", "bin")
+    # venv — check python, python3, and versioned binary. The venv path may be a
+    # symlink to a versioned env; resolve it so a run keeps its env across a rebuild.
+    venv_bin = os.path.join(os.path.realpath(os.path.join(projects_dir, project["name"], "venv")), "bin")
     for name in ("python", "python3", f"python{project.get('python_version', '')}"):
         candidate = os.path.join(venv_bin, name)
         if os.path.isfile(candidate):
@@ -34,12 +71,12 @@ def _resolve_python_binary(projects_dir, project):
 def _resolve_conda_python(project):
     """Resolve python binary from a conda environment."""
     from services.python_versions import _find_conda_bin
-    from services.project_service import _conda_env_name, _resolve_conda_env_path
+    from services.project_service import _active_conda_env, _resolve_conda_env_path
 
     conda_bin = _find_conda_bin()
     if not conda_bin:
         return None
-    env_name = _conda_env_name(project["name"])
+    env_name = _active_conda_env(project)
     env_path = _resolve_conda_env_path(conda_bin, env_name)
     if not env_path:
         return None
@@ -50,11 +87,11 @@ def _resolve_tensorboard_binary(projects_dir, project):
     """Get the tensorboard binary path for a project's environment."""
     if project.get("env_type") == "conda":
         from services.python_versions import _find_conda_bin
-        from services.project_service import _conda_env_name, _resolve_conda_env_path
+        from services.project_service import _active_conda_env, _resolve_conda_env_path
 
         conda_bin = _find_conda_bin()
         if conda_bin:
-            env_name = _conda_env_name(project["name"])
+            env_name = _active_conda_env(project)
             env_path = _resolve_conda_env_path(conda_bin, env_name)
             if env_path:
                 tb = os.path.join(env_path, "bin", "tensorboard")
@@ -63,12 +100,31 @@ def _resolve_tensorboard_binary(projects_dir, project):
         return None
 
     # venv
-    tb = os.path.join(projects_dir, project["name"], "venv", "bin", "tensorboard")
+    tb = os.path.join(os.path.realpath(os.path.join(projects_dir, project["name"], "venv")),
+                      "bin", "tensorboard")
     if os.path.isfile(tb):
         return tb
     return None
 
 
+def _env_path(binary):
+    """Environment root of a binary inside <env>/bin."""
+    return os.path.dirname(os.path.dirname(binary)) if binary else None
+
+
+def env_in_use(name, env_path):
+    """True if a tracked training or tensorboard process of the project, or a
+    start still being prepared, runs from env_path."""
+    env_path = os.path.realpath(env_path)
+    with _lock:
+        infos = [i for i in (_running.get(name), _tb_running.get(name), _starting.get(name)) if i]
+    for info in infos:
+        for key in ("env_path", "tb_env_path"):
+            if info.get(key) and os.path.realpath(info[key]) == env_path:
+                return True
+    return False
+
+
 def _find_free_port(start=6006):
     """Find a free port starting from the given port."""
     for port in range(start, start + 100):
@@ -81,6 +137,20 @@ def _find_free_port(start=6006):
     return None
 
 
+def _current_commit(src_dir):
+    """Return the checked-out commit hash, or None."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=src_dir, capture_output=True, text=True, timeout=10,
+        )
+        if result.returncode == 0:
+            return result.stdout.strip()
+    except Exception:
+        pass
+    return None
+
+
 def _update_project_json(projects_dir, name, **fields):
     """Update specific fields in project.json atomically."""
     config_path = os.path.join(projects_dir, name, "project.json")
@@ -104,6 +174,32 @@ def _kill_tb_process(tb_proc):
                 pass
 
 
+def _time_tb_ready(proc, port, started):
+    """Record how long a new tensorboard takes to accept connections."""
+    while time.monotonic() - started < 120 and proc.poll() is None:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                TB_SPAWN_SECONDS.observe(time.monotonic() - started, outcome="ok")
+                return
+        except OSError:
+            time.sleep(0.2)
+    TB_SPAWN_SECONDS.observe(time.monotonic() - started, outcome="error")
+
+
+def _spawn_tensorboard(tb_bin, tb_logdir, tb_port):
+    """Launch tensorboard in its own session and time its startup in the background."""
+    started = time.monotonic()
+    proc = subprocess.Popen(
+        [tb_bin, "--logdir", tb_logdir, "--port", str(tb_port), "--bind_all"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    threading.Thread(target=_time_tb_ready, args=(proc, tb_port, started),
+                     daemon=True).start()
+    return proc
+
+
 def _tb_idle_reaper():
     """Daemon thread that kills standalone TB processes idle for >30 min."""
     while True:
@@ -120,18 +216,54 @@ def _tb_idle_reaper():
             _kill_tb_process(proc)
 
 
-# Start the idle reaper thread
-threading.Thread(target=_tb_idle_reaper, daemon=True).start()
+def start_tb_reaper():
+    """Start the standalone tensorboard idle reaper (once)."""
+    global _tb_reaper
+    with _lock:
+        if _tb_reaper and _tb_reaper.is_alive():
+            return
+        _tb_reaper = threading.Thread(target=_tb_idle_reaper, daemon=True)
+        _tb_reaper.start()
 
 
 def _monitor_process(projects_dir, name):
     """Background thread that waits for the training process to exit."""
+    MONITOR_THREADS.inc()
+    try:
+        _watch_process(projects_dir, name)
+    finally:
+        MONITOR_THREADS.dec()
+
+
+def _record_exit(projects_dir, name, info, ret, status):
+    """Record a finished run in the history and metrics."""
+    throughput = log_metrics.finish(projects_dir, name, info.get("commit"))
+    run_id = info.get("run_id")
+    if run_id:
+        extra = {"watchdog": info["watchdog"]} if info.get("watchdog") else {}
+        record_end(projects_dir, name, run_id, ret, **throughput, **extra)
+    resources.release(name)
+    watchdog.forget(name)
+    RUN_EXITS.inc(exit_code=ret)
+    RUN_SECONDS.observe(time.time() - info.get("started_at", time.time()), status=status)
+    _resume_preempted(projects_dir, name)
+
+
+def _watch_process(projects_dir, name):
     while True:
         with _lock:
             info = _running.get(name)
             if not info:
                 return
             proc = info["process"]
+            log_path = info["log_path"]
+            paused = info.get("pause_state")
+
+        log_metrics.ingest(name)
+
+        action = watchdog.check(projects_dir, name, proc.pid, log_path, paused)
+        if action and _watchdog_act(projects_dir, name, proc, action):
+            return
 
         ret = proc.poll()
         if ret is not None:
@@ -145,12 +277,15 @@ def _monitor_process(projects_dir, name):
                         _tb_running[name] = {
                             "tb_process": tb,
                             "tb_port": tb_port,
+                            "env_path": info.get("tb_env_path"),
                             "last_access": time.time(),
                         }
                         log.info("Migrated TB for %s to standalone (port %d)", name, tb_port)
                     del _running[name]
 
             status = "stopped" if ret == 0 else "crashed"
+            if info:
+                _record_exit(projects_dir, name, info, ret, status)
             _update_project_json(projects_dir, name,
                                  train_status=status, train_pid=0)
             log.info("Training for %s exited with code %d (status: %s)",
@@ -160,40 +295,139 @@ def _monitor_process(projects_dir, name):
         time.sleep(1)
 
 
+def _watchdog_act(projects_dir, name, proc, action):
+    """Carry out a watchdog action on a run. True if this monitor should stop watching."""
+    if action == "dump":
+        if not profiler.dump_stacks(projects_dir, name, proc.pid):
+            log.warning("Watchdog: no process of %s can dump its stacks", name)
+        return False
+    if action not in ("stop", "restart"):
+        return False
+    with _lock:
+        info = _running.get(name)
+        if not info or info["process"] is not proc:
+            return True
+        info["watchdog"] = watchdog.health(name).get("state")
+    stop_training(projects_dir, name)
+    if action == "restart":
+        result = start_training(projects_dir, name)
+        if "error" in result:
+            log.warning("Watchdog could not restart %s: %s", name, result["error"])
+    return True
+
+
 def start_training(projects_dir, name):
-    """Start the training subprocess for a project."""
+    """Start the training subprocess for a project.
+
+    The quick checks run here; pulling, installing new requirements and
+    spawning happen on a background thread while the name is held in
+    _starting, so a second start can't begin a duplicate run. Returns
+    {"status": "starting"} or a dict with "error".
+    """
     with _lock:
         if name in _running:
             return {"error": "Training is already running"}
+        if name in _starting:
+            return {"error": "Training is already starting"}
+        _starting[name] = {"stage": "checking", "since": time.time(), "cancelled": False}
+        _start_errors.pop(name, None)
+
+    try:
+        project, python_bin, error = _check_startable(projects_dir, name)
+    except BaseException:
+        with _lock:
+            _starting.pop(name, None)
+        raise
+    if error:
+        with _lock:
+            _starting.pop(name, None)
+        return {"error": error}
+    # Hold the env before looking again: a rebuild that swapped it meanwhile
+    # shows up here, and one that swaps it later finds it in env_in_use()
+    while True:
+        with _lock:
+            _starting[name]["env_path"] = _env_path(python_bin)
+        current = _resolve_python_binary(projects_dir, project)
+        if not current or current == python_bin:
+            break
+        python_bin = current
+
+    threading.Thread(target=_start_in_background,
+                     args=(projects_dir, name, project, python_bin), daemon=True).start()
+    return {"status": "starting"}
 
+
+def _check_startable(projects_dir, name):
+    """(project, python binary, None), or (None, None, error message)."""
     config_path = os.path.join(projects_dir, name, "project.json")
     if not os.path.isfile(config_path):
-        return {"error": "Project not found"}
+        return None, None, "Project not found"
 
     with open(config_path) as f:
         project = json.load(f)
 
     if project.get("setup_status") != "ready":
-        return {"error": "Project setup is not complete"}
+        return None, None, "Project setup is not complete"
+
+    over = janitor.over_budget(name)
+    if over:
+        return None, None, f"{over}; free some space first"
 
     python_bin = _resolve_python_binary(projects_dir, project)
     if not python_bin:
         if project.get("env_type") == "conda":
-            hint = f"conda env beekeeper-{name}"
+            from services.project_service import _active_conda_env
+            hint = f"conda env {_active_conda_env(project)}"
         else:
             hint = os.path.join(projects_dir, name, "venv", "bin")
-        return {"error": f"Could not find Python binary (checked {hint})"}
+        return None, None, f"Could not find Python binary (checked {hint})"
+    return project, python_bin, None
 
+
+def _set_stage(name, stage):
+    """Record what a start is doing. False if the start was cancelled meanwhile."""
+    with _lock:
+        starting = _starting[name]
+        starting.update(stage=stage, stage_since=time.time())
+        return not starting["cancelled"]
+
+
+def _start_cancelled(name):
+    with _lock:
+        return _starting[name]["cancelled"]
+
+
+def _start_in_background(projects_dir, name, project, python_bin):
+    try:
+        result = _launch(projects_dir, name, project, python_bin)
+    except Exception as e:
+        log.exception("Starting training for %s failed", name)
+        result = {"error": f"Failed to start training: {e}"}
+    with _lock:
+        # _launch already put a started run in _running, so the name is never unclaimed
+        _starting.pop(name, None)
+        if "error" in result:
+            _start_errors[name] = {"error": result["error"], "at": time.time()}
+    if "error" in result:
+        log.warning("Training for %s did not start: %s", name, result["error"])
+
+
+def _launch(projects_dir, name, project, python_bin):
+    """Prepare and spawn a reserved run. Returns the start result or a dict with "error"."""
     src_dir = os.path.join(projects_dir, name, "src")
 
-    # Pull latest code before running
+    # Pull latest code before running (from the shared mirror when there is one)
+    _set_stage(name, "pulling")
     branch = project.get("branch", "main")
     try:
-        result = subprocess.run(
-            ["git", "pull", "origin", branch],
-            cwd=src_dir,
-            capture_output=True, text=True, timeout=60,
-        )
+        with GIT_PULL_SECONDS.time() as labels:
+            result = subprocess.run(
+                ["git", "pull", pull_source(project), branch],
+                cwd=src_dir,
+                capture_output=True, text=True, timeout=60,
+            )
+            if result.returncode != 0:
+                labels["outcome"] = "error"
         if result.returncode != 0:
             return {"error": f"Git pull failed: {result.stderr.strip()[-500:]}"}
     except subprocess.TimeoutExpired:
@@ -201,19 +435,52 @@ def start_training(projects_dir, name):
     except Exception as e:
         return {"error": f"Git pull failed: {e}"}
 
+    # Install requirements the pull added or changed
+    _set_stage(name, "installing_deps")
+    deps = sync_requirements(projects_dir, project, python_bin)
+    if "error" in deps:
+        return deps
+
     train_file = project.get("train_file", "train.py")
     train_path = os.path.join(src_dir, train_file)
 
     if not os.path.isfile(train_path):
         return {"error": f"Training file not found: {train_file}"}
 
+    # Warm or copy the project's datasets, before anything else is paused for this run
+    if not _set_stage(name, "staging_datasets"):
+        return {"error": "Start was cancelled"}
+    staged = datasets.stage(project, cancelled=lambda: _start_cancelled(name))
+    if "error" in staged and not _start_cancelled(name):
+        return staged
+
+    # A higher-priority run pauses a lower-priority one when every GPU is busy.
+    # This waits out the victim's checkpoint grace, with the start still reserved.
+    if not _set_stage(name, "preempting"):
+        return {"error": "Start was cancelled"}
+    priority = int((project.get("resources") or {}).get("priority") or 0)
+    preempted = _preempt_for(projects_dir, name, priority)
+
+    if not _set_stage(name, "launching"):
+        if preempted:
+            resume_training(projects_dir, preempted)
+        return {"error": "Start was cancelled"}
+
     # Open log file — truncate previous run's log on new start
     log_path = os.path.join(projects_dir, name, "train.log")
     log_fd = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    if staged:
+        os.write(log_fd, datasets.describe(staged).encode())
 
     # Build environment: inherit system env + project-specific vars
     proc_env = os.environ.copy()
     proc_env.update(project.get("env_vars") or {})
+    datasets.run_env(proc_env)
+    profiler.hook_env(projects_dir, name, proc_env)
+
+    # CPU set, nice/ionice and cgroup, applied right after the spawn so every
+    # thread and process the script starts inherits them
+    limits = resources.prepare(name, project.get("resources") or {})
 
     # Start training process
     try:
@@ -227,11 +494,23 @@ def start_training(projects_dir, name):
         )
     except Exception as e:
         os.close(log_fd)
+        if preempted:
+            resume_training(projects_dir, preempted)
         return {"error": f"Failed to start training: {e}"}
 
+    resources.apply(proc.pid, name, limits)
+
     # Close our copy of the fd — the child process has its own
     os.close(log_fd)
 
+    applied = resources.check(proc.pid, name, limits)
+
+    started_at = time.time()
+    run_id = new_run_id(started_at, projects_dir, name)
+    commit = _current_commit(src_dir)
+    record_start(projects_dir, name, run_id, started_at, commit=commit)
+    log_metrics.begin(projects_dir, name, run_id, project)
+
     # Kill any standalone TB before starting a new one with training
     with _lock:
         old_tb = _tb_running.pop(name, None)
@@ -247,13 +526,7 @@ def start_training(projects_dir, name):
         if tb_port:
             tb_logdir = os.path.join(src_dir, project.get("tensorboard_log_dir", "runs"))
             try:
-                tb_process = subprocess.Popen(
-                    [tb_bin, "--logdir", tb_logdir, "--port", str(tb_port),
-                     "--bind_all"],
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
-                    start_new_session=True,
-                )
+                tb_process = _spawn_tensorboard(tb_bin, tb_logdir, tb_port)
             except Exception as e:
                 log.warning("Failed to start tensorboard for %s: %s", name, e)
                 tb_port = None
@@ -264,8 +537,18 @@ def start_training(projects_dir, name):
             "log_path": log_path,
             "tb_process": tb_process,
             "tb_port": tb_port,
-            "started_at": time.time(),
+            "started_at": started_at,
+            "run_id": run_id,
+            "commit": commit,
+            "env_path": _env_path(python_bin),
+            "tb_env_path": _env_path(tb_bin) if tb_process else None,
+            "priority": priority,
+            "pause_state": None,  # "pausing" during the checkpoint grace, then "paused"
+            "paused_at": None,
+            "paused_total": 0.0,
+            "preempted_by": None,
         }
+        cancelled = _starting[name]["cancelled"]
 
     _update_project_json(projects_dir, name,
                          train_status="running", train_pid=proc.pid)
@@ -275,22 +558,32 @@ def start_training(projects_dir, name):
         target=_monitor_process, args=(projects_dir, name), daemon=True
     )
     thread.start()
+    if cancelled:
+        # Stopped between the last check and the spawn
+        stop_training(projects_dir, name)
 
-    return {"status": "started", "pid": proc.pid, "tb_port": tb_port}
+    return {"status": "started", "pid": proc.pid, "tb_port": tb_port,
+            "dependencies": deps, "resources": applied, "preempted": preempted,
+            "datasets": staged}
 
 
 def stop_training(projects_dir, name):
-    """Stop the training subprocess for a project."""
+    """Stop the training subprocess for a project, or cancel a start in progress."""
     with _lock:
         info = _running.get(name)
+        if not info and name in _starting:
+            _starting[name]["cancelled"] = True
+            return {"status": "cancelling"}
         if not info:
             return {"error": "Training is not running"}
         proc = info["process"]
 
-    # SIGTERM the process group (the child is session leader)
+    # SIGTERM the process group (the child is session leader). A paused run
+    # only acts on it once continued.
     try:
         pgid = os.getpgid(proc.pid)
         os.killpg(pgid, signal.SIGTERM)
+        os.killpg(pgid, signal.SIGCONT)
     except (ProcessLookupError, OSError):
         pass
 
@@ -315,16 +608,180 @@ def stop_training(projects_dir, name):
                 _tb_running[name] = {
                     "tb_process": tb,
                     "tb_port": tb_port,
+                    "env_path": info.get("tb_env_path"),
                     "last_access": time.time(),
                 }
                 log.info("Migrated TB for %s to standalone (port %d)", name, tb_port)
 
+    if info:
+        _record_exit(projects_dir, name, info, proc.returncode, "stopped")
+
     _update_project_json(projects_dir, name,
                          train_status="stopped", train_pid=0)
 
     return {"status": "stopped"}
 
 
+def _signal_group(proc, sig):
+    try:
+        os.killpg(os.getpgid(proc.pid), sig)
+    except (ProcessLookupError, OSError):
+        pass
+
+
+def pause_training(projects_dir, name, preempted_by=None, wait=False):
+    """Suspend a run's process group with SIGSTOP.
+
+    If the project has a checkpoint signal, it is sent first and the group
+    gets checkpoint_grace seconds before it is stopped. That happens in the
+    background unless wait=True.
+    """
+    config_path = os.path.join(projects_dir, name, "project.json")
+    try:
+        with open(config_path) as f:
+            res = json.load(f).get("resources") or {}
+        sig = resources.checkpoint_signal(res)
+    except (OSError, ValueError, KeyError) as e:
+        return {"error": f"Could not read pause settings: {e}"}
+    grace = float(res.get("checkpoint_grace") or _CHECKPOINT_GRACE) if sig else 0
+
+    with _lock:
+        info = _running.get(name)
+        if not info:
+            return {"error": "Training is not running"}
+        if info.get("pause_state"):
+            return {"error": f"Training is already {info['pause_state']}"}
+        info["pause_state"] = "pausing"
+        info["preempted_by"] = preempted_by
+        proc = info["process"]
+
+    if sig:
+        _signal_group(proc, sig)
+        log.info("Sent %s to %s, pausing in %ss", sig.name, name, grace)
+    if wait:
+        _suspend_after(projects_dir, name, proc, grace)
+    else:
+        threading.Thread(target=_suspend_after, args=(projects_dir, name, proc, grace),
+                         daemon=True).start()
+    RUN_PAUSES.inc(reason="preempted" if preempted_by else "manual")
+    return {"status": "paused" if wait or not grace else "pausing",
+            "checkpoint_signal": sig.name if sig else None, "grace": grace}
+
+
+def _suspend_after(projects_dir, name, proc, grace):
+    """SIGSTOP a run once its checkpoint grace is over, unless it was resumed or exited."""
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline and proc.poll() is None:
+        with _lock:
+            info = _running.get(name)
+            if not info or info["process"] is not proc or info.get("pause_state") != "pausing":
+                return
+        time.sleep(0.2)
+    with _lock:
+        info = _running.get(name)
+        if (not info or info["process"] is not proc or info.get("pause_state") != "pausing"
+                or proc.poll() is not None):
+            return
+        _signal_group(proc, signal.SIGSTOP)
+        info["pause_state"] = "paused"
+        info["paused_at"] = time.time()
+    _update_project_json(projects_dir, name, train_status="paused")
+    log.info("Paused training for %s", name)
+
+
+def resume_training(projects_dir, name):
+    """SIGCONT a paused run, or cancel a pause still in its checkpoint grace."""
+    with _lock:
+        info = _running.get(name)
+        if not info:
+            return {"error": "Training is not running"}
+        state = info.get("pause_state")
+        if not state:
+            return {"error": "Training is not paused"}
+        if state == "paused":
+            _signal_group(info["process"], signal.SIGCONT)
+            info["paused_total"] += time.time() - info["paused_at"]
+        info.update(pause_state=None, paused_at=None, preempted_by=None)
+    if state == "paused":
+        _update_project_json(projects_dir, name, train_status="running")
+    log.info("Resumed training for %s", name)
+    return {"status": "running"}
+
+
+def _preempt_for(projects_dir, name, priority):
+    """Pause the lowest-priority (then newest) run below `priority` if no GPU is free.
+
+    Waits out the victim's checkpoint grace so it has saved before the new
+    run starts. Returns the paused project's name, or None.
+    """
+    with _lock:
+        candidates = [(info["priority"], -info["started_at"], other)
+                      for other, info in _running.items()
+                      if info["priority"] < priority and not info.get("pause_state")]
+    if not candidates:
+        return None
+    gpus = get_gpu_stats()
+    if not gpus or free_gpus(gpus):
+        return None
+    victim = min(candidates)[2]
+    if "error" in pause_training(projects_dir, victim, preempted_by=name, wait=True):
+        return None
+    log.info("Paused %s to make room for higher-priority %s", victim, name)
+    return victim
+
+
+def _resume_preempted(projects_dir, name):
+    """Resume the runs that were paused to make room for `name`."""
+    with _lock:
+        victims = [other for other, info in _running.items() if info.get("preempted_by") == name]
+    for other in victims:
+        resume_training(projects_dir, other)
+
+
+def _elapsed(info, now):
+    """Run time so far, not counting time spent paused."""
+    paused = info.get("paused_total", 0.0)
+    if info.get("paused_at"):
+        paused += now - info["paused_at"]
+    return now - info.get("started_at", now) - paused
+
+
+def get_training_statuses(names):
+    """Training status for several projects, read from memory under one lock."""
+    now = time.time()
+    out = {}
+    with _lock:
+        for name in names:
+            info = _running.get(name)
+            if info:
+                out[name] = {
+                    "status": "running",
+                    "pid": info["process"].pid,
+                    "run_id": info.get("run_id"),
+                    "started_at": info.get("started_at"),
+                    "elapsed": _elapsed(info, now),
+                    "tb_port": info.get("tb_port"),
+                    "paused": info.get("pause_state"),
+                    "preempted_by": info.get("preempted_by"),
+                }
+                continue
+            tb_info = _tb_running.get(name)
+            starting = _starting.get(name)
+            out[name] = {
+                "status": "starting" if starting else "idle",
+                "pid": None,
+                "run_id": None,
+                "started_at": None,
+                "elapsed": None,
+                "tb_port": tb_info.get("tb_port") if tb_info else None,
+            }
+            if starting:
+                out[name]["stage"] = starting["stage"]
+            elif name in _start_errors:
+                out[name]["start_error"] = _start_errors[name]["error"]
+    return out
+
+
 def get_training_status(name):
     """Get the current training status for a project."""
     with _lock:
@@ -334,9 +791,14 @@ def get_training_status(name):
             return {
                 "status": "running",
                 "pid": proc.pid,
+                "run_id": info.get("run_id"),
+                "commit": info.get("commit"),
                 "started_at": info.get("started_at"),
                 "tb_port": info.get("tb_port"),
-                "elapsed": time.time() - info.get("started_at", time.time()),
+                "elapsed": _elapsed(info, time.time()),
+                "paused": info.get("pause_state"),
+                "preempted_by": info.get("preempted_by"),
+                "health": watchdog.health(name),
             }
     # Check standalone TB
     with _lock:
@@ -346,13 +808,23 @@ def get_training_status(name):
             tb_port = tb_info.get("tb_port")
         else:
             tb_port = None
-    return {
-        "status": "idle",
+        starting = dict(_starting[name]) if name in _starting else None
+        start_error = _start_errors.get(name)
+    out = {
+        "status": "starting" if starting else "idle",
         "pid": None,
+        "run_id": None,
+        "commit": None,
         "started_at": None,
         "tb_port": tb_port,
         "elapsed": None,
+        "health": watchdog.health(name),
     }
+    if starting:
+        out.update(stage=starting["stage"], starting_since=starting["since"])
+    elif start_error:
+        out.update(start_error=start_error["error"], start_error_at=start_error["at"])
+    return out
 
 
 def start_tensorboard(projects_dir, name):
@@ -394,12 +866,7 @@ def start_tensorboard(projects_dir, name):
         return {"error": "No free port available for Tensorboard"}
 
     try:
-        tb_process = subprocess.Popen(
-            [tb_bin, "--logdir", tb_logdir, "--port", str(tb_port), "--bind_all"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            start_new_session=True,
-        )
+        tb_process = _spawn_tensorboard(tb_bin, tb_logdir, tb_port)
     except Exception as e:
         return {"error": f"Failed to start Tensorboard: {e}"}
 
@@ -407,6 +874,7 @@ def start_tensorboard(projects_dir, name):
         _tb_running[name] = {
             "tb_process": tb_process,
             "tb_port": tb_port,
+            "env_path": _env_path(tb_bin),
             "last_access": time.time(),
         }
 
@@ -0,0 +1,306 @@
+"""On-demand sampling profiles of running training processes.
+
+Runs start with hooks/profiler on PYTHONPATH, whose sitecustomize registers
+every Python process of the run under projects/<name>/profiles/pids and waits
+for a real-time signal (see the hook for details). start_profile() writes a
+request, signals the registered processes in the run's tree, and a thread
+merges what they write into one collapsed-stack file and a flame graph SVG.
+"""
+import os
+import json
+import html
+import time
+import uuid
+import shutil
+import signal
+import threading
+import logging
+
+import psutil
+
+from services.metrics import Counter
+
+log = logging.getLogger(__name__)
+
+_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOOK_DIR = os.path.join(_HOME, "hooks", "profiler")
+ENABLED = os.environ.get("BEEKEEPER_PROFILER", "1") != "0"
+SIGNAL_OFFSET = 7  # SIGRTMIN + 7; matches the hook's default
+STACKS_SIGNAL_OFFSET = 8  # SIGRTMIN + 8 dumps stacks to the run's log via faulthandler
+MAX_SECONDS = 300
+KEEP_PROFILES = 10  # per project
+_COLLECT_GRACE = 5  # seconds past the duration to wait for processes to write results
+
+PROFILES = Counter("beekeeper_profiles", "Profiles taken", ["outcome"])
+
+_active = {}  # {name: profile id}
+_lock = threading.Lock()
+
+
+def _profiles_dir(projects_dir, name):
+    return os.path.join(projects_dir, name, "profiles")
+
+
+def hook_env(projects_dir, name, env):
+    """Add the profiler hook to a run's environment and forget the last run's processes."""
+    if not ENABLED:
+        return env
+    profiles_dir = _profiles_dir(projects_dir, name)
+    shutil.rmtree(os.path.join(profiles_dir, "pids"), ignore_errors=True)
+    os.makedirs(profiles_dir, exist_ok=True)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (HOOK_DIR, env.get("PYTHONPATH")) if p)
+    env["BEEKEEPER_PROFILE_DIR"] = profiles_dir
+    env["BEEKEEPER_PROFILE_SIGNAL_OFFSET"] = str(SIGNAL_OFFSET)
+    env["BEEKEEPER_STACKS_SIGNAL_OFFSET"] = str(STACKS_SIGNAL_OFFSET)
+    return env
+
+
+def _run_processes(profiles_dir, root_pid):
+    """{pid: label} of the run's processes that loaded the hook."""
+    try:
+        root = psutil.Process(root_pid)
+        procs = [root] + root.children(recursive=True)
+    except psutil.Error:
+        return {}
+    registered = set(os.listdir(os.path.join(profiles_dir, "pids"))) \
+        if os.path.isdir(os.path.join(profiles_dir, "pids")) else set()
+    out = {}
+    for proc in procs:
+        if str(proc.pid) not in registered:
+            continue
+        out[proc.pid] = "main" if proc.pid == root_pid else f"worker {proc.pid}"
+    return out
+
+
+def dump_stacks(projects_dir, name, root_pid):
+    """Have each of a run's processes write all its threads' stacks to the run's log.
+
+    Only processes whose hook registered the faulthandler signal are sent it;
+    to anything else the signal would be fatal. Returns how many were signalled.
+    """
+    if not ENABLED:
+        return 0
+    profiles_dir = _profiles_dir(projects_dir, name)
+    sent = 0
+    for pid in _run_processes(profiles_dir, root_pid):
+        try:
+            with open(os.path.join(profiles_dir, "pids", str(pid))) as f:
+                offset = json.load(f).get("stacks_signal")
+            if offset is None:
+                continue
+            os.kill(pid, signal.SIGRTMIN + int(offset))
+            sent += 1
+        except (OSError, ValueError):
+            continue
+    return sent
+
+
+def _prune(profiles_dir):
+    ids = sorted((d for d in os.listdir(profiles_dir) if d != "pids"
+                  and os.path.isdir(os.path.join(profiles_dir, d))), reverse=True)
+    for old in ids[KEEP_PROFILES:]:
+        shutil.rmtree(os.path.join(profiles_dir, old), ignore_errors=True)
+
+
+def start_profile(projects_dir, name, root_pid, duration, tracemalloc=False, interval=0.01):
+    """Sample a run's Python processes for duration seconds in the background."""
+    if not ENABLED:
+        return {"error": "Profiling is disabled (BEEKEEPER_PROFILER=0)"}
+    if not 0 < duration <= MAX_SECONDS:
+        return {"error": f"Duration must be between 1 and {MAX_SECONDS} seconds"}
+    profiles_dir = _profiles_dir(projects_dir, name)
+    procs = _run_processes(profiles_dir, root_pid)
+    if not procs:
+        return {"error": "No profiler hook in this run; runs started before the profiler "
+                         "was enabled, or with python -S/-I, can't be profiled"}
+
+    with _lock:
+        if name in _active:
+            return {"error": "A profile is already being taken", "id": _active[name]}
+        profile_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        _active[name] = profile_id
+
+    # From here on _collect() clears _active; until it's running, clear it ourselves
+    try:
+        out_dir = os.path.join(profiles_dir, profile_id)
+        os.makedirs(out_dir)
+        meta = {
+            "id": profile_id,
+            "status": "running",
+            "started_at": time.time(),
+            "duration": duration,
+            "interval": interval,
+            "tracemalloc": bool(tracemalloc),
+            "processes": {str(pid): label for pid, label in procs.items()},
+        }
+        _write_json(os.path.join(out_dir, "meta.json"), meta)
+        _write_json(os.path.join(profiles_dir, "request.json"), {
+            "id": profile_id, "duration": duration, "interval": interval,
+            "tracemalloc": bool(tracemalloc),
+        })
+
+        sig = signal.SIGRTMIN + SIGNAL_OFFSET
+        for pid in list(procs):
+            try:
+                os.kill(pid, sig)
+            except OSError:
+                procs.pop(pid)
+        threading.Thread(target=_collect, args=(profiles_dir, name, meta, procs),
+                         daemon=True).start()
+    except BaseException:
+        with _lock:
+            _active.pop(name, None)
+        raise
+    return {"id": profile_id, "processes": len(procs)}
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _collect(profiles_dir, name, meta, procs):
+    out_dir = os.path.join(profiles_dir, meta["id"])
+    try:
+        deadline = meta["started_at"] + meta["duration"] + _COLLECT_GRACE
+        pending = set(procs)
+        while pending and time.time() < deadline:
+            time.sleep(0.5)
+            pending = {pid for pid in pending
+                       if not os.path.exists(os.path.join(out_dir, f"{pid}.collapsed"))}
+
+        stacks = {}
+        allocations = []
+        for pid, label in procs.items():
+            try:
+                with open(os.path.join(out_dir, f"{pid}.collapsed")) as f:
+                    for line in f:
+                        key, _, count = line.rstrip("\n").rpartition(" ")
+                        stacks[f"{label};{key}"] = stacks.get(f"{label};{key}", 0) + int(count)
+            except (OSError, ValueError):
+                continue
+            try:
+                with open(os.path.join(out_dir, f"{pid}.alloc.json")) as f:
+                    allocations.append({"process": label, **json.load(f)})
+            except (OSError, ValueError):
+                pass
+
+        with open(os.path.join(out_dir, "stacks.collapsed"), "w") as f:
+            for key, count in sorted(stacks.items()):
+                f.write(f"{key} {count}\n")
+        with open(os.path.join(out_dir, "flamegraph.svg"), "w") as f:
+            f.write(flamegraph(stacks, title=f"{name} {meta['id']}"))
+        if meta["tracemalloc"]:
+            _write_json(os.path.join(out_dir, "allocations.json"), allocations)
+        meta.update(status="done", samples=sum(stacks.values()),
+                    missing=sorted(procs[pid] for pid in pending))
+        PROFILES.inc(outcome="done")
+    except Exception as e:
+        log.warning("Profile %s of %s failed: %s", meta["id"], name, e)
+        meta.update(status="error", error=str(e))
+        PROFILES.inc(outcome="error")
+    finally:
+        _write_json(os.path.join(out_dir, "meta.json"), meta)
+        with _lock:
+            _active.pop(name, None)
+        _prune(profiles_dir)
+
+
+def get_profile(projects_dir, name, profile_id):
+    """A profile's meta.json, or None."""
+    if os.sep in profile_id or profile_id.startswith("."):
+        return None
+    try:
+        with open(os.path.join(_profiles_dir(projects_dir, name), profile_id, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def list_profiles(projects_dir, name):
+    """Metas of a project's kept profiles, newest first."""
+    profiles_dir = _profiles_dir(projects_dir, name)
+    if not os.path.isdir(profiles_dir):
+        return []
+    out = []
+    for profile_id in sorted(os.listdir(profiles_dir), reverse=True):
+        meta = get_profile(projects_dir, name, profile_id)
+        if meta:
+            out.append(meta)
+    return out
+
+
+def profile_file(projects_dir, name, profile_id, filename):
+    """Path of one of a finished profile's outputs."""
+    return os.path.join(_profiles_dir(projects_dir, name), profile_id, filename)
+
+
+# --- Flame graph -----------------------------------------------------------
+
+_WIDTH = 1200
+_ROW = 16
+_MIN_WIDTH = 0.5  # px; narrower frames are dropped
+
+
+def _tree(stacks):
+    root = {"name": "all", "value": 0, "children": {}}
+    for key, count in stacks.items():
+        node = root
+        node["value"] += count
+        for frame in key.split(";"):
+            node = node["children"].setdefault(frame, {"name": frame, "value": 0, "children": {}})
+            node["value"] += count
+    return root
+
+
+def _color(name):
+    h = sum(ord(c) for c in name.split(" (")[0])
+    return f"rgb({205 + h % 50},{80 + (h * 7) % 120},{40 + (h * 13) % 50})"
+
+
+def flamegraph(stacks, title="Profile"):
+    """A self-contained SVG flame graph (root at the bottom) of collapsed stacks."""
+    root = _tree(stacks)
+    total = root["value"] or 1
+    scale = _WIDTH / total
+    rects = []
+    depth_max = 0
+
+    def walk(node, x, depth):
+        nonlocal depth_max
+        width = node["value"] * scale
+        if width < _MIN_WIDTH:
+            return
+        depth_max = max(depth_max, depth)
+        rects.append((x, depth, width, node["name"], node["value"]))
+        child_x = x
+        for child in sorted(node["children"].values(), key=lambda c: c["name"]):
+            walk(child, child_x, depth + 1)
+            child_x += child["value"] * scale
+
+    walk(root, 0.0, 0)
+    height = (depth_max + 1) * _ROW + 40
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{_WIDTH}" height="{height}" '
+        f'font-family="monospace" font-size="11">',
+        '<rect width="100%" height="100%" fill="#f8f8f8"/>',
+        f'<text x="{_WIDTH / 2}" y="18" text-anchor="middle" font-size="14">'
+        f'{html.escape(title)} ({total} samples)</text>',
+    ]
+    for x, depth, width, name, value in rects:
+        y = height - (depth + 1) * _ROW - 4
+        label = html.escape(name)
+        out.append(
+            f'<g><title>{label} ({value} samples, {value * 100 / total:.1f}%)</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{width:.1f}" height="{_ROW - 1}" '
+            f'fill="{_color(name)}" rx="2"/>'
+        )
+        chars = int(width / 7)
+        if chars >= 3:
+            text = name if len(name) <= chars else name[:chars - 2] + ".."
+            out.append(f'<text x="{x + 3:.1f}" y="{y + _ROW - 4}">{html.escape(text)}</text>')
+        out.append("</g>")
+    out.append("</svg>")
+    return "\n".join(out)
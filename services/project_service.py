@@ -1,22 +1,89 @@
 import os
+import re
 import json as _json
 import shutil
 import subprocess
 import threading
+import time
 import logging
 
 from models.project import Project
 from services.python_versions import find_python, _find_conda_bin
+from services.artifact_index import ensure_indexer, _matches
+from services.metrics import Histogram
+from services.wheelhouse import pip_install
+from services.dependencies import record_installed
+from services.env_pool import claim_venv, claim_conda, _relocate
+from services.git_mirror import clone
+from services.janitor import trash
+from services import setup_log
+from services.artifact_store import copy_project, drop_project
+from services.reflink import clone_tree
+from services.process_manager import _update_project_json, env_in_use
 
 log = logging.getLogger(__name__)
 
 CONDA_ENV_PREFIX = "beekeeper-"
+_RETIRE_POLL = 10  # seconds between checks for runs still using a replaced env
+
+_rebuilding = set()
+_rebuild_lock = threading.Lock()
+
+# Settings create_project copies from data when present
+_OPTIONAL_FIELDS = ("env_vars", "resources", "retention", "artifact_globs", "store_globs",
+                    "datasets", "watchdog", "metric_patterns", "total_steps", "batch_size")
+
+# Fields a fork starts with fresh rather than copying
+_FORK_RESET = ("setup_status", "setup_error", "rebuild_status", "rebuild_error",
+               "train_status", "train_pid", "conda_env")
+
+# Setup/rebuild statuses that start a stage in the setup log
+_STAGE_LABELS = {
+    "cloning": "Cloning",
+    "copying": "Copying source",
+    "creating_env": "Creating environment",
+    "installing_deps": "Installing requirements",
+    "waiting_for_idle": "Waiting for runs on the old environment to finish",
+}
+
+_config_cache = {}  # {name: (mtime_ns, project dict)}
+_config_lock = threading.Lock()
+
+SETUP_STAGE_SECONDS = Histogram(
+    "beekeeper_setup_stage_seconds", "Project setup stage durations", ["stage", "outcome"])
 
 
 def _conda_env_name(project_name):
     return f"{CONDA_ENV_PREFIX}{project_name}"
 
 
+def _active_conda_env(project):
+    """Name of the conda env a project currently runs in (rebuilds switch it)."""
+    return project.get("conda_env") or _conda_env_name(project["name"])
+
+
+def _env_stamp():
+    return time.strftime("%Y%m%d-%H%M%S")
+
+
+def _new_venv_dir(project_dir):
+    base = os.path.join(project_dir, "envs", f"venv-{_env_stamp()}")
+    env_dir, n = base, 1
+    while os.path.lexists(env_dir):
+        env_dir, n = f"{base}-{n}", n + 1
+    return env_dir
+
+
+def _link_venv(project_dir, env_dir):
+    """Point project_dir/venv at env_dir. Swapping the symlink is atomic."""
+    link = os.path.join(project_dir, "venv")
+    tmp_link = f"{link}.swap"
+    if os.path.lexists(tmp_link):
+        os.unlink(tmp_link)
+    os.symlink(os.path.relpath(env_dir, project_dir), tmp_link)
+    os.replace(tmp_link, link)
+
+
 def _resolve_conda_env_path(conda_bin, env_name):
     """Get the filesystem path for a named conda environment."""
     try:
@@ -33,7 +100,30 @@ def _resolve_conda_env_path(conda_bin, env_name):
     return None
 
 
-def create_project(projects_dir, data):
+def load_project_cached(projects_dir, name):
+    """project.json as a dict, re-read only when the file changed. None if missing."""
+    config_path = os.path.join(projects_dir, name, "project.json")
+    try:
+        mtime = os.stat(config_path).st_mtime_ns
+    except FileNotFoundError:
+        with _config_lock:
+            _config_cache.pop(name, None)
+        return None
+    with _config_lock:
+        cached = _config_cache.get(name)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(config_path) as f:
+            data = _json.load(f)
+    except (OSError, ValueError):
+        return cached[1] if cached else None
+    with _config_lock:
+        _config_cache[name] = (mtime, data)
+    return data
+
+
+def create_project(projects_dir, data, local_setup=True):
     """Create a new project: save config, then clone/venv/install in background."""
     project = Project(
         name=data["name"],
@@ -44,13 +134,23 @@ def create_project(projects_dir, data):
         tensorboard_log_dir=data.get("tensorboard_log_dir", "runs"),
         requirements_file=data.get("requirements_file", "requirements.txt"),
         env_type=data.get("env_type", "venv"),
+        clone_mode=data.get("clone_mode", "full"),
     )
+    for key in _OPTIONAL_FIELDS:
+        if key in data:
+            setattr(project, key, data[key])
+    if local_setup is False:
+        # Config-only project (hive mode): workers set it up when it is dispatched
+        project.setup_status = "ready"
+        project.save(projects_dir)
+        return project
     project.save(projects_dir)
 
     thread = threading.Thread(
         target=_setup_project, args=(projects_dir, project), daemon=True
     )
     thread.start()
+    ensure_indexer(projects_dir, project.name)
 
     return project
 
@@ -59,90 +159,279 @@ def _setup_project(projects_dir, project):
     """Clone repo, create env, install deps. Updates project.json status as it goes."""
     project_dir = os.path.join(projects_dir, project.name)
     src_dir = os.path.join(project_dir, "src")
+    run = setup_log.runner(projects_dir, project.name)
+    setup_log.begin(projects_dir, project.name, f"Setting up {project.name}")
 
     def _save_status(status, error=None):
         project.setup_status = status
         project.setup_error = error
         project.save(projects_dir)
+        _log_status(projects_dir, project.name, status, error, done="ready")
 
     # --- Git clone ---
     _save_status("cloning")
     try:
-        subprocess.run(
-            ["git", "clone", "-b", project.branch, project.git_url, src_dir],
-            check=True, capture_output=True, text=True, timeout=300,
-        )
+        with SETUP_STAGE_SECONDS.time(stage="git_clone"):
+            clone(project.git_url, project.branch, src_dir, project.clone_mode, run=run)
     except subprocess.CalledProcessError as e:
         _save_status("error", f"Git clone failed: {e.stderr.strip()}")
         return
-    except subprocess.TimeoutExpired:
-        _save_status("error", "Git clone timed out (5 min)")
+    except subprocess.TimeoutExpired as e:
+        _save_status("error", f"Git clone timed out ({int(e.timeout)}s)")
         return
 
     # --- Create environment ---
     _save_status("creating_env")
 
     if project.env_type == "conda":
-        pip_bin = _create_conda_env(project, _save_status)
+        pip_bin = _create_conda_env(project, _save_status, run=run)
     else:
-        env_dir = os.path.join(project_dir, "venv")
-        pip_bin = _create_venv(project, env_dir, _save_status)
+        env_dir = _new_venv_dir(project_dir)
+        pip_bin = _create_venv(project, env_dir, _save_status, run=run)
+        if pip_bin:
+            _link_venv(project_dir, env_dir)
 
     if pip_bin is None:
         return  # _save_status("error", ...) already called
 
     # --- Pip install ---
-    req_path = os.path.join(src_dir, project.requirements_file)
-    if os.path.isfile(req_path):
-        _save_status("installing_deps")
+    if not _install_requirements(projects_dir, project, pip_bin, _save_status, run=run):
+        return
+
+    _save_status("ready")
+
+
+def fork_project(projects_dir, source, name, include_outputs=False, local_setup=True):
+    """Create project `name` from `source`: same settings, a copy of src/ with its
+    git state and of the environment, in the background.
+
+    Checkpoints (artifact globs) and TensorBoard logs are left behind unless
+    include_outputs. Returns the new Project, or a dict with "error".
+    """
+    config_path = os.path.join(projects_dir, source, "project.json")
+    if not os.path.isfile(config_path):
+        return {"error": "Project not found"}
+    if os.path.exists(os.path.join(projects_dir, name)):
+        return {"error": f"Project '{name}' already exists"}
+    data = Project.load(config_path).to_dict()
+    if local_setup and data["setup_status"] != "ready":
+        return {"error": "Project setup is not complete"}
+
+    defaults = Project(name=name, git_url=data["git_url"]).to_dict()
+    data.update({key: defaults[key] for key in _FORK_RESET})
+    data.update(name=name, forked_from=source)
+    project = Project(**data)
+    if local_setup is False:
+        # Config-only project (hive mode): workers set it up when it is dispatched
+        project.setup_status = "ready"
+        project.save(projects_dir)
+        return project
+    project.save(projects_dir)
+
+    thread = threading.Thread(
+        target=_fork_setup, args=(projects_dir, source, project, include_outputs), daemon=True
+    )
+    thread.start()
+    ensure_indexer(projects_dir, project.name)
+    return project
+
+
+def _repoint_editables(env_dir, old_src, new_src):
+    """Point editable installs (.pth files, __editable__ finders) of a copied env at new_src."""
+    old, new = old_src.encode(), new_src.encode()
+    lib_dir = os.path.join(env_dir, "lib")
+    for version in os.listdir(lib_dir) if os.path.isdir(lib_dir) else []:
+        site = os.path.join(lib_dir, version, "site-packages")
+        if not os.path.isdir(site):
+            continue
+        for filename in os.listdir(site):
+            if not (filename.endswith(".pth") or filename.startswith("__editable__")):
+                continue
+            path = os.path.join(site, filename)
+            with open(path, "rb") as f:
+                content = f.read()
+            if old in content:
+                with open(path, "wb") as f:
+                    f.write(content.replace(old, new))
+
+
+def _env_link_ok(relpath):
+    """Files of a venv that are safe to hard-link: everything installed packages
+    replace rather than rewrite, i.e. all but the files fixed up after a move."""
+    first = relpath.split(os.sep, 1)[0]
+    filename = os.path.basename(relpath)
+    return not (first == "bin" or relpath == "pyvenv.cfg" or filename.endswith(".pth")
+                or filename.startswith("__editable__"))
+
+
+def _fork_setup(projects_dir, source, project, include_outputs):
+    """Copy src/ and the environment of `source` into a forked project."""
+    name = project.name
+    source_dir = os.path.join(projects_dir, source)
+    project_dir = os.path.join(projects_dir, name)
+    src_dir = os.path.join(project_dir, "src")
+    run = setup_log.runner(projects_dir, name)
+    setup_log.begin(projects_dir, name, f"Forking {source} into {name}")
+
+    def _save_status(status, error=None):
+        project.setup_status = status
+        project.setup_error = error
+        project.save(projects_dir)
+        _log_status(projects_dir, name, status, error, done="ready")
+
+    tb_dir = os.path.normpath(project.tensorboard_log_dir)
+    globs = project.artifact_globs
+
+    def skip_output(relpath):
+        if include_outputs:
+            return False
+        return (relpath == tb_dir or relpath.startswith(tb_dir + os.sep)
+                or _matches(relpath, globs))
+
+    def src_link_ok(relpath):
+        # Git objects are never rewritten; git clone --local links them too
+        return relpath.startswith(os.path.join(".git", "objects") + os.sep)
+
+    # --- Source, with its git state ---
+    _save_status("copying")
+    try:
+        with SETUP_STAGE_SECONDS.time(stage="fork_copy"):
+            counts = clone_tree(os.path.join(source_dir, "src"), src_dir,
+                                skip=skip_output, link_ok=src_link_ok)
+        setup_log._append(projects_dir, name, _describe_copy("src/", counts).encode())
+        if include_outputs:
+            stored = copy_project(projects_dir, source, name)
+            if stored:
+                setup_log._append(projects_dir, name,
+                                  f"{stored} deduplicated checkpoints shared with {source}\n".encode())
+    except OSError as e:
+        _save_status("error", f"Copying source failed: {e}")
+        return
+
+    # --- Environment ---
+    _save_status("creating_env")
+    source_project = Project.load(os.path.join(source_dir, "project.json")).to_dict()
+    if project.env_type == "conda":
+        conda_bin = _find_conda_bin()
+        if not conda_bin:
+            _save_status("error", "conda not found on this system")
+            return
         try:
-            subprocess.run(
-                [pip_bin, "install", "-r", req_path],
-                check=True, capture_output=True, text=True, timeout=600,
-            )
+            with SETUP_STAGE_SECONDS.time(stage="fork_conda_clone"):
+                run([conda_bin, "create", "-y", "-n", _conda_env_name(name),
+                     "--clone", _active_conda_env(source_project)], timeout=1800)
         except subprocess.CalledProcessError as e:
-            _save_status("error", f"Pip install failed: {e.stderr.strip()[-500:]}")
+            _save_status("error", f"Conda env clone failed: {e.stderr.strip()[-500:]}")
+            return
+        except subprocess.TimeoutExpired as e:
+            _save_status("error", f"Conda env clone timed out ({int(e.timeout)}s)")
+            return
+    else:
+        source_env = os.path.realpath(os.path.join(source_dir, "venv"))
+        env_dir = _new_venv_dir(project_dir)
+        try:
+            with SETUP_STAGE_SECONDS.time(stage="fork_venv_copy"):
+                counts = clone_tree(source_env, env_dir, link_ok=_env_link_ok)
+                _relocate(env_dir, source_env)
+                _repoint_editables(env_dir, os.path.join(source_dir, "src"), src_dir)
+        except OSError as e:
+            shutil.rmtree(env_dir, ignore_errors=True)
+            _save_status("error", f"Copying the environment failed: {e}")
             return
+        setup_log._append(projects_dir, name, _describe_copy("venv", counts).encode())
+        _link_venv(project_dir, env_dir)
+
+    # The environment matches what the source last synced against
+    deps_path = os.path.join(source_dir, "deps.json")
+    if os.path.isfile(deps_path):
+        shutil.copy2(deps_path, os.path.join(project_dir, "deps.json"))
 
     _save_status("ready")
 
 
-def _create_venv(project, env_dir, _save_status):
+def _describe_copy(what, counts):
+    return (f"{what}: {counts['bytes'] / 1024 ** 2:.1f} MiB, {counts['reflink']} files reflinked, "
+            f"{counts['hardlink']} hard-linked, {counts['copy']} copied\n")
+
+
+def _log_status(projects_dir, name, status, error, done):
+    """Mirror a setup/rebuild status change into the setup log."""
+    if status in _STAGE_LABELS:
+        setup_log.stage(projects_dir, name, _STAGE_LABELS[status])
+    elif status == "error":
+        setup_log.end(projects_dir, name, f"Failed: {error}")
+    elif status == done:
+        setup_log.end(projects_dir, name, "Done")
+
+
+def _install_requirements(projects_dir, project, pip_bin, _save_status, run=None):
+    """Install the project's requirements file into an env. Returns False on failure."""
+    req_path = os.path.join(projects_dir, project.name, "src", project.requirements_file)
+    if not os.path.isfile(req_path):
+        return True
+    _save_status("installing_deps")
+    try:
+        started = time.monotonic()
+        with SETUP_STAGE_SECONDS.time(stage="pip_install"):
+            pip_install(pip_bin, ["-r", req_path], run=run)
+        record_installed(projects_dir, project.name, req_path,
+                         time.monotonic() - started)
+    except subprocess.CalledProcessError as e:
+        _save_status("error", f"Pip install failed: {e.stderr.strip()[-500:]}")
+        return False
+    except subprocess.TimeoutExpired as e:
+        _save_status("error", f"Pip install timed out ({int(e.timeout)}s)")
+        return False
+    return True
+
+
+def _create_venv(project, env_dir, _save_status, run=None):
     """Create a standard Python venv. Returns pip path or None on failure."""
     python_bin = find_python(project.python_version)
     if not python_bin:
         _save_status("error", f"No Python found for version {project.python_version}")
         return None
+    with SETUP_STAGE_SECONDS.time(stage="venv_claim"):
+        claimed = claim_venv(project.python_version, env_dir)
+    if claimed:
+        return os.path.join(env_dir, "bin", "pip")
     try:
-        subprocess.run(
-            [python_bin, "-m", "venv", env_dir],
-            check=True, capture_output=True, text=True, timeout=120,
-        )
+        with SETUP_STAGE_SECONDS.time(stage="venv_create"):
+            if run:
+                run([python_bin, "-m", "venv", env_dir], timeout=120)
+            else:
+                subprocess.run(
+                    [python_bin, "-m", "venv", env_dir],
+                    check=True, capture_output=True, text=True, timeout=120,
+                )
     except (subprocess.CalledProcessError, FileNotFoundError) as e:
         _save_status("error", f"Venv creation failed: {e}")
         return None
     return os.path.join(env_dir, "bin", "pip")
 
 
-def _create_conda_env(project, _save_status):
+def _create_conda_env(project, _save_status, env_name=None, run=None):
     """Create a named conda environment. Returns pip path or None on failure."""
     conda_bin = _find_conda_bin()
     if not conda_bin:
         _save_status("error", "conda not found on this system")
         return None
 
-    env_name = _conda_env_name(project.name)
-    try:
-        subprocess.run(
-            [
-                conda_bin, "create", "-y", "-n", env_name,
-                f"python={project.python_version}", "pip",
-            ],
-            check=True, capture_output=True, text=True, timeout=300,
-        )
-    except subprocess.CalledProcessError as e:
-        _save_status("error", f"Conda env creation failed: {e.stderr.strip()[-500:]}")
-        return None
+    env_name = env_name or _conda_env_name(project.name)
+    with SETUP_STAGE_SECONDS.time(stage="conda_claim"):
+        claimed = claim_conda(project.python_version, env_name)
+    if not claimed:
+        try:
+            cmd = [conda_bin, "create", "-y", "-n", env_name,
+                   f"python={project.python_version}", "pip"]
+            with SETUP_STAGE_SECONDS.time(stage="conda_create"):
+                if run:
+                    run(cmd, timeout=300)
+                else:
+                    subprocess.run(cmd, check=True, capture_output=True, text=True, timeout=300)
+        except subprocess.CalledProcessError as e:
+            _save_status("error", f"Conda env creation failed: {e.stderr.strip()[-500:]}")
+            return None
 
     env_path = _resolve_conda_env_path(conda_bin, env_name)
     if not env_path:
@@ -152,26 +441,167 @@ def _create_conda_env(project, _save_status):
     return os.path.join(env_path, "bin", "pip")
 
 
+def rebuild_environment(projects_dir, name):
+    """Build a fresh environment next to the current one and switch to it when ready.
+
+    Runs keep going on the old environment, which is removed once no training
+    or tensorboard process of the project uses it any more.
+    """
+    config_path = os.path.join(projects_dir, name, "project.json")
+    if not os.path.isfile(config_path):
+        return {"error": "Project not found"}
+    project = Project.load(config_path)
+    if project.setup_status != "ready":
+        return {"error": "Project setup is not complete"}
+
+    with _rebuild_lock:
+        if name in _rebuilding:
+            return {"error": "An environment rebuild is already in progress"}
+        _rebuilding.add(name)
+
+    _update_project_json(projects_dir, name, rebuild_status="creating_env", rebuild_error="")
+    thread = threading.Thread(
+        target=_rebuild_project, args=(projects_dir, project), daemon=True
+    )
+    thread.start()
+    return {"status": "rebuilding"}
+
+
+def _rebuild_project(projects_dir, project):
+    """Create and install the new env, swap it in, then retire the old one."""
+    name = project.name
+    project_dir = os.path.join(projects_dir, name)
+    run = setup_log.runner(projects_dir, name)
+    setup_log.begin(projects_dir, name, f"Rebuilding the environment of {name}")
+
+    def _save_status(status, error=None):
+        _update_project_json(projects_dir, name, rebuild_status=status, rebuild_error=error or "")
+        _log_status(projects_dir, name, status, error, done="")
+
+    try:
+        _save_status("creating_env")
+        if project.env_type == "conda":
+            env_name = f"{_conda_env_name(name)}-{_env_stamp()}"
+            pip_bin = _create_conda_env(project, _save_status, env_name, run=run)
+            if pip_bin is None:
+                _remove_conda_env(env_name)
+                return
+            if not _install_requirements(projects_dir, project, pip_bin, _save_status, run=run):
+                _remove_conda_env(env_name)
+                return
+            old_env = _active_conda_env(project.to_dict())
+            old_path = _resolve_conda_env_path(_find_conda_bin(), old_env)
+            _update_project_json(projects_dir, name, conda_env=env_name)
+            log.info("Switched %s to conda env %s", name, env_name)
+            _save_status("")
+            if old_path:
+                _retire_env(name, old_path, lambda: _remove_conda_env(old_env))
+            return
+
+        env_dir = _new_venv_dir(project_dir)
+        pip_bin = _create_venv(project, env_dir, _save_status, run=run)
+        if pip_bin is None:
+            shutil.rmtree(env_dir, ignore_errors=True)
+            return
+        if not _install_requirements(projects_dir, project, pip_bin, _save_status, run=run):
+            shutil.rmtree(env_dir, ignore_errors=True)
+            return
+
+        link = os.path.join(project_dir, "venv")
+        if os.path.isdir(link) and not os.path.islink(link):
+            # Pre-versioning layout: a real directory can't be swapped atomically,
+            # so move it aside once nothing runs from it.
+            _save_status("waiting_for_idle")
+            _wait_until_unused(name, link)
+            old_path = os.path.join(project_dir, "envs", "venv-previous")
+            shutil.rmtree(old_path, ignore_errors=True)
+            os.rename(link, old_path)
+        else:
+            old_path = os.path.realpath(link) if os.path.lexists(link) else None
+        _link_venv(project_dir, env_dir)
+        log.info("Switched %s to venv %s", name, os.path.basename(env_dir))
+        _save_status("")
+        if old_path and os.path.isdir(old_path):
+            _retire_env(name, old_path, lambda: shutil.rmtree(old_path, ignore_errors=True))
+    except Exception as e:
+        log.exception("Environment rebuild failed for %s", name)
+        _save_status("error", f"Rebuild failed: {e}")
+    finally:
+        with _rebuild_lock:
+            _rebuilding.discard(name)
+
+
+def _wait_until_unused(name, env_path):
+    while env_in_use(name, env_path):
+        time.sleep(_RETIRE_POLL)
+
+
+def _retire_env(name, env_path, remove):
+    """Remove a replaced env in the background once the runs still using it have exited."""
+    def _retire():
+        _wait_until_unused(name, env_path)
+        remove()
+        log.info("Removed old environment %s of %s", env_path, name)
+
+    threading.Thread(target=_retire, daemon=True).start()
+
+
+def _remove_conda_env(env_name):
+    conda_bin = _find_conda_bin()
+    if conda_bin:
+        subprocess.run(
+            [conda_bin, "env", "remove", "-y", "-n", env_name],
+            capture_output=True, text=True, timeout=120,
+        )
+
+
+def _project_conda_envs(conda_bin, name):
+    """Names of every conda env belonging to a project, including rebuilt ones."""
+    pattern = re.compile(rf"^{re.escape(_conda_env_name(name))}(-\d{{8}}-\d{{6}})?$")
+    try:
+        out = subprocess.run(
+            [conda_bin, "info", "--envs", "--json"],
+            capture_output=True, text=True, timeout=30,
+        )
+        envs = _json.loads(out.stdout).get("envs", [])
+    except Exception:
+        return [_conda_env_name(name)]
+    return [os.path.basename(p) for p in envs if pattern.match(os.path.basename(p))]
+
+
+def _remove_project_conda_envs(name):
+    conda_bin = _find_conda_bin()
+    if not conda_bin:
+        return
+    for env_name in _project_conda_envs(conda_bin, name):
+        try:
+            subprocess.run(
+                [conda_bin, "env", "remove", "-y", "-n", env_name],
+                capture_output=True, text=True, timeout=120,
+            )
+        except Exception:
+            pass
+
+
 def delete_project(projects_dir, name):
-    """Remove a project directory and its conda env (if any)."""
+    """Remove a project directory and its conda env (if any).
+
+    The directory goes to the janitor's trash and conda envs are removed in
+    the background, so this returns immediately.
+    """
     project_dir = os.path.join(projects_dir, name)
     config_path = os.path.join(project_dir, "project.json")
 
-    # Clean up conda env if this was a conda project
+    env_type = None
     if os.path.isfile(config_path):
         try:
             with open(config_path) as f:
-                data = _json.load(f)
-            if data.get("env_type") == "conda":
-                conda_bin = _find_conda_bin()
-                if conda_bin:
-                    env_name = _conda_env_name(name)
-                    subprocess.run(
-                        [conda_bin, "env", "remove", "-y", "-n", env_name],
-                        capture_output=True, text=True, timeout=120,
-                    )
-        except Exception:
+                env_type = _json.load(f).get("env_type")
+        except (OSError, ValueError):
             pass
 
     if os.path.isdir(project_dir):
-        shutil.rmtree(project_dir)
+        trash(projects_dir, project_dir)
+    drop_project(projects_dir, name)
+    if env_type == "conda":
+        threading.Thread(target=_remove_project_conda_envs, args=(name,), daemon=True).start()
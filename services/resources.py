@@ -0,0 +1,331 @@
+"""Per-run CPU, memory and I/O limits.
+
+Affinity, nice and ionice work everywhere. The cgroup-v2 limits (cpu.max,
+memory.max, io.weight, cpuset) need a delegated cgroup, e.g. the systemd unit
+with Delegate=yes that setup.sh installs: Beekeeper then moves itself into a
+"server" leaf of its own cgroup and puts each run in "runs/<project>".
+"""
+import os
+import re
+import signal
+import threading
+import logging
+
+import psutil
+
+log = logging.getLogger(__name__)
+
+CGROUP_FS = "/sys/fs/cgroup"
+RESERVED_CPUS = os.environ.get("BEEKEEPER_RESERVED_CPUS", "")  # kept free for the control plane, e.g. "0"
+_USE_CGROUPS = os.environ.get("BEEKEEPER_CGROUPS", "1").lower() not in ("0", "false", "no")
+_CONTROLLERS = ("cpu", "cpuset", "memory", "io")
+_SERVER_CPU_WEIGHT = 1000  # runs get the default of 100
+_CPU_PERIOD = 100000
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+_runs_cgroup = None   # <delegated cgroup>/runs once set up
+_controllers = set()  # controllers enabled for runs
+_lock = threading.Lock()
+
+
+def parse_cpus(spec):
+    """Parse a cpu list like "0,2-5" into a set of ints. Raises ValueError."""
+    cpus = set()
+    for part in str(spec).replace(" ", "").split(","):
+        if not part:
+            continue
+        try:
+            if "-" in part:
+                lo, hi = part.split("-", 1)
+                cpus.update(range(int(lo), int(hi) + 1))
+            else:
+                cpus.add(int(part))
+        except ValueError:
+            raise ValueError(f"Invalid CPU list: {spec!r}") from None
+    return cpus
+
+
+def format_cpus(cpus):
+    """Inverse of parse_cpus, collapsing runs into ranges."""
+    out, run = [], []
+    for cpu in sorted(cpus):
+        if run and cpu != run[-1] + 1:
+            out.append(f"{run[0]}-{run[-1]}" if len(run) > 1 else str(run[0]))
+            run = []
+        run.append(cpu)
+    if run:
+        out.append(f"{run[0]}-{run[-1]}" if len(run) > 1 else str(run[0]))
+    return ",".join(out)
+
+
+def parse_size(value):
+    """Parse "16G" / "512M" / bytes into bytes. Raises ValueError."""
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", str(value), re.IGNORECASE)
+    if not m:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(float(m.group(1)) * _SIZE_UNITS[m.group(2).upper()])
+
+
+def checkpoint_signal(resources):
+    """The signal sent before a run is paused ("USR1", "SIGUSR1", 10), or None."""
+    value = str(resources.get("checkpoint_signal") or "").strip().upper()
+    if not value:
+        return None
+    if value.isdigit():
+        return signal.Signals(int(value))
+    return signal.Signals[value if value.startswith("SIG") else f"SIG{value}"]
+
+
+def validate(resources):
+    """Check a project's resources dict. Returns an error message or None."""
+    try:
+        if resources.get("cpus"):
+            if not parse_cpus(resources["cpus"]):
+                return "CPU set is empty"
+        if resources.get("nice") not in (None, ""):
+            if not -20 <= int(resources["nice"]) <= 19:
+                return "nice must be between -20 and 19"
+        ionice = resources.get("ionice")
+        if ionice not in (None, "", "idle") and not 0 <= int(ionice) <= 7:
+            return "ionice must be 0-7 or 'idle'"
+        if resources.get("cpu_max") not in (None, "") and float(resources["cpu_max"]) <= 0:
+            return "CPU limit must be positive"
+        if resources.get("memory_max"):
+            parse_size(resources["memory_max"])
+        if resources.get("io_weight") not in (None, ""):
+            if not 1 <= int(resources["io_weight"]) <= 10000:
+                return "I/O weight must be between 1 and 10000"
+        if resources.get("priority") not in (None, ""):
+            int(resources["priority"])
+        try:
+            sig = checkpoint_signal(resources)
+        except KeyError:
+            return f"Unknown signal {resources['checkpoint_signal']!r}"
+        if sig in (signal.SIGKILL, signal.SIGSTOP):
+            return f"{sig.name} can't be used as the checkpoint signal"
+        if resources.get("checkpoint_grace") not in (None, "") and float(resources["checkpoint_grace"]) < 0:
+            return "Checkpoint grace must not be negative"
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def _available_cpus():
+    return set(os.sched_getaffinity(0))
+
+
+def _reserved():
+    try:
+        return parse_cpus(RESERVED_CPUS) if RESERVED_CPUS else set()
+    except ValueError:
+        log.warning("Ignoring invalid BEEKEEPER_RESERVED_CPUS=%r", RESERVED_CPUS)
+        return set()
+
+
+def run_cpus(resources):
+    """CPUs a run may use: its configured set (or all), minus the reserved ones."""
+    available = _available_cpus()
+    cpus = available
+    if resources.get("cpus"):
+        cpus = parse_cpus(resources["cpus"]) & available or available
+    without_reserved = cpus - _reserved()
+    return without_reserved or cpus
+
+
+def _own_cgroup():
+    try:
+        with open("/proc/self/cgroup") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    return os.path.join(CGROUP_FS, line[3:].strip().lstrip("/"))
+    except OSError:
+        pass
+    return None
+
+
+def _write(path, value):
+    with open(path, "w") as f:
+        f.write(str(value))
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read().strip()
+
+
+def _enable_controllers(cgroup):
+    available = set(_read(os.path.join(cgroup, "cgroup.controllers")).split())
+    wanted = [c for c in _CONTROLLERS if c in available]
+    enabled = set()
+    for controller in wanted:
+        try:
+            _write(os.path.join(cgroup, "cgroup.subtree_control"), f"+{controller}")
+            enabled.add(controller)
+        except OSError:
+            pass
+    return enabled
+
+
+def setup_cgroups():
+    """Split Beekeeper's delegated cgroup into a server leaf and a runs subtree.
+
+    Returns True if per-run cgroup limits are available. Safe to call more
+    than once; does nothing without cgroup v2 delegation.
+    """
+    global _runs_cgroup, _controllers
+    with _lock:
+        if _runs_cgroup or not _USE_CGROUPS:
+            return bool(_runs_cgroup)
+        base = _own_cgroup()
+        if not base or not os.path.isfile(os.path.join(base, "cgroup.controllers")):
+            return False
+        if os.path.basename(base) == "server" and os.path.isdir(os.path.join(os.path.dirname(base), "runs")):
+            base = os.path.dirname(base)  # already split by an earlier worker
+        if not os.access(os.path.join(base, "cgroup.subtree_control"), os.W_OK):
+            log.info("cgroup %s is not delegated; using affinity and nice only", base)
+            return False
+        try:
+            server = os.path.join(base, "server")
+            runs = os.path.join(base, "runs")
+            os.makedirs(server, exist_ok=True)
+            os.makedirs(runs, exist_ok=True)
+            # cgroup v2 allows no processes in a cgroup that distributes controllers
+            for pid in _read(os.path.join(base, "cgroup.procs")).split():
+                try:
+                    _write(os.path.join(server, "cgroup.procs"), pid)
+                except OSError:
+                    pass
+            controllers = _enable_controllers(base)
+            if "cpu" in controllers:
+                _write(os.path.join(server, "cpu.weight"), _SERVER_CPU_WEIGHT)
+            _controllers = controllers & _enable_controllers(runs)
+            _runs_cgroup = runs
+        except OSError as e:
+            log.info("Could not set up cgroups under %s: %s", base, e)
+            return False
+    log.info("Run cgroups under %s (controllers: %s)", _runs_cgroup,
+             ", ".join(sorted(_controllers)) or "none")
+    return True
+
+
+def _prepare_cgroup(name, resources, cpus):
+    """Create a run's cgroup and set its limits; apply() moves the run into it."""
+    cgroup = os.path.join(_runs_cgroup, name)
+    os.makedirs(cgroup, exist_ok=True)
+    limits = {}
+    if "cpuset" in _controllers:
+        limits["cpuset.cpus"] = format_cpus(cpus)
+    if "cpu" in _controllers:
+        cpu_max = resources.get("cpu_max")
+        limits["cpu.max"] = (f"{int(float(cpu_max) * _CPU_PERIOD)} {_CPU_PERIOD}"
+                             if cpu_max not in (None, "") else f"max {_CPU_PERIOD}")
+    if "memory" in _controllers:
+        memory_max = resources.get("memory_max")
+        limits["memory.max"] = parse_size(memory_max) if memory_max else "max"
+    if "io" in _controllers:
+        limits["io.weight"] = f"default {int(resources.get('io_weight') or 100)}"
+    for filename, value in limits.items():
+        try:
+            _write(os.path.join(cgroup, filename), value)
+        except OSError as e:
+            log.warning("Could not set %s=%s for %s: %s", filename, value, name, e)
+    return cgroup
+
+
+def prepare(name, resources):
+    """Work out a run's settings and create its cgroup. Returns the settings
+    to hand to apply() once the run is spawned."""
+    settings = {}
+    cpus = run_cpus(resources)
+    if cpus != _available_cpus():
+        settings["cpus"] = cpus
+    if resources.get("nice") not in (None, ""):
+        settings["nice"] = int(resources["nice"])
+    if resources.get("ionice") not in (None, ""):
+        settings["ionice"] = resources["ionice"]
+    if _runs_cgroup:
+        try:
+            settings["cgroup"] = _prepare_cgroup(name, resources, cpus)
+        except (OSError, ValueError) as e:
+            log.warning("Could not set up the cgroup of %s: %s", name, e)
+    return settings
+
+
+def apply(pid, name, settings):
+    """Apply prepare()'s settings to a freshly started run.
+
+    Called right after Popen, while the interpreter is still starting up and
+    before the script can start threads or worker processes, so everything
+    it spawns inherits the settings. Failures are only logged at debug
+    level; check() reports what took.
+    """
+    if "cgroup" in settings:
+        try:
+            _write(os.path.join(settings["cgroup"], "cgroup.procs"), pid)
+        except OSError as e:
+            log.debug("Moving %s into its cgroup failed: %s", name, e)
+    if "cpus" in settings:
+        try:
+            os.sched_setaffinity(pid, settings["cpus"])
+        except OSError as e:
+            log.debug("Setting the CPU affinity of %s failed: %s", name, e)
+    if "nice" in settings:
+        try:
+            os.setpriority(os.PRIO_PROCESS, pid, settings["nice"])
+        except OSError as e:
+            log.debug("Setting the nice value of %s failed: %s", name, e)
+    if "ionice" in settings:
+        try:
+            if settings["ionice"] == "idle":
+                psutil.Process(pid).ionice(psutil.IOPRIO_CLASS_IDLE)
+            else:
+                psutil.Process(pid).ionice(psutil.IOPRIO_CLASS_BE, int(settings["ionice"]))
+        except (psutil.Error, OSError, AttributeError) as e:
+            log.debug("Setting the ionice of %s failed: %s", name, e)
+
+
+def check(pid, name, settings):
+    """Which of a run's settings took effect. Returns a dict describing them;
+    anything that didn't is logged, never raised."""
+    applied = {}
+    try:
+        proc = psutil.Process(pid)
+        if "cpus" in settings:
+            if set(os.sched_getaffinity(pid)) == settings["cpus"]:
+                applied["cpus"] = format_cpus(settings["cpus"])
+            else:
+                log.warning("Could not set CPU affinity for %s", name)
+        if "nice" in settings:
+            if proc.nice() == settings["nice"]:
+                applied["nice"] = settings["nice"]
+            else:
+                log.warning("Could not set nice %s for %s", settings["nice"], name)
+        if "ionice" in settings:
+            wanted = (psutil.IOPRIO_CLASS_IDLE if settings["ionice"] == "idle"
+                      else psutil.IOPRIO_CLASS_BE)
+            if proc.ionice().ioclass == wanted:
+                applied["ionice"] = settings["ionice"]
+            else:
+                log.warning("Could not set ionice %s for %s", settings["ionice"], name)
+        if "cgroup" in settings:
+            with open(f"/proc/{pid}/cgroup") as f:
+                joined = any(line.startswith("0::") and settings["cgroup"]
+                             == os.path.join(CGROUP_FS, line[3:].strip().lstrip("/"))
+                             for line in f)
+            if joined:
+                applied["cgroup"] = settings["cgroup"]
+            else:
+                log.warning("Could not move %s into its cgroup", name)
+    except (psutil.Error, OSError, AttributeError) as e:
+        log.warning("Could not check the resource settings of %s: %s", name, e)
+    return applied
+
+
+def release(name):
+    """Remove a run's cgroup once its processes are gone."""
+    if not _runs_cgroup:
+        return
+    try:
+        os.rmdir(os.path.join(_runs_cgroup, name))
+    except OSError:
+        pass
@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def _history_path(projects_dir, name):
+    return os.path.join(projects_dir, name, "runs.jsonl")
+
+
+def _append(projects_dir, name, record):
+    """Append one event line to the project's run history."""
+    try:
+        with open(_history_path(projects_dir, name), "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        log.warning("Could not write run history for %s: %s", name, e)
+
+
+def new_run_id(started_at, projects_dir=None, name=None):
+    """Run ids are start timestamps, readable and sortable.
+
+    Given the project, a second run started within the same second (a quick
+    restart) gets a -2, -3... suffix instead of reusing the first one's id.
+    """
+    run_id = time.strftime("%Y%m%d-%H%M%S", time.localtime(started_at))
+    if projects_dir is None:
+        return run_id
+    taken = {run["run_id"] for run in list_runs(projects_dir, name)}
+    candidate, n = run_id, 2
+    while candidate in taken:
+        candidate, n = f"{run_id}-{n}", n + 1
+    return candidate
+
+
+def record_start(projects_dir, name, run_id, started_at, commit=None):
+    """Record that a run has started."""
+    _append(projects_dir, name, {
+        "event": "start",
+        "run_id": run_id,
+        "started_at": started_at,
+        "commit": commit,
+    })
+
+
+def record_end(projects_dir, name, run_id, exit_code, ended_at=None, **extra):
+    """Record that a run has ended. Extra fields are stored on the run."""
+    record = {
+        "event": "end",
+        "run_id": run_id,
+        "ended_at": ended_at or time.time(),
+        "exit_code": exit_code,
+    }
+    record.update(extra)
+    _append(projects_dir, name, record)
+
+
+def list_runs(projects_dir, name):
+    """Return runs for a project, oldest first, with start/end events merged."""
+    runs = {}
+    try:
+        with open(_history_path(projects_dir, name)) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # partial line from a crash
+                run_id = record.pop("run_id", None)
+                if not run_id:
+                    continue
+                record.pop("event", None)
+                runs.setdefault(run_id, {"run_id": run_id}).update(record)
+    except OSError:
+        return []
+    return sorted(runs.values(), key=lambda r: r.get("started_at") or 0)
+
+
+def find_run(runs, timestamp):
+    """Return the id of the run that was active at the given timestamp."""
+    now = time.time()
+    for run in reversed(runs):
+        started = run.get("started_at")
+        if started is None or timestamp < started:
+            continue
+        if timestamp <= (run.get("ended_at") or now):
+            return run["run_id"]
+        return None
+    return None
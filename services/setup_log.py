@@ -0,0 +1,196 @@
+"""Streamed output and progress of project setup (clone, env creation, pip).
+
+run() is a drop-in for subprocess.run(check=True, capture_output=True) that
+appends the command's output to projects/<name>/setup.log as it arrives,
+instead of buffering it, and keeps per-project progress counters parsed
+from git and pip output. Only the last TAIL_BYTES are kept in memory, for
+error messages. The log is streamed to the page like train.log.
+"""
+import os
+import re
+import time
+import errno
+import select
+import signal
+import subprocess
+import threading
+import logging
+
+log = logging.getLogger(__name__)
+
+TAIL_BYTES = 4096
+_READ_SIZE = 64 * 1024
+
+_GIT_PROGRESS = re.compile(r"^(?:remote: )?([A-Z][a-z]+ objects):\s+(\d+)%")
+_PIP_COLLECTING = re.compile(r"^\s*(?:Collecting|Processing) \S+")
+_PIP_DOWNLOADING = re.compile(r"^\s*Downloading \S+ \((\d+(?:\.\d+)?) (kB|MB|GB|bytes)\)")
+_PIP_SAVED = re.compile(r"^\s*Saved \S+\.whl")
+_PIP_BUILDING = re.compile(r"^\s*Building wheel for (\S+)")
+_PIP_INSTALLED = re.compile(r"^\s*Successfully installed (.+)")
+_UNITS = {"bytes": 1, "kB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3}
+
+_progress = {}  # {name: progress dict}
+_lock = threading.Lock()
+
+
+def log_path(projects_dir, name):
+    return os.path.join(projects_dir, name, "setup.log")
+
+
+def begin(projects_dir, name, title):
+    """Start a fresh setup log and progress record for a project."""
+    with open(log_path(projects_dir, name), "w") as f:
+        f.write(f"==> {title} ({time.strftime('%Y-%m-%d %H:%M:%S')})\n")
+    with _lock:
+        _progress[name] = {
+            "active": True,
+            "stage": None,
+            "started_at": time.time(),
+            "stage_started_at": None,
+            "git_phase": None,
+            "git_percent": None,
+            "collected": 0,  # requirements resolved by the busiest pip command so far
+            "command_collected": 0,
+            "downloads": 0,
+            "downloaded_bytes": 0,
+            "wheels": 0,
+            "building": None,
+            "installed": 0,
+            "line": "",
+        }
+
+
+def stage(projects_dir, name, label):
+    """Mark the start of a setup stage in the log and the progress record."""
+    _append(projects_dir, name, f"\n==> {label}\n".encode())
+    with _lock:
+        progress = _progress.get(name)
+        if progress:
+            progress.update(stage=label, stage_started_at=time.time(),
+                            git_phase=None, git_percent=None, building=None)
+
+
+def end(projects_dir, name, status):
+    _append(projects_dir, name, f"\n==> {status}\n".encode())
+    with _lock:
+        progress = _progress.get(name)
+        if progress:
+            progress.update(active=False, stage=None, building=None, finished_at=time.time())
+
+
+def active(name):
+    with _lock:
+        progress = _progress.get(name)
+        return bool(progress and progress["active"])
+
+
+def progress(name):
+    """Copy of a project's setup progress, or None if it hasn't set up since startup."""
+    with _lock:
+        progress = _progress.get(name)
+        return dict(progress) if progress else None
+
+
+def _append(projects_dir, name, data):
+    try:
+        with open(log_path(projects_dir, name), "ab") as f:
+            f.write(data)
+    except OSError as e:
+        log.warning("Could not write setup log for %s: %s", name, e)
+
+
+def _parse(name, line):
+    """Update the progress counters from one line (or \\r-segment) of output."""
+    with _lock:
+        progress = _progress.get(name)
+        if progress is None:
+            return
+        if line.strip():
+            progress["line"] = line.strip()[:200]
+        m = _GIT_PROGRESS.match(line)
+        if m:
+            progress["git_phase"], progress["git_percent"] = m.group(1), int(m.group(2))
+        elif _PIP_COLLECTING.match(line):
+            # pip wheel and pip install each list every requirement
+            progress["command_collected"] += 1
+            progress["collected"] = max(progress["collected"], progress["command_collected"])
+        elif _PIP_SAVED.match(line):
+            progress["wheels"] += 1
+        else:
+            m = _PIP_DOWNLOADING.match(line)
+            if m:
+                progress["downloads"] += 1
+                progress["downloaded_bytes"] += int(float(m.group(1)) * _UNITS[m.group(2)])
+                return
+            m = _PIP_BUILDING.match(line)
+            if m:
+                progress["building"] = m.group(1)
+                return
+            m = _PIP_INSTALLED.match(line)
+            if m:
+                progress["installed"] += len(m.group(1).split())
+
+
+def runner(projects_dir, name):
+    """A run() bound to a project, for code that takes a `run` callable."""
+    def bound(cmd, timeout=None, env=None, cwd=None):
+        return run(projects_dir, name, cmd, timeout=timeout, env=env, cwd=cwd)
+    return bound
+
+
+def run(projects_dir, name, cmd, timeout=None, env=None, cwd=None):
+    """Run cmd, streaming its output to the project's setup log.
+
+    Raises CalledProcessError / TimeoutExpired like subprocess.run(check=True);
+    their output and stderr hold the last TAIL_BYTES of output, as text.
+    """
+    _append(projects_dir, name, ("$ " + " ".join(str(c) for c in cmd) + "\n").encode())
+    with _lock:
+        if name in _progress:
+            _progress[name]["command_collected"] = 0
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            stdin=subprocess.DEVNULL, env=env, cwd=cwd,
+                            start_new_session=True)
+    deadline = time.monotonic() + timeout if timeout else None
+    tail = b""
+    partial = b""
+    fd = proc.stdout.fileno()
+    try:
+        with open(log_path(projects_dir, name), "ab", buffering=0) as out:
+            while True:
+                wait = max(0.0, deadline - time.monotonic()) if deadline else None
+                ready, _, _ = select.select([fd], [], [], wait)
+                if not ready:
+                    raise subprocess.TimeoutExpired(cmd, timeout,
+                                                    output=tail.decode("utf-8", "replace"))
+                try:
+                    chunk = os.read(fd, _READ_SIZE)
+                except OSError as e:
+                    if e.errno == errno.EINTR:
+                        continue
+                    raise
+                if not chunk:
+                    break
+                out.write(chunk)
+                tail = (tail + chunk)[-TAIL_BYTES:]
+                segments = re.split(rb"[\r\n]", partial + chunk)
+                partial = segments.pop()[-TAIL_BYTES:]
+                for segment in segments:
+                    _parse(name, segment.decode("utf-8", "replace"))
+        if partial:
+            _parse(name, partial.decode("utf-8", "replace"))
+        returncode = proc.wait(timeout=max(1.0, deadline - time.monotonic()) if deadline else None)
+    except BaseException:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        proc.wait()
+        raise
+    finally:
+        proc.stdout.close()
+
+    text = tail.decode("utf-8", "replace")
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, cmd, output=text, stderr=text)
+    return subprocess.CompletedProcess(cmd, returncode, stdout=text, stderr="")
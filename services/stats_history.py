@@ -0,0 +1,122 @@
+"""Host stat history for export: one sample per interval, averaged over it.
+
+Samples go to one JSONL file per day under HISTORY_DIR; files older than
+KEEP_DAYS are removed.
+"""
+import os
+import json
+import time
+import threading
+import logging
+
+import psutil
+
+from services import stats_service
+
+log = logging.getLogger(__name__)
+
+_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_DIR = os.environ.get("BEEKEEPER_STATS_HISTORY_DIR", os.path.join(_HOME, "stats"))
+INTERVAL = int(os.environ.get("BEEKEEPER_STATS_HISTORY_INTERVAL", "60"))
+KEEP_DAYS = int(os.environ.get("BEEKEEPER_STATS_HISTORY_DAYS", "30"))
+
+# Columns of a sample, in export order
+COLUMNS = (
+    "ts", "cpu_percent", "iowait_percent", "load1", "mem_percent", "swap_percent",
+    "swap_in_bps", "swap_out_bps", "disk_read_bps", "disk_write_bps", "disk_busy_max",
+    "net_rx_bps", "net_tx_bps", "psi_cpu_some", "psi_memory_some", "psi_memory_full",
+    "psi_io_some", "psi_io_full", "gpu_util_mean", "gpu_mem_percent_mean",
+)
+
+_thread = None
+_lock = threading.Lock()
+
+
+def _mean(values):
+    return round(sum(values) / len(values), 1) if values else None
+
+
+def _sample(prev, cur):
+    rates = stats_service._compute_rates(prev, cur)
+    disks = rates["disks"].values()
+    nics = rates["nics"].values()
+    pressure = rates["pressure"]
+    gpus = stats_service.get_gpu_stats()
+    try:
+        load1 = round(os.getloadavg()[0], 2)
+    except OSError:
+        load1 = None
+    return {
+        "ts": round(time.time(), 3),
+        "cpu_percent": rates["percent"],
+        "iowait_percent": rates["iowait"],
+        "load1": load1,
+        "mem_percent": psutil.virtual_memory().percent,
+        "swap_percent": psutil.swap_memory().percent,
+        "swap_in_bps": rates["swap_in_bps"],
+        "swap_out_bps": rates["swap_out_bps"],
+        "disk_read_bps": sum(d["read_bps"] for d in disks),
+        "disk_write_bps": sum(d["write_bps"] for d in disks),
+        "disk_busy_max": max((d["busy"] or 0 for d in disks), default=None),
+        "net_rx_bps": sum(n["rx_bps"] for n in nics),
+        "net_tx_bps": sum(n["tx_bps"] for n in nics),
+        "psi_cpu_some": pressure.get("cpu", {}).get("some"),
+        "psi_memory_some": pressure.get("memory", {}).get("some"),
+        "psi_memory_full": pressure.get("memory", {}).get("full"),
+        "psi_io_some": pressure.get("io", {}).get("some"),
+        "psi_io_full": pressure.get("io", {}).get("full"),
+        "gpu_util_mean": _mean([g["gpu_util"] for g in gpus if g.get("gpu_util") is not None]),
+        "gpu_mem_percent_mean": _mean([g["mem_percent"] for g in gpus]),
+    }
+
+
+def day_path(day):
+    """History file for a YYYYMMDD day string."""
+    return os.path.join(HISTORY_DIR, f"host-{day}.jsonl")
+
+
+def days():
+    """YYYYMMDD strings of the days with history, oldest first."""
+    try:
+        names = os.listdir(HISTORY_DIR)
+    except OSError:
+        return []
+    return sorted(n[5:13] for n in names if n.startswith("host-") and n.endswith(".jsonl"))
+
+
+def _prune():
+    cutoff = time.strftime("%Y%m%d", time.localtime(time.time() - KEEP_DAYS * 86400))
+    for day in days():
+        if day < cutoff:
+            try:
+                os.unlink(day_path(day))
+            except OSError:
+                pass
+
+
+def _loop():
+    prev = stats_service._counters()
+    while True:
+        time.sleep(INTERVAL)
+        cur = stats_service._counters()
+        try:
+            row = _sample(prev, cur)
+            os.makedirs(HISTORY_DIR, exist_ok=True)
+            with open(day_path(time.strftime("%Y%m%d")), "a") as f:
+                f.write(json.dumps(row) + "\n")
+            _prune()
+        except Exception as e:
+            log.warning("Could not record host stats: %s", e)
+        prev = cur
+
+
+def start_sampler():
+    """Start recording host stat history (once). BEEKEEPER_STATS_HISTORY_INTERVAL=0 disables it."""
+    global _thread
+    if INTERVAL <= 0:
+        return
+    with _lock:
+        if _thread and _thread.is_alive():
+            return
+        _thread = threading.Thread(target=_loop, daemon=True)
+        _thread.start()
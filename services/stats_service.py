@@ -1,15 +1,40 @@
+import os
+import time
+import threading
+
 import psutil
 
-try:
-    import nvitop
-    _HAS_NVITOP = True
-except Exception:
-    _HAS_NVITOP = False
+from services.metrics import Gauge
+
+# nvitop is imported, and NVML loaded, on the first GPU sample rather than at
+# import, so app startup doesn't depend on (or wait for) the driver
+nvitop = None
+_HAS_NVITOP = None  # unknown until first use
+_nvml_lock = threading.Lock()
+
+_FREE_GPU_UTIL = 10  # percent; a GPU below this utilization and memory use counts as free
+_MIN_RATE_INTERVAL = 0.5  # seconds; callers closer together than this share one set of rates
+_SKIP_DISKS = ("loop", "ram", "zram")
+_PSI_RESOURCES = ("cpu", "memory", "io")
+
+
+def _nvml():
+    """The nvitop module, imported on first call; None if it's unavailable."""
+    global nvitop, _HAS_NVITOP
+    if _HAS_NVITOP is None:
+        with _nvml_lock:
+            if _HAS_NVITOP is None:
+                try:
+                    import nvitop as module
+                    nvitop, _HAS_NVITOP = module, True
+                except Exception:
+                    _HAS_NVITOP = False
+    return nvitop if _HAS_NVITOP else None
 
 
 def get_gpu_stats():
     """Return list of GPU stat dicts, one per device."""
-    if not _HAS_NVITOP:
+    if not _nvml():
         return []
 
     gpus = []
@@ -31,29 +56,253 @@ def get_gpu_stats():
     return gpus
 
 
-def get_cpu_stats():
-    """Return CPU usage info."""
+def gpu_processes():
+    """{pid: {"gpu", "sm_util", "memory"}} for processes using a GPU. Utilization is
+    the percent of SMs busy over the driver's last sample, None if it isn't reported."""
+    if not _nvml():
+        return {}
+
+    out = {}
+    for dev in nvitop.Device.all():
+        try:
+            procs = dev.processes()
+        except Exception:
+            continue
+        for pid, proc in procs.items():
+            util = proc.gpu_sm_utilization()
+            memory = proc.gpu_memory()
+            util = util if isinstance(util, (int, float)) else None
+            seen = out.get(pid)
+            if seen and (util is None or (seen["sm_util"] or 0) >= util):
+                continue  # one process on several GPUs: keep the busiest
+            out[pid] = {
+                "gpu": dev.index,
+                "sm_util": util,
+                "memory": memory if isinstance(memory, int) else None,
+            }
+    return out
+
+
+def free_gpus(gpus):
+    """Indexes of the GPUs in a get_gpu_stats() list that nothing is using."""
+    return [g["index"] for g in gpus
+            if g.get("gpu_util", 100) < _FREE_GPU_UTIL and g.get("mem_percent", 100) < _FREE_GPU_UTIL]
+
+
+def _read_psi():
+    """Cumulative stall time in microseconds from /proc/pressure: {(resource, "some"|"full"): total}."""
+    totals = {}
+    for resource in _PSI_RESOURCES:
+        try:
+            with open(f"/proc/pressure/{resource}") as f:
+                for line in f:
+                    kind, *fields = line.split()
+                    totals[(resource, kind)] = int(dict(fv.split("=") for fv in fields)["total"])
+        except (OSError, ValueError, KeyError):
+            continue
+    return totals
+
+
+def _counters():
+    """One snapshot of every cumulative counter the rates are computed from."""
+    disks = psutil.disk_io_counters(perdisk=True) or {}
+    nics = psutil.net_io_counters(pernic=True) or {}
+    swap = psutil.swap_memory()
+    return {
+        "at": time.monotonic(),
+        "cpu": psutil.cpu_times(percpu=True),
+        "disks": {name: c for name, c in disks.items()
+                  if not name.startswith(_SKIP_DISKS) and os.path.isdir(f"/sys/block/{name}")},
+        "nics": {name: c for name, c in nics.items()
+                 if name != "lo" and c.bytes_recv + c.bytes_sent},
+        "swap": (swap.sin, swap.sout),
+        "psi": _read_psi(),
+    }
+
+
+def _since_boot(cur):
+    """All-zero counters dated at boot, so the first rates are averages since boot."""
+    def zero(counters):
+        return type(counters)(*(0 for _ in counters))
+    return {
+        "at": cur["at"] - max(1.0, time.time() - psutil.boot_time()),
+        "cpu": [zero(c) for c in cur["cpu"]],
+        "disks": {name: zero(c) for name, c in cur["disks"].items()},
+        "nics": {name: zero(c) for name, c in cur["nics"].items()},
+        "swap": (0, 0),
+        "psi": {key: 0 for key in cur["psi"]},
+    }
+
+
+def _cpu_busy(before, after):
+    """(busy %, iowait %) between two cpu_times samples of one core."""
+    total = sum(after) - sum(before)
+    if total <= 0:
+        return 0.0, 0.0
+    idle = after.idle - before.idle
+    iowait = getattr(after, "iowait", 0) - getattr(before, "iowait", 0)
+    return (round(max(0.0, 100 * (total - idle - iowait) / total), 1),
+            round(max(0.0, 100 * iowait / total), 1))
+
+
+def _compute_rates(prev, cur):
+    dt = cur["at"] - prev["at"]
+    per_core = [_cpu_busy(b, a) for b, a in zip(prev["cpu"], cur["cpu"])]
+    n = len(per_core) or 1
+
+    disks = {}
+    for name, c in cur["disks"].items():
+        p = prev["disks"].get(name)
+        if not p:
+            continue
+        disks[name] = {
+            "read_bps": round((c.read_bytes - p.read_bytes) / dt),
+            "write_bps": round((c.write_bytes - p.write_bytes) / dt),
+            "read_iops": round((c.read_count - p.read_count) / dt, 1),
+            "write_iops": round((c.write_count - p.write_count) / dt, 1),
+            # busy_time is Linux-only: ms the device had I/O in flight
+            "busy": (round(min(100.0, (c.busy_time - p.busy_time) / dt / 10), 1)
+                     if hasattr(c, "busy_time") else None),
+        }
+
+    nics = {}
+    for name, c in cur["nics"].items():
+        p = prev["nics"].get(name)
+        if p:
+            nics[name] = {"rx_bps": round((c.bytes_recv - p.bytes_recv) / dt),
+                          "tx_bps": round((c.bytes_sent - p.bytes_sent) / dt)}
+
+    pressure = {}
+    for (resource, kind), total in cur["psi"].items():
+        if (resource, kind) in prev["psi"]:
+            stalled = (total - prev["psi"][(resource, kind)]) / 1e6 / dt
+            pressure.setdefault(resource, {})[kind] = round(min(100.0, 100 * stalled), 1)
+
+    return {
+        "per_core": [busy for busy, _ in per_core],
+        "percent": round(sum(busy for busy, _ in per_core) / n, 1),
+        "iowait": round(sum(wait for _, wait in per_core) / n, 1),
+        "disks": disks,
+        "nics": nics,
+        "swap_in_bps": round((cur["swap"][0] - prev["swap"][0]) / dt),
+        "swap_out_bps": round((cur["swap"][1] - prev["swap"][1]) / dt),
+        "pressure": pressure,
+    }
+
+
+_rate_lock = threading.Lock()
+_rate_state = {"counters": None, "rates": None}
+
+
+def get_rates():
+    """Utilization and throughput since the previous call.
+
+    Computed from the difference between two counter snapshots rather than
+    by sleeping through a sampling interval; the first call reports averages
+    since boot.
+    """
+    with _rate_lock:
+        prev = _rate_state["counters"]
+        if prev and time.monotonic() - prev["at"] < _MIN_RATE_INTERVAL:
+            return _rate_state["rates"]
+        cur = _counters()
+        prev = prev or _since_boot(cur)
+        _rate_state["counters"] = cur
+        _rate_state["rates"] = _compute_rates(prev, cur)
+        return _rate_state["rates"]
+
+
+def get_cpu_stats(rates=None):
+    """Return CPU usage info, overall and per core, plus iowait and load average."""
+    rates = rates or get_rates()
+    freq = psutil.cpu_freq()
+    try:
+        load = [round(x, 2) for x in os.getloadavg()]
+    except OSError:
+        load = None
     return {
-        "percent": psutil.cpu_percent(interval=0),
+        "percent": rates["percent"],
+        "per_core": rates["per_core"],
+        "iowait": rates["iowait"],
         "count": psutil.cpu_count(),
-        "freq": round(psutil.cpu_freq().current, 0) if psutil.cpu_freq() else None,
+        "freq": round(freq.current, 0) if freq else None,
+        "load": load,
     }
 
 
-def get_memory_stats():
-    """Return system RAM info."""
+def get_memory_stats(rates=None):
+    """Return system RAM and swap info."""
+    rates = rates or get_rates()
     mem = psutil.virtual_memory()
+    swap = psutil.swap_memory()
     return {
         "percent": mem.percent,
         "used_gb": round(mem.used / (1024 ** 3), 1),
         "total_gb": round(mem.total / (1024 ** 3), 1),
+        "swap": {
+            "percent": swap.percent,
+            "used_gb": round(swap.used / (1024 ** 3), 1),
+            "total_gb": round(swap.total / (1024 ** 3), 1),
+            "in_bps": rates["swap_in_bps"],
+            "out_bps": rates["swap_out_bps"],
+        },
     }
 
 
 def get_all_stats():
     """Single call to get everything."""
+    rates = get_rates()
     return {
         "gpus": get_gpu_stats(),
-        "cpu": get_cpu_stats(),
-        "memory": get_memory_stats(),
+        "cpu": get_cpu_stats(rates),
+        "memory": get_memory_stats(rates),
+        "disks": rates["disks"],
+        "net": rates["nics"],
+        "pressure": rates["pressure"],
     }
+
+
+_sample_lock = threading.Lock()
+_sample = {"at": 0.0, "stats": None}
+
+
+def _cached_stats(max_age=1.0):
+    """Share one sample between the host gauges of a single scrape."""
+    with _sample_lock:
+        if _sample["stats"] is None or time.monotonic() - _sample["at"] > max_age:
+            _sample["stats"] = get_all_stats()
+            _sample["at"] = time.monotonic()
+        return _sample["stats"]
+
+
+def _gpu_gauge(key):
+    def collect():
+        return {(str(g["index"]),): g[key] for g in _cached_stats()["gpus"]}
+    return collect
+
+
+Gauge("beekeeper_host_cpu_percent", "Host CPU utilization",
+      callback=lambda: _cached_stats()["cpu"]["percent"])
+Gauge("beekeeper_host_memory_percent", "Host RAM utilization",
+      callback=lambda: _cached_stats()["memory"]["percent"])
+Gauge("beekeeper_host_iowait_percent", "Host CPU time spent waiting on I/O",
+      callback=lambda: _cached_stats()["cpu"]["iowait"])
+Gauge("beekeeper_host_disk_read_bytes_per_second", "Disk read throughput", ["device"],
+      callback=lambda: {(d,): v["read_bps"] for d, v in _cached_stats()["disks"].items()})
+Gauge("beekeeper_host_disk_write_bytes_per_second", "Disk write throughput", ["device"],
+      callback=lambda: {(d,): v["write_bps"] for d, v in _cached_stats()["disks"].items()})
+Gauge("beekeeper_host_network_receive_bytes_per_second", "Network receive throughput", ["interface"],
+      callback=lambda: {(n,): v["rx_bps"] for n, v in _cached_stats()["net"].items()})
+Gauge("beekeeper_host_network_transmit_bytes_per_second", "Network transmit throughput", ["interface"],
+      callback=lambda: {(n,): v["tx_bps"] for n, v in _cached_stats()["net"].items()})
+Gauge("beekeeper_host_pressure_percent", "Share of time tasks stalled (PSI)", ["resource", "kind"],
+      callback=lambda: {(r, k): v for r, kinds in _cached_stats()["pressure"].items()
+                        for k, v in kinds.items()})
+Gauge("beekeeper_gpu_utilization_percent", "GPU utilization", ["gpu"],
+      callback=_gpu_gauge("gpu_util"))
+Gauge("beekeeper_gpu_memory_used_bytes", "GPU memory in use", ["gpu"],
+      callback=_gpu_gauge("mem_used"))
+Gauge("beekeeper_gpu_temperature_celsius", "GPU temperature", ["gpu"],
+      callback=_gpu_gauge("temp"))
+Gauge("beekeeper_gpu_power_watts", "GPU power draw", ["gpu"],
+      callback=_gpu_gauge("power"))
@@ -0,0 +1,140 @@
+"""Read scalar summaries straight from TensorBoard event files.
+
+Beekeeper's own environment doesn't have TensorFlow or TensorBoard (those
+live in project environments), so this decodes the few protobuf fields it
+needs by hand: TFRecord framing, then Event.wall_time / step / summary and
+Summary.Value.tag with either simple_value (PyTorch, TF1) or a scalar tensor
+tagged with the "scalars" plugin (TF2).
+"""
+import os
+import struct
+import logging
+
+log = logging.getLogger(__name__)
+
+EVENT_PREFIX = "events.out.tfevents."
+_DT_FLOAT, _DT_DOUBLE, _DT_INT32, _DT_INT64 = 1, 2, 3, 9
+
+
+def _varint(buf, pos):
+    result = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _fields(buf):
+    """Yield (field number, wire type, value) for one protobuf message."""
+    pos, end = 0, len(buf)
+    while pos < end:
+        key, pos = _varint(buf, pos)
+        number, wire = key >> 3, key & 7
+        if wire == 0:
+            value, pos = _varint(buf, pos)
+        elif wire == 1:
+            value, pos = buf[pos:pos + 8], pos + 8
+        elif wire == 2:
+            length, pos = _varint(buf, pos)
+            value, pos = buf[pos:pos + length], pos + length
+        elif wire == 5:
+            value, pos = buf[pos:pos + 4], pos + 4
+        else:
+            return  # groups are long deprecated; nothing we need follows one
+        yield number, wire, value
+
+
+def _plugin_name(metadata):
+    for number, _, value in _fields(metadata):
+        if number == 1:  # SummaryMetadata.plugin_data
+            for n, _, v in _fields(value):
+                if n == 1:
+                    return v.decode("utf-8", "replace")
+    return None
+
+
+def _tensor_scalar(tensor):
+    """The single number in a scalar TensorProto, or None."""
+    dtype, content, values = None, None, []
+    for number, wire, value in _fields(tensor):
+        if number == 1:
+            dtype = value
+        elif number == 4:
+            content = value
+        elif number == 5:  # float_val, packed or not
+            values += struct.unpack(f"<{len(value) // 4}f", value) if wire == 2 else struct.unpack("<f", value)
+        elif number == 6:  # double_val
+            values += struct.unpack(f"<{len(value) // 8}d", value) if wire == 2 else struct.unpack("<d", value)
+        elif number in (7, 10) and wire == 0:  # int_val / int64_val, unpacked
+            values.append(value)
+    if values:
+        return float(values[0])
+    if content:
+        fmt = {_DT_FLOAT: "<f", _DT_DOUBLE: "<d", _DT_INT32: "<i", _DT_INT64: "<q"}.get(dtype)
+        if fmt and len(content) == struct.calcsize(fmt):
+            return float(struct.unpack(fmt, content)[0])
+    return None
+
+
+def _records(path):
+    """Payloads of a TFRecord file; stops quietly at a truncated tail (file still being written)."""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(12)
+            if len(header) < 12:
+                return
+            (length,) = struct.unpack("<Q", header[:8])
+            data = f.read(length)
+            if len(data) < length or len(f.read(4)) < 4:
+                return
+            yield data
+
+
+def read_scalars(path):
+    """Yield {"tag", "step", "wall_time", "value"} for every scalar in an event file."""
+    scalar_tags = set()  # TF2 only sends the plugin metadata with a tag's first value
+    for record in _records(path):
+        wall_time, step, summary = None, 0, None
+        for number, _, value in _fields(record):
+            if number == 1:
+                (wall_time,) = struct.unpack("<d", value)
+            elif number == 2:
+                step = value
+            elif number == 5:
+                summary = value
+        if summary is None:
+            continue
+        for number, _, value in _fields(summary):
+            if number != 1:
+                continue
+            tag, simple, tensor, metadata = None, None, None, None
+            for n, _, v in _fields(value):
+                if n == 1:
+                    tag = v.decode("utf-8", "replace")
+                elif n == 2:
+                    (simple,) = struct.unpack("<f", v)
+                elif n == 8:
+                    tensor = v
+                elif n == 9:
+                    metadata = v
+            if tag is None:
+                continue
+            if metadata is not None and _plugin_name(metadata) == "scalars":
+                scalar_tags.add(tag)
+            if simple is None and tensor is not None and tag in scalar_tags:
+                simple = _tensor_scalar(tensor)
+            if simple is not None:
+                yield {"tag": tag, "step": step, "wall_time": wall_time, "value": simple}
+
+
+def event_files(logdir):
+    """(run, path) for every event file under a TensorBoard log dir; run is the
+    subdirectory relative to logdir ("." for files directly in it)."""
+    for root, dirs, files in os.walk(logdir):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.startswith(EVENT_PREFIX):
+                yield os.path.relpath(root, logdir), os.path.join(root, filename)
@@ -0,0 +1,242 @@
+"""Stall and idle-GPU detection for running jobs.
+
+Each run's monitor thread calls check() every second; every INTERVAL seconds
+it samples the run's log size, the CPU time and read bytes of its process
+tree, and the SM utilization of its processes on the GPUs. A sample is:
+
+  stalled        no log output, next to no CPU and an idle GPU: a deadlocked
+                 DataLoader or a hung collective
+  input_starved  holding a GPU that sits idle while the CPUs or disks are
+                 busy: waiting on data loading or I/O
+  healthy        anything else
+
+Once a condition has lasted the project's window (stall_minutes,
+starved_minutes) its action runs once: notify (record it on the project
+page and post it to BEEKEEPER_WATCHDOG_WEBHOOK), dump (also write every
+thread's stack to the log), restart or stop. The monitor thread carries the
+action out; this module only classifies.
+"""
+import os
+import json
+import time
+import threading
+import urllib.request
+import logging
+
+import psutil
+
+from services.metrics import Counter, Gauge
+from services.stats_service import gpu_processes
+
+log = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("BEEKEEPER_WATCHDOG", "1") != "0"
+INTERVAL = int(os.environ.get("BEEKEEPER_WATCHDOG_INTERVAL", "30"))
+WEBHOOK = os.environ.get("BEEKEEPER_WATCHDOG_WEBHOOK", "")
+STARTUP_GRACE = 300  # seconds after start (or resume) before a run is judged
+IDLE_GPU_UTIL = 10  # percent of SMs; below this the run's GPU counts as idle
+STALL_CPU_PERCENT = 5  # percent of one core across the whole process tree
+STALL_READ_RATE = 1024 * 1024  # bytes/s read from disk; below this the run isn't loading data
+MAX_RESTARTS = 3  # watchdog restarts in a row before it stops the run instead
+MAX_EVENTS = 20
+ACTIONS = ("notify", "dump", "restart", "stop")
+DEFAULTS = {"stall_minutes": "15", "starved_minutes": "30",
+            "on_stall": "dump", "on_starved": "notify"}
+
+WATCHDOG_ACTIONS = Counter(
+    "beekeeper_watchdog_actions", "Watchdog actions taken, by condition", ["state", "action"])
+
+_runs = {}      # {name: sampling state and health of the current run}
+_events = {}    # {name: [recent events]}, kept across runs
+_restarts = {}  # {name: watchdog restarts since the project last looked healthy}
+_lock = threading.Lock()
+
+
+def _health_counts():
+    with _lock:
+        counts = {}
+        for run in _runs.values():
+            key = (run["state"],)
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+RUN_HEALTH = Gauge(
+    "beekeeper_run_health", "Running jobs by watchdog classification", ["state"],
+    callback=_health_counts)
+
+
+def validate(watchdog):
+    """Check a project's watchdog dict. Returns an error message or None."""
+    for key in ("on_stall", "on_starved"):
+        if watchdog.get(key) not in (None, "") and watchdog[key] not in ACTIONS:
+            return f"Action must be one of {', '.join(ACTIONS)}"
+    try:
+        for key in ("stall_minutes", "starved_minutes"):
+            if watchdog.get(key) not in (None, "") and float(watchdog[key]) < 0:
+                return "Minutes must not be negative (0 turns the check off)"
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def _config(projects_dir, name):
+    try:
+        with open(os.path.join(projects_dir, name, "project.json")) as f:
+            configured = json.load(f).get("watchdog") or {}
+    except (OSError, ValueError):
+        configured = {}
+    return {key: configured.get(key) or default for key, default in DEFAULTS.items()}
+
+
+def _sample(pid, log_path):
+    """Counters of a run's process tree; None once the root process is gone."""
+    try:
+        root = psutil.Process(pid)
+        procs = [root] + root.children(recursive=True)
+    except psutil.Error:
+        return None
+    cpu = 0.0
+    read_bytes = 0
+    pids = set()
+    for proc in procs:
+        try:
+            with proc.oneshot():
+                times = proc.cpu_times()
+                cpu += times.user + times.system
+                try:
+                    read_bytes += proc.io_counters().read_bytes
+                except (psutil.Error, AttributeError):
+                    pass
+            pids.add(proc.pid)
+        except psutil.Error:
+            continue
+    try:
+        log_size = os.path.getsize(log_path)
+    except OSError:
+        log_size = 0
+    gpu = [info for p, info in gpu_processes().items() if p in pids]
+    utils = [info["sm_util"] for info in gpu if info["sm_util"] is not None]
+    return {
+        "at": time.monotonic(),
+        "cpu": cpu,
+        "read_bytes": read_bytes,
+        "log_size": log_size,
+        "on_gpu": bool(gpu),
+        "gpu_util": max(utils) if utils else None,
+    }
+
+
+def _classify(prev, cur):
+    """Condition of the interval between two samples, and what it was based on."""
+    elapsed = max(cur["at"] - prev["at"], 1e-6)
+    detail = {
+        "cpu_percent": round((cur["cpu"] - prev["cpu"]) / elapsed * 100, 1),
+        "read_per_sec": max(0, round((cur["read_bytes"] - prev["read_bytes"]) / elapsed)),
+        "log_grew": cur["log_size"] != prev["log_size"],
+        "gpu_util": cur["gpu_util"],
+    }
+    gpu_idle = cur["gpu_util"] is not None and cur["gpu_util"] < IDLE_GPU_UTIL
+    gpu_busy = cur["gpu_util"] is not None and not gpu_idle
+    busy = detail["cpu_percent"] >= STALL_CPU_PERCENT or detail["read_per_sec"] >= STALL_READ_RATE
+    if not detail["log_grew"] and not busy and not gpu_busy:
+        return "stalled", detail
+    if cur["on_gpu"] and gpu_idle and (busy or detail["log_grew"]):
+        return "input_starved", detail
+    return "healthy", detail
+
+
+def _event(name, state, action, detail):
+    event = {"at": time.time(), "state": state, "action": action, "detail": detail}
+    events = _events.setdefault(name, [])
+    events.append(event)
+    del events[:-MAX_EVENTS]
+    return event
+
+
+def _post(payload):
+    req = urllib.request.Request(WEBHOOK, data=json.dumps(payload).encode(), method="POST")
+    req.add_header("Content-Type", "application/json")
+    try:
+        urllib.request.urlopen(req, timeout=10).close()
+    except OSError as e:
+        log.warning("Watchdog webhook failed: %s", e)
+
+
+def check(projects_dir, name, pid, log_path, paused):
+    """Sample a run if it's time to. Returns the action to take now, or None."""
+    if not ENABLED:
+        return None
+    now = time.monotonic()
+    with _lock:
+        run = _runs.get(name)
+        if run is None or run["pid"] != pid:
+            # A new run: judge it only after its startup grace
+            run = _runs[name] = {"pid": pid, "state": "starting", "since": time.time(),
+                                 "judge_after": now + STARTUP_GRACE, "prev": None,
+                                 "next_at": now, "acted": False, "detail": {}}
+        if paused:
+            if run["state"] != "paused":
+                run.update(state="paused", since=time.time(), prev=None, acted=False)
+            run["judge_after"] = now + STARTUP_GRACE
+            return None
+        if now < run["next_at"]:
+            return None
+        run["next_at"] = now + INTERVAL
+        prev = run["prev"]
+
+    cur = _sample(pid, log_path)
+    if cur is None:
+        return None
+
+    with _lock:
+        run["prev"] = cur
+        if prev is None or now < run["judge_after"]:
+            if run["state"] == "paused":
+                run.update(state="starting", since=time.time())
+            return None
+        state, detail = _classify(prev, cur)
+        run["detail"] = detail
+        if state != run["state"]:
+            run.update(state=state, since=time.time(), acted=False)
+        if state == "healthy":
+            _restarts.pop(name, None)
+            return None
+        if run["acted"]:
+            return None
+
+    config = _config(projects_dir, name)
+    key = "stall" if state == "stalled" else "starved"
+    window = float(config[f"{key}_minutes"]) * 60
+    if not window or time.time() - run["since"] < window:
+        return None
+
+    action = config[f"on_{key}"]
+    with _lock:
+        run["acted"] = True
+        if action == "restart":
+            _restarts[name] = _restarts.get(name, 0) + 1
+            if _restarts[name] > MAX_RESTARTS:
+                action = "stop"
+        event = _event(name, state, action, detail)
+    WATCHDOG_ACTIONS.inc(state=state, action=action)
+    log.warning("Watchdog: %s is %s (%s), action: %s", name, state, detail, action)
+    if WEBHOOK:
+        threading.Thread(target=_post, args=({"project": name, **event},), daemon=True).start()
+    return action
+
+
+def forget(name):
+    """Drop a finished run's sampling state; its events stay for the page."""
+    with _lock:
+        _runs.pop(name, None)
+
+
+def health(name):
+    """The current run's classification and the project's recent watchdog events."""
+    with _lock:
+        run = _runs.get(name)
+        out = {"events": list(_events.get(name, []))}
+        if run:
+            out.update(state=run["state"], since=run["since"], detail=dict(run["detail"]))
+        return out
@@ -0,0 +1,97 @@
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import logging
+
+log = logging.getLogger(__name__)
+
+_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WHEELHOUSE_DIR = os.environ.get("BEEKEEPER_WHEELHOUSE", os.path.join(_HOME, "wheelhouse"))
+PIP_CACHE_DIR = os.path.join(_HOME, "cache", "pip")
+FETCH_TIMEOUT = int(os.environ.get("BEEKEEPER_PIP_TIMEOUT", "3600"))
+INSTALL_TIMEOUT = 600
+
+
+def offline():
+    """Offline mode installs purely from the wheelhouse and never touches an index."""
+    return os.environ.get("BEEKEEPER_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+def pip_env():
+    """Environment for pip subprocesses: one download cache shared by every project."""
+    env = os.environ.copy()
+    env["PIP_CACHE_DIR"] = PIP_CACHE_DIR
+    env.setdefault("PIP_DISABLE_PIP_VERSION_CHECK", "1")
+    return env
+
+
+def _run(cmd, timeout=None, env=None, cwd=None):
+    return subprocess.run(cmd, check=True, capture_output=True, text=True,
+                          timeout=timeout, env=env, cwd=cwd)
+
+
+def fetch(pip_bin, requirement_args, timeout=FETCH_TIMEOUT, run=None):
+    """Make sure wheels for the requirements are in the wheelhouse.
+
+    Wheels already there are reused; anything missing is downloaded (or built
+    from an sdist) once and kept for every later install. run replaces the
+    captured subprocess.run, e.g. with setup_log.runner() to stream output.
+    """
+    os.makedirs(WHEELHOUSE_DIR, exist_ok=True)
+    return (run or _run)(
+        [pip_bin, "wheel", "--wheel-dir", WHEELHOUSE_DIR,
+         "--find-links", WHEELHOUSE_DIR, *requirement_args],
+        timeout=timeout, env=pip_env(),
+    )
+
+
+def pip_install(pip_bin, requirement_args, timeout=INSTALL_TIMEOUT, run=None):
+    """Install requirements into an environment through the wheelhouse.
+
+    requirement_args is what would follow `pip install`, e.g. ["-r", path].
+    Raises CalledProcessError / TimeoutExpired like subprocess.run(check=True).
+    """
+    if not offline():
+        fetch(pip_bin, requirement_args, run=run)
+    os.makedirs(WHEELHOUSE_DIR, exist_ok=True)
+    return (run or _run)(
+        [pip_bin, "install", "--no-index", "--find-links", WHEELHOUSE_DIR, *requirement_args],
+        timeout=timeout, env=pip_env(),
+    )
+
+
+def _pip_for(python_bin, tmp_dir):
+    """Return a pip command for python_bin, creating a throwaway venv if it has no pip."""
+    probe = subprocess.run([python_bin, "-m", "pip", "--version"],
+                           capture_output=True, text=True)
+    if probe.returncode == 0:
+        return [python_bin, "-m", "pip"]
+    venv_dir = os.path.join(tmp_dir, "venv")
+    subprocess.run([python_bin, "-m", "venv", venv_dir],
+                   check=True, capture_output=True, text=True, timeout=120)
+    return [os.path.join(venv_dir, "bin", "pip")]
+
+
+def populate(requirement_args, python_bin=None):
+    """Pre-populate the wheelhouse for a Python interpreter (default: this one)."""
+    python_bin = python_bin or sys.executable
+    tmp_dir = tempfile.mkdtemp(prefix="beekeeper-wheelhouse-")
+    try:
+        pip_cmd = _pip_for(python_bin, tmp_dir)
+        os.makedirs(WHEELHOUSE_DIR, exist_ok=True)
+        subprocess.run(
+            [*pip_cmd, "wheel", "--wheel-dir", WHEELHOUSE_DIR,
+             "--find-links", WHEELHOUSE_DIR, *requirement_args],
+            check=True, timeout=FETCH_TIMEOUT, env=pip_env(),
+        )
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def list_wheels():
+    """Wheel file names currently in the wheelhouse."""
+    if not os.path.isdir(WHEELHOUSE_DIR):
+        return []
+    return sorted(f for f in os.listdir(WHEELHOUSE_DIR) if f.endswith(".whl"))
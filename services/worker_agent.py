@@ -0,0 +1,124 @@
+"""Worker side of multi-node mode: heartbeats to the hive and runs it dispatches."""
+import os
+import re
+import json
+import time
+import socket
+import threading
+import logging
+
+from services.hive import HEARTBEAT_INTERVAL, call
+from services.process_manager import (
+    get_training_statuses, start_training, _update_project_json,
+)
+from services.project_service import create_project, load_project_cached
+from services.stats_service import free_gpus, get_all_stats
+
+log = logging.getLogger(__name__)
+
+HIVE_URL = os.environ.get("BEEKEEPER_HIVE_URL", "")
+PORT = int(os.environ.get("BEEKEEPER_PORT", "5000"))
+WORKER_URL = os.environ.get("BEEKEEPER_WORKER_URL", f"http://{socket.gethostname()}:{PORT}")
+WORKER_NAME = os.environ.get("BEEKEEPER_WORKER_NAME", f"{socket.gethostname()}:{PORT}")
+_SETUP_WAIT = 3600
+
+# Config the hive owns; setup and run state stay local to the worker
+_SYNCED_FIELDS = (
+    "git_url", "branch", "python_version", "train_file", "tensorboard_log_dir",
+    "requirements_file", "env_type", "clone_mode", "env_vars", "resources", "retention",
+    "artifact_globs", "store_globs", "datasets", "watchdog",
+    "metric_patterns", "total_steps", "batch_size",
+)
+
+_thread = None
+_lock = threading.Lock()
+
+
+def report(projects_dir):
+    """Heartbeat payload: host stats, free GPUs and the state of every local project."""
+    stats = get_all_stats()
+    names = sorted(n for n in os.listdir(projects_dir)
+                   if os.path.isfile(os.path.join(projects_dir, n, "project.json")))
+    projects = get_training_statuses(names)
+    for name in names:
+        project = load_project_cached(projects_dir, name) or {}
+        projects[name]["setup_status"] = project.get("setup_status")
+        projects[name]["train_status"] = project.get("train_status")
+    return {
+        "name": WORKER_NAME,
+        "url": WORKER_URL,
+        "stats": {"cpu": stats["cpu"], "memory": stats["memory"], "gpus": stats["gpus"]},
+        "free_gpus": free_gpus(stats["gpus"]),
+        "projects": projects,
+    }
+
+
+def _heartbeat_loop(projects_dir):
+    failing = False
+    while True:
+        try:
+            result = call(HIVE_URL, "/api/hive/heartbeat", report(projects_dir))
+        except Exception as e:
+            result = {"error": str(e)}
+        if "error" in result and not failing:
+            log.warning("Heartbeat to hive %s failed: %s", HIVE_URL, result["error"])
+        elif "error" not in result and failing:
+            log.info("Heartbeat to hive %s restored", HIVE_URL)
+        failing = "error" in result
+        time.sleep(HEARTBEAT_INTERVAL)
+
+
+def start_agent(projects_dir):
+    """Start heartbeating to BEEKEEPER_HIVE_URL (once)."""
+    global _thread
+    if not HIVE_URL:
+        log.warning("BEEKEEPER_MODE=worker but BEEKEEPER_HIVE_URL is not set")
+        return
+    with _lock:
+        if _thread and _thread.is_alive():
+            return
+        _thread = threading.Thread(target=_heartbeat_loop, args=(projects_dir,), daemon=True)
+        _thread.start()
+
+
+def _start_when_ready(projects_dir, name):
+    deadline = time.time() + _SETUP_WAIT
+    while time.time() < deadline:
+        project = load_project_cached(projects_dir, name) or {}
+        status = project.get("setup_status")
+        if status == "ready":
+            result = start_training(projects_dir, name)
+            if "error" in result:
+                log.warning("Dispatched run of %s failed to start: %s", name, result["error"])
+            return
+        if status == "error":
+            log.warning("Setup of dispatched project %s failed: %s", name, project.get("setup_error"))
+            return
+        time.sleep(2)
+
+
+def run(projects_dir, project):
+    """Start a project the hive dispatched, setting it up here first if needed."""
+    name = project.get("name")
+    if not name or not project.get("git_url"):
+        return {"error": "Project config must include name and git_url"}
+    if not re.match(r"^[a-zA-Z0-9_-]+$", name):
+        return {"error": "Invalid project name"}
+    synced = {k: project[k] for k in _SYNCED_FIELDS if k in project}
+
+    config_path = os.path.join(projects_dir, name, "project.json")
+    if not os.path.isfile(config_path):
+        create_project(projects_dir, {"name": name, **synced})
+        threading.Thread(target=_start_when_ready, args=(projects_dir, name), daemon=True).start()
+        return {"status": "setting_up"}
+
+    with open(config_path) as f:
+        local = json.load(f)
+    if local.get("git_url") != synced.get("git_url"):
+        return {"error": f"A different project named {name} already exists on this worker"}
+    if local.get("setup_status") != "ready":
+        # Setup still owns project.json; start with the config it was created with
+        threading.Thread(target=_start_when_ready, args=(projects_dir, name), daemon=True).start()
+        return {"status": "setting_up"}
+    _update_project_json(projects_dir, name, **synced)
+    return start_training(projects_dir, name)
@@ -63,6 +63,7 @@ ExecStart=$VENV_DIR/bin/gunicorn \\
     "app:create_app()"
 Restart=on-failure
 RestartSec=5
+Delegate=yes
 Environment=BEEKEEPER_SECRET=$(python3 -c "import secrets; print(secrets.token_hex(16))")
 Environment=PATH=$VENV_DIR/bin:/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin
 Environment=PYTHONPATH=
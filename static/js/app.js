@@ -41,7 +41,28 @@
         </div>`;
     }
 
+    // Above this share of time stalled on I/O, data loading is the bottleneck
+    const STARVED_PERCENT = 20;
+
+    function fmtRate(bps) {
+        const units = ["B/s", "KB/s", "MB/s", "GB/s"];
+        let i = 0;
+        while (bps >= 1024 && i < units.length - 1) { bps /= 1024; i++; }
+        return (i ? bps.toFixed(1) : Math.round(bps)) + " " + units[i];
+    }
+
+    function renderCores(perCore) {
+        if (!perCore || perCore.length < 2) return "";
+        const cells = perCore.map((p, i) =>
+            `<span class="core-cell" title="core ${i}: ${p}%"><span style="height:${p}%"></span></span>`).join("");
+        return `<div class="stat-row">
+            <span class="stat-key">Cores</span>
+            <div class="core-grid">${cells}</div>
+        </div>`;
+    }
+
     function renderCpu(cpu) {
+        const load = cpu.load ? cpu.load.join(" ") : "N/A";
         return `<div class="stat-group">
             <div class="stat-label">CPU (${cpu.count} cores${cpu.freq ? " @ " + Math.round(cpu.freq) + " MHz" : ""})</div>
             <div class="stat-row">
@@ -49,10 +70,26 @@
                 ${renderBar(cpu.percent, "var(--success)")}
                 <span class="stat-val">${cpu.percent}%</span>
             </div>
+            <div class="stat-row">
+                <span class="stat-key">I/O Wait</span>
+                ${renderBar(cpu.iowait, cpu.iowait >= STARVED_PERCENT ? "var(--danger)" : "var(--accent)")}
+                <span class="stat-val">${cpu.iowait}%</span>
+            </div>
+            ${renderCores(cpu.per_core)}
+            <div class="stat-row">
+                <span class="stat-key">Load</span>
+                <span class="stat-val stat-val-left">${load}</span>
+            </div>
         </div>`;
     }
 
     function renderMemory(mem) {
+        const swap = mem.swap;
+        const swapRow = swap && swap.total_gb ? `<div class="stat-row">
+                <span class="stat-key">Swap</span>
+                ${renderBar(swap.percent, swap.in_bps || swap.out_bps ? "var(--danger)" : "#7aa2f7")}
+                <span class="stat-val">${swap.used_gb} / ${swap.total_gb} GiB</span>
+            </div>` : "";
         return `<div class="stat-group">
             <div class="stat-label">System RAM</div>
             <div class="stat-row">
@@ -60,9 +97,52 @@
                 ${renderBar(mem.percent, "#7aa2f7")}
                 <span class="stat-val">${mem.used_gb} / ${mem.total_gb} GiB</span>
             </div>
+            ${swapRow}
         </div>`;
     }
 
+    function renderDisks(disks) {
+        const names = Object.keys(disks || {});
+        if (!names.length) return "";
+        const rows = names.map(n => {
+            const d = disks[n];
+            const busy = d.busy !== null ? d.busy : 0;
+            return `<div class="stat-row" title="${Math.round(d.read_iops)} read / ${Math.round(d.write_iops)} write IOPS">
+                <span class="stat-key">${n}</span>
+                ${renderBar(busy, busy >= 90 ? "var(--danger)" : "var(--accent)")}
+                <span class="stat-val">R ${fmtRate(d.read_bps)} W ${fmtRate(d.write_bps)}</span>
+            </div>`;
+        }).join("");
+        return `<div class="stat-group"><div class="stat-label">Disks (busy)</div>${rows}</div>`;
+    }
+
+    function renderNet(nics) {
+        const names = Object.keys(nics || {});
+        if (!names.length) return "";
+        const rows = names.map(n => `<div class="stat-row">
+                <span class="stat-key">${n}</span>
+                <span class="stat-val stat-val-left">&darr; ${fmtRate(nics[n].rx_bps)} &nbsp; &uarr; ${fmtRate(nics[n].tx_bps)}</span>
+            </div>`).join("");
+        return `<div class="stat-group"><div class="stat-label">Network</div>${rows}</div>`;
+    }
+
+    function renderPressure(pressure) {
+        const names = Object.keys(pressure || {});
+        if (!names.length) return "";
+        const io = (pressure.io || {}).some || 0;
+        const warning = io >= STARVED_PERCENT
+            ? `<div class="stat-warning">I/O starved: tasks waited on I/O ${io}% of the time</div>` : "";
+        const rows = names.map(r => {
+            const some = pressure[r].some || 0;
+            return `<div class="stat-row">
+                <span class="stat-key">${r}</span>
+                ${renderBar(some, some >= STARVED_PERCENT ? "var(--danger)" : "var(--accent)")}
+                <span class="stat-val">${some}%${pressure[r].full !== undefined ? " (full " + pressure[r].full + "%)" : ""}</span>
+            </div>`;
+        }).join("");
+        return `<div class="stat-group"><div class="stat-label">Stalled (PSI)</div>${warning}${rows}</div>`;
+    }
+
     function render(data) {
         let html = "";
 
@@ -74,6 +154,9 @@
 
         html += renderCpu(data.cpu);
         html += renderMemory(data.memory);
+        html += renderPressure(data.pressure);
+        html += renderDisks(data.disks);
+        html += renderNet(data.net);
 
         statsEl.innerHTML = html;
     }
@@ -93,3 +176,54 @@
     poll();
     setInterval(poll, POLL_INTERVAL);
 })();
+
+// Live project badges from the batch status API
+(function () {
+    const items = document.querySelectorAll(".project-item[data-project]");
+    if (!items.length) return;
+
+    const POLL_INTERVAL = 3000;
+
+    function fmtElapsed(s) {
+        s = Math.floor(s);
+        const h = Math.floor(s / 3600), m = Math.floor((s % 3600) / 60);
+        return h ? `${h}h ${m}m` : `${m}m ${s % 60}s`;
+    }
+
+    function update(projects) {
+        items.forEach(item => {
+            const p = projects[item.dataset.project];
+            if (!p) return;
+            const setup = item.querySelector(".setup-badge");
+            setup.className = `status-badge setup-badge status-${p.setup_status}`;
+            setup.textContent = p.setup_status.replace(/_/g, " ");
+
+            const run = item.querySelector(".run-badge");
+            const state = p.status === "running" ? (p.paused || "running")
+                : p.status === "starting" ? "starting" : p.train_status;
+            if (p.setup_status === "ready" && state && state !== "idle") {
+                run.className = `status-badge run-badge status-${state}`;
+                run.textContent = state;
+                run.style.display = "";
+            } else {
+                run.style.display = "none";
+            }
+            item.querySelector(".project-elapsed").textContent =
+                p.elapsed !== null ? fmtElapsed(p.elapsed) : "";
+        });
+    }
+
+    async function poll() {
+        try {
+            const resp = await fetch("/api/projects/status");
+            if (resp.ok) {
+                update((await resp.json()).projects);
+            }
+        } catch (e) {
+            // silently retry next cycle
+        }
+    }
+
+    poll();
+    setInterval(poll, POLL_INTERVAL);
+})();
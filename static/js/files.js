@@ -88,7 +88,7 @@
                 </td>`;
             } else {
                 html += `<td class="fb-col-name">
-                    <span class="fb-file">${icon} ${entry.name}</span>
+                    <span class="fb-file">${icon} ${entry.name}</span>${entry.stored ? ' <span class="muted" title="Kept in the deduplicated checkpoint store">stored</span>' : ''}
                 </td>`;
                 html += `<td class="fb-col-size muted">${entry.size_h}</td>`;
                 html += `<td class="fb-col-actions">
@@ -0,0 +1,63 @@
+// Beekeeper — Setup / rebuild log streaming with stage progress
+
+(function () {
+    const config = window.SETUP_CONFIG;
+    const terminal = document.getElementById("setup-terminal");
+    const progressEl = document.getElementById("setup-progress");
+    if (!config || !terminal) return;
+
+    let source = null;
+
+    function formatBytes(bytes) {
+        const units = ["B", "KB", "MB", "GB"];
+        let i = 0;
+        while (bytes >= 1000 && i < units.length - 1) {
+            bytes /= 1000;
+            i++;
+        }
+        return `${bytes.toFixed(i ? 1 : 0)} ${units[i]}`;
+    }
+
+    function renderProgress(p) {
+        if (!p || !progressEl) return;
+        const parts = [];
+        if (p.stage) {
+            const secs = Math.round(Date.now() / 1000 - p.stage_started_at);
+            parts.push(`${p.stage} (${secs}s)`);
+        }
+        if (p.git_phase) parts.push(`${p.git_phase}: ${p.git_percent}%`);
+        if (p.collected) parts.push(`${p.collected} collected`);
+        if (p.downloads) parts.push(`${p.downloads} downloaded (${formatBytes(p.downloaded_bytes)})`);
+        if (p.wheels) parts.push(`${p.wheels} wheels`);
+        if (p.building) parts.push(`building ${p.building}`);
+        if (p.installed) parts.push(`${p.installed} installed`);
+        progressEl.textContent = parts.join(" · ");
+    }
+
+    function start() {
+        terminal.textContent = "";
+        source = new EventSource(`/projects/${config.name}/setup/stream?tail=1000`);
+
+        source.onmessage = (e) => {
+            terminal.textContent += e.data + "\n";
+            terminal.scrollTop = terminal.scrollHeight;
+        };
+
+        source.addEventListener("status", (e) => renderProgress(JSON.parse(e.data)));
+
+        source.addEventListener("done", () => {
+            source.close();
+            source = null;
+            if (config.reloadOnDone) location.reload();
+        });
+
+        source.onerror = () => {
+            // Quiet stretches (a long wheel build) end the stream; pick it up again
+            source.close();
+            source = null;
+            setTimeout(start, 3000);
+        };
+    }
+
+    start();
+})();
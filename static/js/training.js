@@ -8,8 +8,12 @@
     const logTerminal = document.getElementById("log-terminal");
     const btnStart = document.getElementById("btn-start");
     const btnStop = document.getElementById("btn-stop");
+    const btnPause = document.getElementById("btn-pause");
+    const btnResume = document.getElementById("btn-resume");
     const btnClear = document.getElementById("btn-clear-log");
     const elapsedEl = document.getElementById("elapsed-time");
+    const btnProfile = document.getElementById("btn-profile");
+    const profileResults = document.getElementById("profile-results");
 
     let eventSource = null;
 
@@ -71,7 +75,7 @@
 
     if (btnStop) {
         btnStop.addEventListener("click", async () => {
-            if (!confirm("Stop training?")) return;
+            if (config.status === "running" && !confirm("Stop training?")) return;
             btnStop.disabled = true;
             btnStop.textContent = "Stopping...";
             try {
@@ -92,6 +96,93 @@
         });
     }
 
+    function bindControl(btn, action, busyText) {
+        if (!btn) return;
+        const label = btn.textContent;
+        btn.addEventListener("click", async () => {
+            btn.disabled = true;
+            btn.textContent = busyText;
+            try {
+                const resp = await fetch(`/projects/${name}/${action}`, { method: "POST" });
+                const data = await resp.json();
+                if (resp.ok) {
+                    location.reload();
+                } else {
+                    alert(data.error || `Failed to ${action} training`);
+                    btn.disabled = false;
+                    btn.textContent = label;
+                }
+            } catch (e) {
+                alert("Network error");
+                btn.disabled = false;
+                btn.textContent = label;
+            }
+        });
+    }
+
+    bindControl(btnPause, "pause", "Pausing...");
+    bindControl(btnResume, "resume", "Resuming...");
+
+    // --- Profiling ---
+
+    function renderProfiles(profiles) {
+        if (!profileResults) return;
+        profileResults.innerHTML = profiles.slice(0, 3).map(p => {
+            const base = `/projects/${name}/profiles/${p.id}`;
+            if (p.status === "running") return `<div>Profiling ${p.id} for ${p.duration}s...</div>`;
+            if (p.status !== "done") return `<div>Profile ${p.id} failed: ${p.error || p.status}</div>`;
+            let links = `<a href="${base}/flamegraph.svg" target="_blank">flame graph</a>
+                · <a href="${base}/stacks.collapsed">collapsed stacks</a>`;
+            if (p.tracemalloc) links += ` · <a href="${base}/allocations.json" target="_blank">allocations</a>`;
+            const missing = p.missing && p.missing.length ? ` (no data from ${p.missing.join(", ")})` : "";
+            return `<div>Profile ${p.id}: ${p.samples} samples from ${Object.keys(p.processes).length} processes${missing} — ${links}</div>`;
+        }).join("");
+    }
+
+    async function refreshProfiles() {
+        try {
+            const resp = await fetch(`/projects/${name}/profiles`);
+            const profiles = await resp.json();
+            renderProfiles(profiles);
+            return profiles;
+        } catch (e) {
+            return [];
+        }
+    }
+
+    if (btnProfile) {
+        btnProfile.addEventListener("click", async () => {
+            const seconds = document.getElementById("profile-seconds").value;
+            const tracemalloc = document.getElementById("profile-tracemalloc").checked;
+            btnProfile.disabled = true;
+            try {
+                const resp = await fetch(`/projects/${name}/profile`, {
+                    method: "POST",
+                    headers: { "Content-Type": "application/json" },
+                    body: JSON.stringify({ seconds: seconds, tracemalloc: tracemalloc }),
+                });
+                const data = await resp.json();
+                if (!resp.ok) {
+                    alert(data.error || "Failed to start profiling");
+                    btnProfile.disabled = false;
+                    return;
+                }
+                const poll = setInterval(async () => {
+                    const profiles = await refreshProfiles();
+                    if (!profiles.some(p => p.status === "running")) {
+                        clearInterval(poll);
+                        btnProfile.disabled = false;
+                    }
+                }, 2000);
+                refreshProfiles();
+            } catch (e) {
+                alert("Network error");
+                btnProfile.disabled = false;
+            }
+        });
+        refreshProfiles();
+    }
+
     // --- Clear log display ---
 
     if (btnClear) {
@@ -170,9 +261,12 @@
 
     // --- Elapsed time ---
 
+    const loadedAt = Date.now() / 1000;
+
     function updateElapsed() {
-        if (!elapsedEl || !config.startedAt) return;
-        const secs = Math.floor(Date.now() / 1000 - config.startedAt);
+        if (!elapsedEl || config.elapsed === null) return;
+        // Server-side elapsed excludes paused time; only tick while not paused
+        const secs = Math.floor(config.elapsed + (config.paused === "paused" ? 0 : Date.now() / 1000 - loadedAt));
         const h = Math.floor(secs / 3600);
         const m = Math.floor((secs % 3600) / 60);
         const s = secs % 60;
@@ -295,6 +389,84 @@
         }
     }
 
+    // --- Throughput ---
+
+    const throughputEl = document.getElementById("throughput");
+
+    function fmtDuration(secs) {
+        const h = Math.floor(secs / 3600);
+        const m = Math.floor((secs % 3600) / 60);
+        return h ? `${h}h ${m}m` : `${m}m ${Math.floor(secs % 60)}s`;
+    }
+
+    async function pollThroughput() {
+        if (!throughputEl) return;
+        try {
+            const resp = await fetch(`/projects/${name}/throughput`);
+            if (!resp.ok) return;
+            const data = await resp.json();
+            const rate = data.steps_per_sec;
+            if (rate === null || rate === undefined) {
+                throughputEl.style.display = "none";
+                return;
+            }
+
+            const parts = [`<span>${rate.toFixed(2)} steps/s${data.live ? "" : " (last run)"}</span>`];
+            if (data.samples_per_sec) {
+                parts.push(`<span>${Math.round(data.samples_per_sec)} samples/s</span>`);
+            }
+            if (data.step !== null && data.step !== undefined) {
+                parts.push(`<span>step ${data.step}${data.total_steps ? " / " + data.total_steps : ""}</span>`);
+            }
+            if (data.eta_seconds !== null && data.eta_seconds !== undefined) {
+                parts.push(`<span>ETA ${fmtDuration(data.eta_seconds)}</span>`);
+            }
+            const reg = data.regression;
+            if (reg && reg.slower) {
+                parts.push(`<span class="throughput-slower">${Math.abs(reg.change_pct)}% slower than previous commits</span>`);
+            }
+            throughputEl.innerHTML = parts.join("");
+            throughputEl.style.display = "";
+        } catch (e) {
+            // ignore
+        }
+    }
+
+    // --- Watchdog ---
+
+    const healthEl = document.getElementById("health");
+    const HEALTH_TEXT = {
+        starting: "watchdog starts judging after the startup grace",
+        healthy: "making progress",
+        input_starved: "GPU idle while loading data",
+        stalled: "no log output, CPU or GPU activity",
+        paused: "paused",
+    };
+
+    function renderHealth(health) {
+        if (!healthEl || !health) return;
+        const parts = [];
+        if (health.state) {
+            const d = health.detail || {};
+            let line = `<span class="status-badge status-${health.state}">${health.state.replace("_", " ")}</span>
+                ${HEALTH_TEXT[health.state] || ""} for ${fmtDuration(Date.now() / 1000 - health.since)}`;
+            if (d.cpu_percent !== undefined) {
+                line += ` · CPU ${d.cpu_percent}%`;
+                if (d.gpu_util !== null && d.gpu_util !== undefined) line += ` · GPU ${d.gpu_util}%`;
+                if (!d.log_grew) line += " · log quiet";
+            }
+            parts.push(`<div>${line}</div>`);
+        }
+        const events = (health.events || []).slice(-5).reverse();
+        if (events.length) {
+            parts.push(`<div class="health-events">${events.map(e =>
+                `<div>${new Date(e.at * 1000).toLocaleString()} ${e.state.replace("_", " ")} → ${e.action}</div>`
+            ).join("")}</div>`);
+        }
+        healthEl.innerHTML = parts.join("");
+        healthEl.style.display = parts.length ? "" : "none";
+    }
+
     // --- Status polling ---
 
     setInterval(async () => {
@@ -302,11 +474,13 @@
             const resp = await fetch(`/projects/${name}/status`);
             if (!resp.ok) return;
             const data = await resp.json();
+            renderHealth(data.health);
 
-            if (config.status === "running" && data.status !== "running") {
+            if (data.status !== config.status && (config.status === "running" || config.status === "starting"
+                    || data.status === "running" || data.status === "starting")) {
                 location.reload();
             }
-            if (config.status !== "running" && data.status === "running") {
+            if (data.status === "running" && (data.paused || "") !== config.paused) {
                 location.reload();
             }
         } catch (e) {
@@ -316,6 +490,11 @@
 
     // --- Init ---
 
+    pollThroughput();
+    if (config.status === "running") {
+        setInterval(pollThroughput, 3000);
+    }
+
     if (config.status === "running" && elapsedEl) {
         updateElapsed();
         setInterval(updateElapsed, 1000);